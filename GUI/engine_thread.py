@@ -0,0 +1,32 @@
+__author__ = 'Santiago Penate Vera'
+from PyQt4.QtCore import QThread, SIGNAL
+
+
+class EngineThread(QThread):
+    """
+    Qt thread that runs a simulation engine (see grid.Engine) and re-emits its events as the signals
+    progress(float) and done()
+    """
+    def __init__(self, engine):
+        """
+        Constructor
+        @param engine: Engine instance (power flow, time series, Monte Carlo...)
+        """
+        QThread.__init__(self)
+
+        self.engine = engine
+
+        self.engine.set_callbacks(progress=lambda value: self.emit(SIGNAL('progress(float)'), value),
+                                  done=lambda: self.emit(SIGNAL('done()')))
+
+    def run(self):
+        """
+        Runs the engine (in the thread)
+        """
+        self.engine.run()
+
+    def end_process(self):
+        """
+        Asks the engine to stop
+        """
+        self.engine.end_process()
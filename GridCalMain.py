@@ -10,6 +10,7 @@ import platform
 import time
 import pandas as pd
 from PyQt4 import QtCore, QtGui
+from PyQt4.QtCore import SIGNAL
 from numpy import take
 from enum import Enum
 import matplotlib
@@ -18,6 +19,7 @@ from matplotlib import pyplot as plt
 
 from GUI.main_gui.gui import *
 from GUI.main_gui.profiles_input.profile_dialogue import *
+from GUI.engine_thread import EngineThread
 from grid.CircuitModule import Circuit
 from grid.PowerFlow import *
 from grid.TimeSeries import *
@@ -190,6 +192,9 @@ class MainGUI(QtGui.QMainWindow):
         # global vars
         self.lock_ui = False
 
+        # thread of the running simulation (see start_engine)
+        self.engine_thread = None
+
         # global models
         self.results_tree_model = None
 
@@ -378,6 +383,19 @@ class MainGUI(QtGui.QMainWindow):
         """
         self.LOCK(False)
 
+    def start_engine(self, engine, *done_slots):
+        """
+        Runs a simulation engine in a Qt thread, displaying its progress
+        @param engine: simulation engine (power flow, time series, Monte Carlo...)
+        @param done_slots: functions to call when the simulation is done
+        @return:
+        """
+        self.engine_thread = EngineThread(engine)
+        self.connect(self.engine_thread, SIGNAL("progress(float)"), self.ui.progressBar.setValue)
+        for slot in done_slots:
+            self.connect(self.engine_thread, SIGNAL("done()"), slot)
+        self.engine_thread.start()
+
     def date64_to_str(self, dte):
         """
         Pretty-print for date64 values
@@ -1217,18 +1235,13 @@ class MainGUI(QtGui.QMainWindow):
                     self.ui.tolerance_spinBox.setValue(order)
 
                 print('Solver: ', solver_to_retry_with)
-                # threading connections
-                self.connect(self.circuit.power_flow, SIGNAL("progress(float)"), self.ui.progressBar.setValue)
-                self.connect(self.circuit.power_flow, SIGNAL("done()"), self.UNLOCK)
-                self.connect(self.circuit.power_flow, SIGNAL("done()"), self.post_power_flow)
-
                 # solve
                 #
                 self.circuit.power_flow.set_run_options(solver_type=solver_type, tol=tolerance, max_it=max_iter,
                                                         enforce_reactive_power_limits=enforce_Q_limits, isMaster=True,
                                                         set_last_solution=set_last_solution,
                                                         solver_to_retry_with=solver_to_retry_with)
-                self.circuit.power_flow.start()
+                self.start_engine(self.circuit.power_flow, self.UNLOCK, self.post_power_flow)
 
     def post_power_flow(self):
         """
@@ -1389,17 +1402,13 @@ class MainGUI(QtGui.QMainWindow):
             max_iter, set_last_solution, solver_to_retry_with, \
             enforce_Q_limits = self.get_selected_power_flow_options()
             print('Solver: ', solver_to_retry_with)
-            # threading connections
-            self.connect(self.circuit.voltage_stability, SIGNAL("progress(float)"), self.ui.progressBar.setValue)
-            self.connect(self.circuit.voltage_stability, SIGNAL("done()"), self.post_voltage_stability)
-
             # solve
             self.circuit.voltage_stability.set_run_options(solver_type=solver_type, tol=tolerance, max_it=max_iter,
                                                            enforce_reactive_power_limits=enforce_Q_limits, isMaster=True,
                                                            set_last_solution=set_last_solution,
                                                            solver_to_retry_with=solver_to_retry_with)
 
-            self.circuit.voltage_stability.start()
+            self.start_engine(self.circuit.voltage_stability, self.post_voltage_stability)
 
     def post_voltage_stability(self):
         """
@@ -1478,14 +1487,10 @@ class MainGUI(QtGui.QMainWindow):
                 # set the solver to use in case of non convergence of the main solver
                 self.circuit.time_series.pf.solver_to_retry_with = solver_to_retry_with
 
-                # Set the time series run options
-                self.connect(self.circuit.time_series, SIGNAL("progress(float)"), self.ui.progressBar.setValue)
-                self.connect(self.circuit.time_series, SIGNAL("done()"), self.post_time_series)
-
                 # execute
                 self.circuit.time_series.set_run_options(auto_repeat=True, tol=tolerance, max_it=max_iter,
                                                          enforce_reactive_power_limits=enforce_Q_limits)
-                self.circuit.time_series.start()  # the class is a Qthread
+                self.start_engine(self.circuit.time_series, self.post_time_series)
 
             else:
                 msg = "The time series is not initialized"
@@ -1655,10 +1660,6 @@ class MainGUI(QtGui.QMainWindow):
                     # set the solver to use in case of non convergence of the main solver
                     self.circuit.monte_carlo.time_series.pf.solver_to_retry_with = solver_to_retry_with
 
-                    # Set the time series run options
-                    self.connect(self.circuit.monte_carlo, SIGNAL("progress(float)"), self.ui.progressBar.setValue)
-                    self.connect(self.circuit.monte_carlo, SIGNAL("done()"), self.post_stochastic_run)
-
                     # execute
                     max_it = self.ui.max_iterations_stochastic_spinBox.value()
                     exponent = self.ui.tolerance_stochastic_spinBox.value()
@@ -1666,7 +1667,7 @@ class MainGUI(QtGui.QMainWindow):
                     self.circuit.monte_carlo.set_run_options(tol=tol, max_it=max_it,
                                                              tol_pf=tolerance, max_it_pf=max_iter,
                                                              enforce_reactive_power_limits=enforce_Q_limits)
-                    self.circuit.monte_carlo.start()  # the class is a Qthread
+                    self.start_engine(self.circuit.monte_carlo, self.post_stochastic_run)
 
                 elif self.ui.stochastic_collocation_radioButton.isChecked():
 
@@ -1678,15 +1679,11 @@ class MainGUI(QtGui.QMainWindow):
                     # set the solver to use in case of non convergence of the main solver
                     self.circuit.stochastic_collocation.time_series.pf.solver_to_retry_with = solver_to_retry_with
 
-                    # Set the time series run options
-                    self.connect(self.circuit.stochastic_collocation, SIGNAL("progress(float)"), self.ui.progressBar.setValue)
-                    self.connect(self.circuit.stochastic_collocation, SIGNAL("done()"), self.post_stochastic_run)
-
                     # use the precision spinboc level to set the level of precision
                     self.circuit.stochastic_collocation.level = self.ui.max_iterations_stochastic_spinBox.value()
 
                     # run
-                    self.circuit.stochastic_collocation.start()
+                    self.start_engine(self.circuit.stochastic_collocation, self.post_stochastic_run)
 
             else:
                 msg = "The time series is not initialized"
@@ -2235,8 +2232,8 @@ class MainGUI(QtGui.QMainWindow):
                         if element_idx is None:
                             y = abs(self.circuit.time_series.voltages)
                         else:
-                            y = abs(self.circuit.time_series.voltages)[:, element_idx]
-                        y2 = self.circuit.time_series.mismatch
+                            y = abs(self.circuit.time_series.voltages[:, element_idx])
+                        y2 = self.circuit.time_series.mismatch[:]
 
                         ylabel = "Bus Voltages (p.u.)"
                         xlabel = 'Time'
@@ -2249,10 +2246,10 @@ class MainGUI(QtGui.QMainWindow):
                             y = abs(self.circuit.time_series.voltages)
                             y *= self.circuit.bus[:, BASE_KV]
                         else:
-                            y = abs(self.circuit.time_series.voltages)[:, element_idx]
+                            y = abs(self.circuit.time_series.voltages[:, element_idx])
                             y *= self.circuit.bus[element_idx, BASE_KV]
 
-                        y2 = self.circuit.time_series.mismatch
+                        y2 = self.circuit.time_series.mismatch[:]
 
                         ylabel = "Bus Voltages (kV)"
                         xlabel = 'Time'
@@ -2297,8 +2294,8 @@ class MainGUI(QtGui.QMainWindow):
                         if element_idx is None:
                             y = abs(self.circuit.time_series.loadings)*100
                         else:
-                            y = abs(self.circuit.time_series.loadings)[:, element_idx]*100
-                        y2 = self.circuit.time_series.mismatch
+                            y = abs(self.circuit.time_series.loadings[:, element_idx])*100
+                        y2 = self.circuit.time_series.mismatch[:]
 
                         ylabel = "Branch loading (%)"
                         xlabel = 'Time'
@@ -2385,6 +2382,8 @@ class MainGUI(QtGui.QMainWindow):
         print('\tstochastic.V_avg_series:\t nodal voltage average series.')
         print('\tstochastic.V_std_series:\t branch current standard deviation series.')
         print('\tstochastic.error_series:\t Monte Carlo error series (the convergence value).')
+        print('\tstochastic.history_iterations:\t iterations of the points of the series.')
+        print('\tstochastic.moments:\t streaming statistics (mean, std, min, max, quantiles) of V, I, Loading and Losses.')
 
     def clc(self):
         """
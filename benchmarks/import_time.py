@@ -0,0 +1,91 @@
+"""
+Benchmark of the start up cost of the grid package (python -X importtime)
+
+Every target is imported in a fresh interpreter, several times, and the best total is reported together with the
+modules that take the most time and the heavy dependencies that got imported (they should only be imported by the
+functions that use them: plotting, MDS layout, redispatch, Excel I/O).
+
+usage:
+    python benchmarks/import_time.py [--repeat 5] [--top 10] [module1 module2 ...]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+default_targets = ['grid',       # the package
+                   'grid.cli']   # the command line interface path
+
+heavy_modules = ['pandas', 'matplotlib.pyplot', 'networkx', 'sklearn', 'scipy.optimize', 'scipy.io', 'PyQt4']
+
+
+def import_times(module):
+    """
+    Imports a module in a new interpreter with -X importtime
+    @param module: module name
+    @return: dictionary {module: (self time, cumulative time)} in seconds
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                         stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True, env=env)
+
+    if res.returncode != 0:
+        raise Exception('import ' + module + ' failed:\n' + res.stderr)
+
+    # lines like: "import time:   self [us] | cumulative | imported package"
+    times = dict()
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:  # header
+            continue
+        times[fields[2].strip()] = (self_us * 1e-6, cumulative_us * 1e-6)
+
+    return times
+
+
+def run_target(module, repeat, top):
+    """
+    Measures the import of a module
+    @param module: module name
+    @param repeat: number of measurements (the best is reported)
+    @param top: number of modules reported by cumulative time
+    """
+    best = None
+    for i in range(repeat):
+        times = import_times(module)
+        if best is None or times[module][1] < best[module][1]:
+            best = times
+
+    print('RESULT', module, '%.3f' % best[module][1], sep='\t')
+
+    print('\ttop modules (cumulative s):')
+    ranking = sorted(best.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_t, cumulative_t) in ranking[1:top + 1]:
+        print('\t\t%.3f\t%s' % (cumulative_t, name))
+
+    loaded = [name for name in heavy_modules if name in best]
+    print('\theavy dependencies imported:', ', '.join(loaded) if len(loaded) else 'none')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time of the grid package')
+    parser.add_argument('targets', nargs='*', default=default_targets, help='modules to import')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements per module (the best is reported)')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest modules reported')
+    args = parser.parse_args()
+
+    print('module', 'import (s)', sep='\t')
+    for module in args.targets:
+        run_target(module, args.repeat, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark of the power flow set up cost (admittance matrices, reduced matrices, factorizations, islands)
+
+Every case is run in its own process so that the reported peak resident memory belongs to that case only.
+
+usage:
+    python benchmarks/power_flow_setup.py [case1.xls case2.xls ...]
+"""
+
+import os
+import sys
+import time
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+default_cases = ['IEEE_30BUS.xls',
+                 'IEEE_57BUS.xls',
+                 'IEEE_39Bus(Islands).xls',
+                 'case2869pegase.xls']
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process in MB (None if it can not be measured)
+    """
+    try:
+        import resource
+    except ImportError:  # windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / 1024.0 / 1024.0  # bytes
+    else:
+        return peak / 1024.0  # kB
+
+
+def run_case(filename):
+    """
+    Loads a case and measures the construction of the power flow object
+    @param filename: case file name
+    @return: Nothing, the results are printed as a tab separated line
+    """
+    sys.path.insert(0, ROOT)
+    from grid.CircuitModule import Circuit
+    from grid.PowerFlow import SolverType
+
+    circuit = Circuit(filename, is_file=True)
+
+    tracemalloc.start()
+    start = time.time()
+
+    circuit.initialize_power_flow_solver(solver_type=SolverType.NR)
+
+    elapsed = time.time() - start
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = peak_rss_mb()
+
+    nb = len(circuit.bus)
+    nl = len(circuit.branch)
+    print('RESULT', os.path.basename(filename), nb, nl, elapsed, peak_alloc / 1024.0 / 1024.0,
+          rss, sep='\t')
+
+
+def main(cases):
+    print('case', 'buses', 'branches', 'setup (s)', 'peak alloc (MB)', 'peak RSS (MB)', sep='\t')
+
+    for case in cases:
+        path = case if os.path.isabs(case) else os.path.join(ROOT, case)
+        res = subprocess.run([sys.executable, os.path.abspath(__file__), '--single', path],
+                             stdout=subprocess.PIPE, universal_newlines=True)
+
+        lines = [l for l in res.stdout.splitlines() if l.startswith('RESULT')]
+        if len(lines) == 0:
+            print(case, 'failed', sep='\t')
+            continue
+
+        _, name, nb, nl, elapsed, peak_alloc, rss = lines[0].split('\t')
+        print(name, nb, nl, '%.3f' % float(elapsed), '%.1f' % float(peak_alloc), rss, sep='\t')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--single':
+        run_case(sys.argv[2])
+    else:
+        main(sys.argv[1:] if len(sys.argv) > 1 else default_cases)
@@ -0,0 +1,117 @@
+"""
+Checkpoints of the long simulations (i.e. time series).
+
+A checkpoint records the progress of a run so that it can be resumed after a crash, a restart or a cancellation
+without solving again the steps already solved:
+
+    - the steps that are solved (a boolean mask, so that the steps may be solved in any order)
+    - the last solution, to warm start the next step
+    - the results arrays (unless they are memory mapped files, that are flushed instead)
+    - a fingerprint of the inputs of the run, so that a checkpoint is never resumed with a different network, profiles
+      or options
+
+The checkpoint is a single .npz file that is replaced atomically: a crash while writing it leaves the previous one.
+"""
+
+import os
+import time
+import hashlib
+
+import numpy as np
+
+
+class Checkpoint(object):
+    """
+    Checkpoint file of a simulation, saved periodically
+    """
+
+    def __init__(self, path, interval=300.0):
+        """
+        Constructor
+        @param path: checkpoint file path
+        @param interval: Minimum time between two periodic saves (seconds)
+        """
+        self.path = path
+
+        self.interval = interval
+
+        self.last_save = time.time()
+
+    @staticmethod
+    def get_fingerprint(values):
+        """
+        Computes the fingerprint of the inputs of a run
+        @param values: list of numpy arrays, numbers or strings (None is allowed)
+        @return: fingerprint (hexadecimal string)
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for value in values:
+            if isinstance(value, np.ndarray):
+                digest.update(str((value.shape, value.dtype.str)).encode())
+                digest.update(np.ascontiguousarray(value).tobytes())
+            else:
+                digest.update(repr(value).encode())
+        return digest.hexdigest()
+
+    def exists(self):
+        """
+        Is there a checkpoint saved?
+        """
+        return os.path.exists(self.path)
+
+    def is_due(self):
+        """
+        Has the save interval elapsed since the last save?
+        """
+        return time.time() - self.last_save >= self.interval
+
+    def save(self, fingerprint, done, V0, arrays=None):
+        """
+        Saves the checkpoint (replacing the previous one)
+        @param fingerprint: fingerprint of the inputs of the run (see get_fingerprint)
+        @param done: boolean array with the steps solved
+        @param V0: last solution (complex voltages array)
+        @param arrays: dictionary with the results arrays. None if the results are stored elsewhere (i.e. memory mapped
+                       files that have been flushed)
+        """
+        data = {'fingerprint': np.array(fingerprint),
+                'done': np.asarray(done, dtype=bool),
+                'V0': np.asarray(V0, dtype=complex)}
+
+        if arrays is not None:
+            for name, arr in arrays.items():
+                data['results.' + name] = arr
+
+        # write aside and replace, so that a crash leaves the previous checkpoint complete
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self.last_save = time.time()
+
+    def load(self, fingerprint=None):
+        """
+        Loads the checkpoint
+        @param fingerprint: fingerprint of the inputs of the run to resume. If given, it must match the checkpoint's
+        @return: boolean array with the steps solved, last solution, dictionary with the results arrays (empty if they
+                 were not saved)
+        """
+        with np.load(self.path) as data:
+            if fingerprint is not None and str(data['fingerprint']) != fingerprint:
+                raise Exception('The checkpoint ' + self.path + ' belongs to a run with different inputs')
+
+            done = data['done']
+            V0 = data['V0']
+            arrays = {key[len('results.'):]: data[key] for key in data.files if key.startswith('results.')}
+
+        return done, V0, arrays
+
+    def remove(self):
+        """
+        Deletes the checkpoint file
+        """
+        if self.exists():
+            os.remove(self.path)
@@ -5,19 +5,13 @@
 import sys
 import os
 from sys import stderr
-import networkx as nx
 from warnings import warn
 from os.path import basename, splitext, exists
 from copy import deepcopy
 
 from numpy import argsort, arange, concatenate, finfo, array, zeros, c_, ndim, any
 
-from matplotlib import pyplot as plt
-
 from scipy.sparse import issparse, vstack, hstack, spdiags, coo_matrix
-from scipy.io import loadmat, savemat
-
-from pandas import DataFrame as df
 
 from grid.PowerFlow import *
 from grid.BusDefinitions import *
@@ -26,13 +20,17 @@ from grid.BranchDefinitions import *
 from grid.util import run_userfcn
 from grid.TimeSeries import *
 from grid.MonteCarlo import *
-from grid.ImportParsers.DGS_Parser import read_DGS
-from grid.ImportParsers.matpower_parser import parse_matpower_file
+from grid.ContingencyAnalysis import ContingencyAnalysis
+from grid.Telemetry import get_logger
+# networkx, matplotlib, pandas, scipy.io and the file parsers are imported by the functions that use them, so that
+# importing the package (i.e. to run a power flow from the command line) does not pay for them
 # from typing import TypeVar
 
 PY2 = sys.version_info[0] == 2
 EPS = finfo(float).eps
 
+logger = get_logger('CircuitModule')
+
 
 """
 Defines constants for named column indices to areas matrix.
@@ -99,18 +97,21 @@ class Circuit(object):
 
         self.voltage_stability = None  # voltage stability instance
 
+        self.contingency_analysis = None  # N-1 contingency analysis instance
+
         # default arguments
         if filename is not None:
 
             if is_file:
                 name, file_extension = os.path.splitext(filename)
-                print(name, file_extension)
+                logger.info('Loading %s', filename)
                 if file_extension == '.xls' or file_extension == '.xlsx':
                     ppc = load_from_xls(filename)
                     data_in_zero_base = True
                 elif file_extension == '.dgs':
                     ppc = load_from_dgs(filename)
                 elif file_extension == '.m':
+                    from grid.ImportParsers.matpower_parser import parse_matpower_file
                     ppc = parse_matpower_file(filename)
                     data_in_zero_base = True
 
@@ -180,6 +181,7 @@ class Circuit(object):
             if np.count_nonzero(self.bus[:, BUS_X]) == 0:
                 # no bus positions are provided, calculate the spectral positions
                 # self.graph_pos = nx.spectral_layout(self.circuit_graph)
+                import networkx as nx
                 D = nx.floyd_warshall_numpy(self.circuit_graph, nodelist=None, weight='weight')
                 try:
                     self.graph_pos = self.cmdscale(D)
@@ -189,11 +191,11 @@ class Circuit(object):
                     x, y = self.graph_pos[i]
                     self.bus[i, BUS_X] = x
                     self.bus[i, BUS_Y] = y
-                print("Using spectral positions")
+                logger.debug('Using spectral positions')
             else:
                 # use the bus structure provided positions
                 self.graph_pos = self.get_bus_pos_dictionary()
-                print("Using file positions")
+                logger.debug('Using file positions')
 
             # initialize the solvers (at this point the circuit should have loaded the data)
             self.initialize_solvers()
@@ -227,7 +229,7 @@ class Circuit(object):
             else:
                 self.gen_names = self.get_gen_labels()
 
-            print('Circuit loaded!')
+            logger.info('Circuit loaded: %d buses, %d branches, %d generators', nb, nl, ng)
 
     def initialize_solvers(self):
         """
@@ -268,18 +270,35 @@ class Circuit(object):
             self.initialize_power_flow_solver()
             self.time_series.pf = self.power_flow
 
-    def initialize_MonteCarlo(self, mode: TimeGroups):
+    def initialize_MonteCarlo(self, mode: TimeGroups, n_processes=1):
         """
         Initializes a monte carlo solver instance
+        @param mode: time grouping of the profiles
+        @param n_processes: Number of processes (None for all the cpus). With more than one the iterations are run
+                            by MonteCarloMultiThread
         @return:
         """
         if self.time_series is not None:
             self.initialize_TimeSeries()
-            self.monte_carlo = MonteCarlo(self.time_series, mode)
-            # self.monte_carlo = MonteCarloMultiThread(self.time_series, mode)
+            if n_processes == 1:
+                self.monte_carlo = MonteCarlo(self.time_series, mode)
+            else:
+                self.monte_carlo = MonteCarloMultiThread(self.time_series, mode)
+                self.monte_carlo.set_parallel_options(n_processes=n_processes)
             self.stochastic_collocation = StochasticCollocation(self.time_series, level=2)
         else:
-            print('No time series object ready')
+            logger.warning('No time series object ready')
+
+    def initialize_contingency_analysis(self, top_k=10, threshold=1.0):
+        """
+        Initializes a N-1 contingency analysis instance
+        @param top_k: Number of the most critical outages verified with the AC power flow
+        @param threshold: Loading (p.u. of RATE_A) above which a branch is considered overloaded
+        @return:
+        """
+        if self.power_flow is None:
+            self.initialize_power_flow_solver()
+        self.contingency_analysis = ContingencyAnalysis(self.power_flow, top_k=top_k, threshold=threshold)
 
     def run_time_series(self):
         """
@@ -395,7 +414,7 @@ class Circuit(object):
         Returns:
             g: NetworkX graph structure
         """
-        # from ..reliability.graphs import nx
+        import networkx as nx
 
         nb = len(self.bus)
         nl = len(self.branch)
@@ -575,6 +594,9 @@ class Circuit(object):
 
             node_size: Size of the nodes
         """
+        import networkx as nx
+        from matplotlib import pyplot as plt
+
         if pos is None:
             pos = nx.spectral_layout(self.circuit_graph)
 
@@ -1378,6 +1400,7 @@ def loadcase(casefile, return_as_obj=True, expect_gencost=True, expect_areas=Tru
         if info == 0:
             if extension == '.mat':       # from MAT file
                 try:
+                    from scipy.io import loadmat
                     d = loadmat(rootname + extension, struct_as_record=True)
                     if 'ppc' in d or 'mpc' in d:    # it's a MAT/PYPOWER dict
                         if 'ppc' in d:
@@ -1518,11 +1541,25 @@ def loadcase(casefile, return_as_obj=True, expect_gencost=True, expect_areas=Tru
         return info
 
 
+def parse_elements_sheet(xl, name):
+    """
+    Parses a sheet of elements (buses, generators or branches) of an excel file. The first column holds the names of
+    the elements when it has no header: it is used as the index, as the older versions of pandas did.
+    @param xl: pandas ExcelFile
+    @param name: sheet name
+    @return: DataFrame
+    """
+    df = xl.parse(name)
+    if len(df.columns) > 0 and str(df.columns[0]).startswith('Unnamed'):
+        df = df.set_index(df.columns[0])
+        df.index.name = None
+    return df
+
+
 def load_from_xls(filename):
     """
     Loads the excel file content to a dictionary for parsing the data
     """
-    print()
     ppc = dict()
 
     import pandas as pd
@@ -1537,19 +1574,19 @@ def load_from_xls(filename):
             df = xl.parse(name)
             ppc["baseMVA"] = np.double(df.values[0, 1])
         elif name.lower() == "bus":
-            df = xl.parse(name)
+            df = parse_elements_sheet(xl, name)
             ppc["bus"] = np.nan_to_num(df.values)
             if len(df) > 0:
                 if df.index.values.tolist()[0] != 0:
                     ppc['bus_names'] = df.index.values.tolist()
         elif name.lower() == "gen":
-            df = xl.parse(name)
+            df = parse_elements_sheet(xl, name)
             ppc["gen"] = np.nan_to_num(df.values)
             if len(df) > 0:
                 if df.index.values.tolist()[0] != 0:
                     ppc['gen_names'] = df.index.values.tolist()
         elif name.lower() == "branch":
-            df = xl.parse(name)
+            df = parse_elements_sheet(xl, name)
             ppc["branch"] = np.nan_to_num(df.values)
             if len(df) > 0:
                 if df.index.values.tolist()[0] != 0:
@@ -1576,6 +1613,8 @@ def load_from_dgs(filename):
     @param filename:
     @return: Circuit dictionary
     """
+    from grid.ImportParsers.DGS_Parser import read_DGS
+
     baseMVA, BUSES, BRANCHES, GEN, graph, gpos, BUS_NAMES, BRANCH_NAMES, GEN_NAMES = read_DGS(filename)
 
     ppc = dict()
@@ -1709,6 +1748,7 @@ def savecase(fname, ppc, comment=None, version='2'):
 
     # open and write the file
     if extension == ".mat":     ## MAT-file
+        from scipy.io import savemat
         savemat(fname, ppc)
     else:                       ## Python file
         try:
@@ -0,0 +1,295 @@
+"""
+N-1 contingency analysis.
+
+All the single branch outages are screened at once with the linear sensitivities of the DC model:
+
+    PTDF: change of the branch flows for a unit injection at every bus (withdrawn at the slack)
+    LODF: change of the flow of every branch per unit of pre-outage flow of the outaged branch
+
+Then the flow of the branch l after the outage of the branch k is estimated as
+
+    Pl(k) = Pl + LODF[l, k] * Pk
+
+The outages that produce the highest loadings are verified with a full AC power flow, warm started from the base
+case solution.
+"""
+
+import numpy as np
+from numpy import zeros, arange, conj
+from scipy.sparse.linalg import splu
+from grid.Engine import Engine
+import time
+
+from grid.PowerFlow import MultiCircuitPowerFlow
+from grid.BranchDefinitions import *
+
+
+def make_ptdf(Bbus, Bf, ref):
+    """
+    Computes the Power Transfer Distribution Factors
+    Args:
+        Bbus: DC susceptance matrix (nb x nb, see CircuitPowerFlow.makeBdc)
+        Bf: DC branch-bus susceptance matrix (nl x nb, see CircuitPowerFlow.makeBdc)
+        ref: Array with the indices of the slack buses
+
+    Returns: PTDF matrix (nl x nb, dense). The columns of the slack buses are zero
+    """
+    nl, nb = Bf.shape
+    noref = np.setdiff1d(arange(nb), ref)
+
+    PTDF = zeros((nl, nb))
+    if len(noref) > 0:
+        # PTDF[:, noref] = Bf[:, noref] * inv(Bbus[noref, noref]), solved as Bbus' * PTDF' = Bf'
+        Bred = Bbus[noref, :][:, noref]
+        lu = splu(Bred.T.tocsc())
+        PTDF[:, noref] = lu.solve(Bf[:, noref].T.toarray()).T
+
+    return PTDF
+
+
+def make_lodf(PTDF, f, t, tol=1e-10):
+    """
+    Computes the Line Outage Distribution Factors
+    Args:
+        PTDF: PTDF matrix (nl x nb)
+        f: Array with the "from" bus of every branch
+        t: Array with the "to" bus of every branch
+        tol: Tolerance to detect the outages that split the circuit
+
+    Returns:
+        LODF matrix (nl x nl, dense): LODF[l, k] is the change of the flow of l per unit of flow of k when k is lost
+        Boolean array marking the branches whose outage splits the circuit (their LODF columns are NaN)
+    """
+    # flow change of every branch when one unit is injected at the "from" bus of k and extracted at its "to" bus
+    H = PTDF[:, f] - PTDF[:, t]
+
+    denominator = 1.0 - np.diag(H)
+    islanding = np.abs(denominator) < tol
+    denominator[islanding] = np.nan
+
+    LODF = H / denominator
+    np.fill_diagonal(LODF, -1.0)
+    LODF[:, islanding] = np.nan
+
+    return LODF, islanding
+
+
+class ContingencyAnalysis(Engine):
+    """
+    This class runs the N-1 branch contingency analysis of a circuit
+    """
+
+    def __init__(self, power_flow_object: MultiCircuitPowerFlow, top_k=10, threshold=1.0, chunk_size=512):
+        """
+        Constructor
+        @param power_flow_object: Power flow object (MultiCircuitPowerFlow) of the circuit
+        @param top_k: Number of the most critical outages verified with the AC power flow
+        @param threshold: Loading (p.u. of RATE_A) above which a branch is considered overloaded
+        @param chunk_size: Number of outages whose loadings are computed at once
+        @return:
+        """
+        Engine.__init__(self)
+
+        self.pf = power_flow_object
+
+        self.top_k = top_k
+
+        self.threshold = threshold
+
+        self.chunk_size = chunk_size
+
+        # run options of the AC verification
+        self.tolerance = 1e-3
+        self.max_iterations = 20
+        self.enforce_reactive_power_limits = True
+
+        # base case branch flows (MW) and loadings
+        self.base_flows = None
+        self.base_loading = None
+
+        # estimated loadings (p.u. of RATE_A): row k contains the loadings of all the branches after the outage of k
+        self.loading = None
+
+        # maximum estimated loading and number of overloaded branches of every outage
+        self.max_loading = None
+        self.overloads = None
+
+        # outages that split the circuit in islands (not screened)
+        self.islanding = None
+
+        # outages verified with the AC power flow, their loadings (one row per verified outage) and convergence
+        self.verified_outages = None
+        self.ac_loading = None
+        self.ac_converged = None
+
+        self.elapsed = 0
+
+        self.cancel = False
+
+    def set_run_options(self, top_k=10, threshold=1.0, tol=1e-3, max_it=20, enforce_reactive_power_limits=True):
+        """
+        Set the execution parameters
+        @param top_k: Number of the most critical outages verified with the AC power flow
+        @param threshold: Loading (p.u. of RATE_A) above which a branch is considered overloaded
+        @param tol: AC power flow tolerance
+        @param max_it: AC power flow maximum number of iterations
+        @param enforce_reactive_power_limits: Enforce the generators reactive power limits in the AC power flow?
+        @return:
+        """
+        self.top_k = top_k
+        self.threshold = threshold
+        self.tolerance = tol
+        self.max_iterations = max_it
+        self.enforce_reactive_power_limits = enforce_reactive_power_limits
+
+    def has_results(self):
+        """
+        Returns whether if there are results stored or not
+        @return:
+        """
+        return self.loading is not None
+
+    def end_process(self):
+        self.cancel = True
+
+    @staticmethod
+    def branch_loading(flows, rate):
+        """
+        Loading of the branches in p.u. of their rating (zero when the rating is not defined)
+        @param flows: Branch flows in MW or MVA (the last dimension runs along the branches)
+        @param rate: Branch ratings (RATE_A)
+        @return: loadings
+        """
+        rated = rate > 0
+        loading = zeros(flows.shape, dtype=np.float32)
+        loading[..., rated] = np.abs(flows[..., rated]) / rate[rated]
+        return loading
+
+    def screen(self):
+        """
+        Estimates the loading of all the branches for every single branch outage with the DC sensitivities
+        @return: Nothing, the results are stored in the object
+        """
+        nl = len(self.pf.branch)
+        rate = self.pf.branch[:, RATE_A]
+
+        self.base_flows = np.real(self.pf.power_from)
+        self.base_loading = self.branch_loading(self.base_flows, rate)
+
+        # by default an outage only changes the loading of the branch itself (i.e. out of service branches)
+        self.loading = np.tile(self.base_loading, (nl, 1))
+        self.loading[arange(nl), arange(nl)] = 0
+        self.islanding = zeros(nl, dtype=bool)
+
+        for i, island in enumerate(self.pf.island_circuits):
+
+            cpf = island.circuit_power_flow
+            if cpf.the_grid_is_disabled or cpf.B is None:
+                continue
+
+            br_idx = np.array(self.pf.original_indices[i][2], dtype=int)
+            f = cpf.branch[:, F_BUS].astype(int)
+            t = cpf.branch[:, T_BUS].astype(int)
+
+            PTDF = make_ptdf(cpf.B, cpf.Bf, cpf.ref_list)
+            LODF, islanding = make_lodf(PTDF, f, t)
+
+            # only the branches in service can fail
+            in_service = cpf.branch[:, BR_STATUS] != 0
+            islanding &= in_service
+            self.islanding[br_idx] = islanding
+
+            F0 = self.base_flows[br_idx]
+            rate_island = rate[br_idx]
+            outages = np.where(in_service & ~islanding)[0]
+
+            for a in range(0, len(outages), self.chunk_size):
+                k = outages[a:a + self.chunk_size]
+
+                # post outage flows (outage x branch)
+                flows = F0[np.newaxis, :] + LODF[:, k].T * F0[k, np.newaxis]
+
+                self.loading[np.ix_(br_idx[k], br_idx)] = self.branch_loading(flows, rate_island)
+
+            # the islanding outages are not estimated
+            self.loading[np.ix_(br_idx[islanding], br_idx)] = np.nan
+
+        self.max_loading = np.nanmax(np.where(np.isnan(self.loading), -np.inf, self.loading), axis=1)
+        self.overloads = (np.nan_to_num(self.loading) > self.threshold).sum(axis=1)
+
+    def verify(self, outages):
+        """
+        Runs the AC power flow of some outages, warm started from the base case solution
+        @param outages: Array of branch indices (of the complete circuit)
+        @return: Nothing, the results are stored in the object
+        """
+        nl = len(self.pf.branch)
+        rate = self.pf.branch[:, RATE_A]
+
+        self.verified_outages = np.array(outages, dtype=int)
+        self.ac_loading = np.tile(self.base_loading, (len(outages), 1))
+        self.ac_converged = zeros(len(outages), dtype=bool)
+
+        # island and position in the island of every branch
+        branch_island = zeros(nl, dtype=int)
+        branch_local = zeros(nl, dtype=int)
+        for i in range(len(self.pf.island_circuits)):
+            br_idx = np.array(self.pf.original_indices[i][2], dtype=int)
+            branch_island[br_idx] = i
+            branch_local[br_idx] = arange(len(br_idx))
+
+        for j, k in enumerate(self.verified_outages):
+
+            i = branch_island[k]
+            cpf = self.pf.island_circuits[i].circuit_power_flow
+            br_idx = np.array(self.pf.original_indices[i][2], dtype=int)
+            V_base = cpf.V0.copy()
+            converged_base = cpf.last_solution_converged
+            status = cpf.branch[branch_local[k], BR_STATUS]
+
+            cpf.set_branch_status(branch_local[k], 0)
+            self.ac_converged[j] = cpf.run(tol=self.tolerance, max_it=self.max_iterations,
+                                           enforce_q_limits=self.enforce_reactive_power_limits,
+                                           remember_last_solution=True)
+
+            # branch flows at the "from" side in MVA
+            V = cpf.V0
+            Sf = V[cpf.branch[:, F_BUS].astype(int)] * conj(cpf.Yf * V) * cpf.baseMVA
+            self.ac_loading[j, br_idx] = self.branch_loading(Sf, rate[br_idx])
+
+            # restore the base case
+            cpf.set_branch_status(branch_local[k], status)
+            cpf.V0 = V_base
+            cpf.last_solution_converged = converged_base
+
+            if self.cancel:
+                break
+
+    def run(self):
+        """
+        Run the N-1 contingency analysis
+        @return:
+        """
+        start = time.time()
+        self.cancel = False
+        self.report_progress(0.0)
+
+        # base case (it provides the flows to screen and the voltages to warm start the AC verification)
+        self.pf.set_run_options(self.pf.solver_type, self.tolerance, self.max_iterations,
+                                self.enforce_reactive_power_limits, False)
+        self.pf.run()
+        self.report_progress(10.0)
+
+        # DC screening of all the outages
+        self.screen()
+        self.report_progress(50.0)
+
+        # AC verification of the most critical outages (of the branches in service)
+        order = np.argsort(-self.max_loading)
+        in_service = self.pf.branch[order, BR_STATUS] != 0
+        order = order[in_service & ~self.islanding[order] & (self.max_loading[order] > 0)]
+        self.verify(order[:self.top_k])
+
+        self.elapsed = time.time() - start
+        self.report_progress(100.0)
+        self.report_done()
@@ -9,6 +9,10 @@ from .GenDefinitions import *
 from .BranchDefinitions import *
 # from .power_flow import *
 from .NewtonRaphsonPowerFlow import *
+from .SparseLUSolver import SparseLUSolver
+from .Telemetry import get_logger
+
+logger = get_logger('ContinuationPowerFlow')
 # from numba import jit
 
 
@@ -232,7 +236,8 @@ def cpf_p_jac(parameterization, z, V, lam, Vprv, lamprv, pv, pq, pvpq):
     return dP_dV, dP_dlam
 
 # @jit(cache=True)
-def cpf_corrector(Ybus, Sbus, V0, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, parameterization, tol, max_it, verbose):
+def cpf_corrector(Ybus, Sbus, V0, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, parameterization, tol, max_it, verbose,
+                  lin_solver=None):
     """
     # CPF_CORRECTOR  Solves the corrector step of a continuation power flow using a
     #   full Newton method with selected parameterization scheme.
@@ -259,6 +264,9 @@ def cpf_corrector(Ybus, Sbus, V0, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, par
     #   Z (normalized predictor for all buses), and STEP (continuation step size).
     #   The extra continuation output is LAM (final corrector lambda).
     #
+    #   LIN_SOLVER (optional) is the SparseLUSolver used for the Newton steps; passing the same one on every
+    #   continuation step reuses the ordering of the augmented Jacobian.
+    #
     #   See also RUNCPF.
     
     #   MATPOWER
@@ -318,6 +326,10 @@ def cpf_corrector(Ybus, Sbus, V0, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, par
     j6 = j4 + npq
     j7 = j6
     j8 = j6+1
+
+    if lin_solver is None:
+        lin_solver = SparseLUSolver()
+    lin_solver.invalidate()
     
     # evaluate F(x0, lam0), including Sxfr transfer/loading
     mis = V * conj(Ybus * V) - Sbus - lam * Sxfr
@@ -340,7 +352,7 @@ def cpf_corrector(Ybus, Sbus, V0, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, par
     if normF < tol:
         converged = True
         if verbose:
-            print('\nConverged!\n')
+            logger.debug('Converged!')
 
     # do Newton iterations
     while not converged and i < max_it:
@@ -364,7 +376,7 @@ def cpf_corrector(Ybus, Sbus, V0, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, par
             ], format="csr")
     
         # compute update step
-        dx = -spsolve(J, F)
+        dx = -lin_solver.solve(J, F)
     
         # update voltage
         if npv:
@@ -398,17 +410,17 @@ def cpf_corrector(Ybus, Sbus, V0, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, par
         normF = linalg.norm(F, Inf)
         
         if verbose > 1:
-            print('\n#3d        #10.3e', i, normF)
+            logger.debug('Corrector iteration %3d, mismatch %10.3e', i, normF)
         
         if normF < tol:
             converged = 1
             if verbose:
-                print('\nNewton''s method corrector converged in ', i, ' iterations.\n')
+                logger.debug("Newton's method corrector converged in %d iterations", i)
         
     
     if verbose:
         if not converged:
-            print('\nNewton method corrector did not converge in  ', i, ' iterations.\n')
+            logger.debug("Newton's method corrector did not converge in %d iterations", i)
 
     return V, converged, i, lam, normF
 
@@ -790,6 +802,9 @@ def runcpf2(Ybus, Sbus_base, Sbus_target, V, pv, pq, step, approximation_order,
     Returns:
         Voltage_series: List of all the voltage solutions from the base to the target
         Lambda_series: Lambda values used in the continuation
+        normF: Mismatch norm of the last corrector step
+        success: Did the last corrector step converge?
+        iterations: Number of corrector iterations of all the steps
 
     MATPOWER
         Copyright (c) 1996-2015 by Power System Engineering Research Center (PSERC)
@@ -816,11 +831,15 @@ def runcpf2(Ybus, Sbus_base, Sbus_target, V, pv, pq, step, approximation_order,
     V_prev = V       # V at previous step
     continuation = 1
     cont_steps = 0
+    iterations = 0
     pvpq = r_[pv, pq]
 
     z = zeros(2 * nb + 1)
     z[2 * nb] = 1.0
 
+    # linear solver shared by all the corrector steps
+    lin_solver = SparseLUSolver()
+
     # result arrays
     Voltage_series = list()
     Lambda_series = list()
@@ -842,27 +861,25 @@ def runcpf2(Ybus, Sbus_base, Sbus_target, V, pv, pq, step, approximation_order,
         # correction
         # Ybus, Sbus, V0, ref, pv, pq, lam0, Sxfr, Vprv, lamprv, z, step, parameterization, tol, max_it, verbose
         V, success, i, lam, normF = cpf_corrector(Ybus, Sbus_base, V0, pv, pq, lam0, Sxfr, V_prev, lam_prev, z,
-                                                  step, approximation_order, tol, max_it, verbose)
+                                                  step, approximation_order, tol, max_it, verbose, lin_solver)
+        iterations += i
         if not success:
             continuation = 0
-            print('step ', cont_steps, ' : lambda = ', lam, ', corrector did not converge in ', i, ' iterations\n')
+            logger.info('Step %d: lambda = %s, corrector did not converge in %d iterations', cont_steps, lam, i)
             break
 
-        print('Step: ', cont_steps, ' Lambda prev: ', lam_prev, ' Lambda: ', lam)
-        print(V)
+        logger.debug('Step %d: lambda prev = %s, lambda = %s', cont_steps, lam_prev, lam)
         Voltage_series.append(V)
         Lambda_series.append(lam)
 
-        if verbose > 2:
-            print('step ', cont_steps, ' : lambda = ', lam)
-        elif verbose > 1:
-            print('step ', cont_steps, ': lambda = ', lam, ', ', i, ' corrector Newton steps\n')
+        if verbose > 1:
+            logger.debug('Step %d: lambda = %s, %d corrector Newton steps', cont_steps, lam, i)
 
         if type(stop_at) is str:
             if stop_at.upper() == 'FULL':
                 if abs(lam) < 1e-8:  # traced the full continuation curve
                     if verbose:
-                        print('\nTraced full continuation curve in ', cont_steps, ' continuation steps\n')
+                        logger.info('Traced the full continuation curve in %d continuation steps', cont_steps)
                     continuation = 0
 
                 elif (lam < lam_prev) and (lam - step < 0):   # next step will overshoot
@@ -873,7 +890,7 @@ def runcpf2(Ybus, Sbus_base, Sbus_target, V, pv, pq, step, approximation_order,
             elif stop_at.upper() == 'NOSE':
                 if lam < lam_prev:                        # reached the nose point
                     if verbose:
-                        print('\nReached steady state loading limit in ', cont_steps, ' continuation steps\n')
+                        logger.info('Reached the steady state loading limit in %d continuation steps', cont_steps)
                     continuation = 0
             else:
                 raise Exception('Stop point ' + stop_at + ' not recognised.')
@@ -881,12 +898,12 @@ def runcpf2(Ybus, Sbus_base, Sbus_target, V, pv, pq, step, approximation_order,
         else:  # if it is not a string
             if lam < lam_prev:                             # reached the nose point
                 if verbose:
-                    print('\nReached steady state loading limit in ', cont_steps, ' continuation steps\n')
+                    logger.info('Reached the steady state loading limit in %d continuation steps', cont_steps)
                 continuation = 0
 
             elif abs(stop_at - lam) < 1e-8:  # reached desired lambda
                 if verbose:
-                    print('\nReached desired lambda ', stop_at, ' in ', cont_steps, ' continuation steps\n')
+                    logger.info('Reached the desired lambda %s in %d continuation steps', stop_at, cont_steps)
                 continuation = 0
 
             elif (lam + step) > stop_at:    # will reach desired lambda in next step
@@ -910,4 +927,4 @@ def runcpf2(Ybus, Sbus_base, Sbus_target, V, pv, pq, step, approximation_order,
                 if step < step_min:
                     step = step_min
 
-    return Voltage_series, Lambda_series, normF, success
+    return Voltage_series, Lambda_series, normF, success, iterations
@@ -0,0 +1,58 @@
+"""
+Base of the simulation engines.
+
+The engines (power flow, time series, Monte Carlo...) are plain objects that run synchronously and report their
+progress through callbacks, so they can run without a GUI (i.e. from the command line, see grid.cli). The GUI runs
+them in a Qt thread that re-emits the callbacks as Qt signals (see GUI.engine_thread).
+"""
+
+
+class Engine(object):
+    """
+    Simulation engine: run() performs the simulation, calling the progress callback with the completion percentage
+    and the done callback when it finishes
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.progress_callback = None
+        self.done_callback = None
+
+    def set_callbacks(self, progress=None, done=None):
+        """
+        Sets the functions that receive the simulation events
+        @param progress: function called with the completion percentage (float from 0 to 100), or None
+        @param done: function called without arguments when the simulation finishes, or None
+        @return:
+        """
+        self.progress_callback = progress
+        self.done_callback = done
+
+    def report_progress(self, value):
+        """
+        Reports the completion percentage
+        @param value: percentage (0 to 100)
+        """
+        if self.progress_callback is not None:
+            self.progress_callback(value)
+
+    def report_done(self):
+        """
+        Reports the end of the simulation
+        """
+        if self.done_callback is not None:
+            self.done_callback()
+
+    def start(self):
+        """
+        Runs the simulation in the calling thread
+        """
+        self.run()
+
+    def run(self):
+        """
+        Performs the simulation
+        """
+        raise NotImplementedError()
@@ -100,4 +100,4 @@ def fdpf(Ybus, Sbus, V0, Bp_solver, Bpp_solver, pv, pq, tol=1e-3, max_it=50, ver
         if normP < tol and normQ < tol:
             converged = 1
 
-    return V, converged, max([normP, normQ])
+    return V, converged, max([normP, normQ]), i
@@ -89,4 +89,4 @@ def gausspf(Ybus, Sbus, V0, ref, pv, pq, tol=1e-3, max_it=50, verbose=False):
         if normF < tol:
             converged = 1
 
-    return V, converged, normF
+    return V, converged, normF, i
@@ -2,13 +2,14 @@ import numpy as np
 from numpy import where, zeros, ones, mod, conj, array, dot, complex128
 from numpy import poly1d, r_, eye, hstack, diag, linalg, Inf
 
-from itertools import product
-
 from scipy import fftpack
-from scipy.linalg import solve
 
 from scipy.sparse.linalg import factorized, spsolve
-from scipy.sparse import issparse, csr_matrix as sparse
+from scipy.sparse import issparse, csr_matrix as sparse, csc_matrix, coo_matrix, diags
+
+from .Telemetry import get_logger
+
+logger = get_logger('HELMPowerFlow')
 
 # just in time compiler
 # from numba import jit
@@ -35,91 +36,88 @@ def pre_process(n_bus, Ymat, slack_indices, Vset, S, types):
         types: Vector of nde types
 
     Output:
-        Yred: Reduced admittance matrix (Without the rows and columns belonging to slack buses)
+        Ysys: Real expanded system matrix (2 n_bus x 2 n_bus, sparse CSC) with the PV columns and slack rows replaced
+
+        Ypv: Real expanded columns of the PV buses (2 n_bus x npv, sparse CSC)
 
-        I: Matrix of currents (In practice only one slack bus is selected, hence it is a vector) injected by the slack buses
+        F: Correction factor (twice the sum of every row of the admittance matrix)
 
-        Sred: Array of power injections of the buses that are not of type slack
+        types: Array of types of the buses
 
-        types_red: Array of types of the buses that are not of type slack
+        Vset: Copy of the voltage set points
+
+        S: Copy of the power injections
 
         non_slack_indices: Array of indices of the buses that are not of type slack
+
+        map_idx: Position of every bus in the PQ or PV arrays
+
+        map_w: Position of every bus in the inverse coefficients structure
+
+        npq, npv: Number of PQ and PV buses
+
+        pv, pq: Arrays of indices of the PV and PQ buses
     """
 
     # Compose the list of buses indices excluding the indices of the slack buses
-    non_slack_indices = list(range(n_bus))
-    for i in slack_indices[::-1]:
-        non_slack_indices.pop(i)
-    non_slack_indices = array(non_slack_indices)
+    non_slack_indices = np.delete(np.arange(n_bus), slack_indices)
 
     # Types of the non slack buses
     # types_red = types[non_slack_indices]
 
-    # now to have efficient arrays of coefficients
-    map_idx = zeros(len(types), dtype=np.int)
-    map_w = zeros(len(types), dtype=np.int)
-    npq = 0
-    npv = 0
-    npqpv = 0
-
     pq = where(types == 1)[0]
     pv = where(types == 2)[0]
     vd = where(types == 3)[0]
+    pqpv = where((types == 1) | (types == 2))[0]
 
-    for i in range(len(types)):
-        if types[i] == 1:  # PQ
-            map_idx[i] = npq
-            map_w[i] = npqpv
-            npq += 1
-            npqpv += 1
-        elif types[i] == 2:  # PV
-            map_idx[i] = npv
-            map_w[i] = npqpv
-            npv += 1
-            npqpv += 1
+    npq = len(pq)
+    npv = len(pv)
+
+    # now to have efficient arrays of coefficients
+    map_idx = zeros(len(types), dtype=int)
+    map_w = zeros(len(types), dtype=int)
+    map_idx[pq] = np.arange(npq)
+    map_idx[pv] = np.arange(npv)
+    map_w[pqpv] = np.arange(len(pqpv))
 
     # correction factor
     F = np.ndarray.flatten(Ymat * ones(n_bus, dtype=complex_type)) * 2
 
     # create the modified admittance matrix (Ytrans)
-    Ytrans = Ymat.copy() - np.diag(F/2)
-
-    # print(types)
-
-    # build the expanded system reduced matrix
-    Ysys = zeros((2*n_bus, 2*n_bus))
-
-    for a,b in product(range(n_bus), range(n_bus)):
-        Ysys[2*a, 2*b] = Ytrans[a, b].real
-        Ysys[2*a, 2*b+1] = -Ytrans[a, b].imag
-        Ysys[2*a+1, 2*b] = Ytrans[a, b].imag
-        Ysys[2*a+1, 2*b+1] = Ytrans[a, b].real
-    # print('Ymat\n', Ytrans)
-    # print('Ysys\n', Ysys)
-
-    # set pv column
-    for a in pv:
-        b = a
-        Ysys[:, 2*b] = zeros(2 * n_bus)
-        # Ysys[a*2, b*2+1] = 0
-        Ysys[a*2+1, b*2] = 1
-
-    # set vd elements
-    for a in vd:
-        Ysys[a*2, :] = zeros(2 * n_bus)
-        Ysys[a*2 + 1, :] = zeros(2 * n_bus)
-        Ysys[a*2, a*2] = 1
-        Ysys[a*2+1, a*2+1] = 1
-    # print('Ysys\n', Ysys)
-
-    # build the PV matrix
-    Ypv = zeros((2 * n_bus, npv))
-    for a, b in product(r_[pq, pv], pv):
-        kk = map_idx[b]
-        Ypv[2*a, kk] = Ytrans[a, b].real
-        Ypv[2*a+1, kk] = Ytrans[a, b].imag
-    # print('Ypv\n', Ypv)
-
+    Ytrans = coo_matrix(Ymat - diags(F / 2))
+    Ytrans.sum_duplicates()
+    a = Ytrans.row
+    b = Ytrans.col
+    y = Ytrans.data
+
+    # build the expanded system reduced matrix: every admittance is replaced by the 2x2 block
+    #   | G  -B |
+    #   | B   G |
+    rows = r_[2 * a, 2 * a, 2 * a + 1, 2 * a + 1]
+    cols = r_[2 * b, 2 * b + 1, 2 * b, 2 * b + 1]
+    vals = r_[y.real, -y.imag, y.imag, y.real]
+
+    # set pv column: the real part of the voltage is known, its column is replaced by the one of the reactive power
+    is_pv = types == 2
+    keep = ~(((cols % 2) == 0) & is_pv[cols // 2])
+
+    # set vd elements: the rows of the slack buses are replaced by identity rows
+    is_vd = types == 3
+    keep &= ~is_vd[rows // 2]
+
+    rows = r_[rows[keep], 2 * pv + 1, 2 * vd, 2 * vd + 1]
+    cols = r_[cols[keep], 2 * pv, 2 * vd, 2 * vd + 1]
+    vals = r_[vals[keep], ones(npv), ones(len(vd)), ones(len(vd))]
+
+    Ysys = csc_matrix((vals, (rows, cols)), shape=(2 * n_bus, 2 * n_bus))
+    Ysys.eliminate_zeros()
+
+    # build the PV matrix: the columns of the PV buses (rows of the PQ and PV buses only)
+    sel = is_pv[b] & ~is_vd[a]
+    a_pv = a[sel]
+    kk = map_idx[b[sel]]
+    Ypv = csc_matrix((r_[y[sel].real, y[sel].imag], (r_[2 * a_pv, 2 * a_pv + 1], r_[kk, kk])), shape=(2 * n_bus, npv))
+    Ypv.eliminate_zeros()
 
     Vset2 = Vset.copy()
 
@@ -128,18 +126,24 @@ def pre_process(n_bus, Ymat, slack_indices, Vset, S, types):
     return Ysys, Ypv, F, types, Vset2, S2, non_slack_indices, map_idx, map_w, npq, npv, pv, pq
 
 # @jit(cache=True)
-def RHS(n, nbus, pv, F, Ypv, S, Vset, Vset_abs2, C, W, Q, types, map_idx, map_w, useFFT):
+def RHS(n, nbus, pv, pq, vd, F, Ypv, S, Vset, Vset_abs2, C, W, Q, map_w, useFFT):
     """
     Right hand side calculation.
 
     Args:
         n: Order of the coefficients
 
-        nbus: Number of buses (not counting the slack buses)
+        nbus: Number of buses
+
+        pv: Array of indices of the PV buses
 
-        Yrow: Vector where every elements the sum of the corresponding row of the reduced admittance matrix)
+        pq: Array of indices of the PQ buses
 
-        I: Vector of current injections (nbus elements)
+        vd: Array of indices of the slack buses
+
+        F: Vector where every elements the sum of the corresponding row of the reduced admittance matrix)
+
+        Ypv: Real expanded columns of the PV buses (2 * nbus x npv elements)
 
         S: Vector of power injections (nbus elements)
 
@@ -149,44 +153,29 @@ def RHS(n, nbus, pv, F, Ypv, S, Vset, Vset_abs2, C, W, Q, types, map_idx, map_w,
 
         C: Voltage coefficients (Ncoeff x nbus elements)
 
-        X: Weighted coefficients (Ncoeff x nbus elements)
-
-        R: Voltage convolution coefficients (Ncoeff x nbus elements)
+        W: Inverse coefficients structure (Ncoeff x npq+npv elements)
 
-        W: Inverse coefficients structure (Ncoeff x nbus elements)
+        Q: Reactive power coefficients of the PV buses (Ncoeff x npv elements)
 
-        types: Types of the non slack buses (nbus elements)
+        map_w: Position of every bus in the inverse coefficients structure
 
     Output:
         rhs: Right hand side vector to solve the coefficients (2 * nbus elements)
-    """
-
-    rhs = np.empty(2 * nbus)
-
-    # print('\n\n n = ', n)
 
-    for k in range(nbus):
+        Vre: Real part of the voltage coefficient of order n for the PV buses (npv elements)
+    """
 
-        if types[k] == 1:  # PQ
-            val = RHS_PQ(n, k, F, C, S, W, map_w)
-            # print("RHS_PQ("+str(k) + ", " + str(n) + ")" + str(val))
-        elif types[k] == 2:  # PV
-            val = RHS_PV(n, k, F, S, C, Q, W, map_idx, map_w, useFFT)
-            # print("RHS_PV("+str(k) + ", " + str(n) + ")" + str(val))
-        elif types[k] == 3:  # VD
-            val = RHS_VD(n, k, Vset)
-            # print("RHS_PVD("+str(k) + ", " + str(n) + ")" + str(val))
+    val = zeros(nbus, dtype=complex_type)
+    val[pq] = RHS_PQ(n, pq, F, C, S, W, map_w)
+    val[pv] = RHS_PV(n, pv, F, S, C, Q, W, map_w)
+    val[vd] = RHS_VD(n, vd, Vset)
 
-        rhs[2 * k] = val.real
-        rhs[2 * k + 1] = val.imag
+    rhs = np.empty(2 * nbus)
+    rhs[0::2] = val.real
+    rhs[1::2] = val.imag
 
-    Vre = ones(len(pv))
-    # if n>0:
-    for k in pv:
-        kk = map_idx[k]
-        Vre[kk] = calc_Vre(n, k, C, Vset_abs2, useFFT).real
-        rhs -= Ypv[:, kk] * Vre[kk]
-    # print('vre[' + str(n) + '] = ' + str(Vre))
+    Vre = calc_Vre(n, pv, C, Vset_abs2, useFFT).real
+    rhs -= Ypv * Vre
 
     return rhs, Vre
 
@@ -198,19 +187,19 @@ def delta(n, k):
 # @jit(cache=True)
 def RHS_VD(n, k, Vset):
     """
-    Right hand side calculation for a PQ bus.
+    Right hand side calculation for the slack buses.
 
     Args:
         n: Order of the coefficients
 
-        k: Index of the bus
+        k: Array of indices of the slack buses
 
-        Vset: set voltage of the node
+        Vset: set voltage of the nodes
     Output:
-        Right hand side value for slack nodes
+        Right hand side values for slack nodes
     """
-    if n==0:
-        return complex_type(1) * delta(n, 0)
+    if n == 0:
+        return ones(len(k), dtype=complex_type)
     else:
         return (Vset[k] - complex_type(1)) * delta(n, 1)
 
@@ -218,25 +207,27 @@ def RHS_VD(n, k, Vset):
 # @jit(cache=True)
 def RHS_PQ(n, k, F, C, S, W, map_w):
     """
-    Right hand side calculation for a PQ bus.
+    Right hand side calculation for the PQ buses.
 
     Args:
         n: Order of the coefficients
 
-        k: Index of the bus
+        k: Array of indices of the PQ buses
 
         F: Vector where every elements the sum of the corresponding row of the reduced admittance matrix)
 
-        I: Vector of current injections (nbus elements)
+        C: Voltage coefficients (Ncoeff x nbus elements)
 
         S: Vector of power injections (nbus elements)
 
-        W: Inverse coefficients structure (Ncoeff x nbus elements)
+        W: Inverse coefficients structure (Ncoeff x npq+npv elements)
+
+        map_w: Position of every bus in the inverse coefficients structure
     Output:
-        Right hand side value
+        Right hand side values
     """
     if n == 0:
-        return 0
+        return zeros(len(k), dtype=complex_type)
 
     else:
         kw = map_w[k]
@@ -244,98 +235,75 @@ def RHS_PQ(n, k, F, C, S, W, map_w):
 
 
 # @jit(cache=True)
-def calc_W(n, k, kw, C, W, map_idx, useFFT):
+def calc_W(n, k, kw, C, W, useFFT):
     """
-    Calculation of the inverse coefficients W. (only applicable for PQ buses)
+    Calculation of the inverse coefficients W. (only applicable for PQ and PV buses)
 
     Args:
         n: Order of the coefficients
 
-        k: Index of the bus
+        k: Array of indices of the buses
+
+        kw: Positions of the buses in the inverse coefficients structure
 
         C: Voltage coefficients (Ncoeff x nbus elements)
 
-        W: Inverse coefficients structure (Ncoeff x nbus elements)
+        W: Inverse coefficients structure (Ncoeff x npq+npv elements)
 
     Output:
-        Inverse coefficient of order n for the bus k
+        Inverse coefficients of order n for the buses k
     """
 
-    # if n == 0:
-    #     res = complex_type(1)
-    # else:
-    #     res = complex_type(0)
-    #     kk = map_idx[k]
-    #     for l in range(n):
-    #         res -= W[l, kk] * conj(C[n-l, k])
-    #
-    # res /= conj(C[0, k])
-
     if n == 0:
-        res = complex_type(1)
+        res = ones(len(k), dtype=complex_type)
     else:
-        # kk = map_idx[k]
-
         if useFFT:
-            a = fftpack.fft(W[:, kw])
-            b = fftpack.fft(conj(C[:, k]))
-            c = a * b
-            e = fftpack.ifft(c)
-            res = -e[n]
+            # circular convolution of the n+1 first coefficients
+            a = fftpack.fft(W[:n+1, kw], axis=0)
+            b = fftpack.fft(conj(C[:n+1, k]), axis=0)
+            e = fftpack.ifft(a * b, axis=0)
+            res = -e[n, :]
         else:
-            res = complex_type(0)
-            for l in range(n):
-                res -= W[l, kw] * C[n-l, k]
-                # print('### W['+str(l)+',' + str(k)+'] * V[' + str(n-l) + ',' + str(k) + '] = ' + str(W[l, kw] * C[n-l, k]))
+            # sum of W[l] * C[n-l] for l = 0 ... n-1
+            res = -np.einsum('ij,ij->j', W[:n, kw], C[n:0:-1, k])
 
     res /= conj(C[0, k])
 
-    # print('# W[' + str(n)+',' + str(k)+'] = ' + str(res))
-
     return res
 
 
 # @jit(cache=True)
-def RHS_PV(n, k, F, S, C, Q, W, map_idx, map_w, useFFT):
+def RHS_PV(n, k, F, S, C, Q, W, map_w):
     """
-    Right hand side calculation for a PQ bus.
+    Right hand side calculation for the PV buses.
 
     Args:
         n: Order of the coefficients
 
-        k: Index of the bus
+        k: Array of indices of the PV buses (Q has their coefficients in the same order)
 
         F: Vector where every elements the sum of the corresponding row of the reduced admittance matrix)
 
-        I: Vector of current injections (nbus elements)
-
         S: Vector of power injections (nbus elements)
 
-        Vset_abs2: Vector with the voltage set points squared. (nbus elements)
-
         C: Voltage coefficients (Ncoeff x nbus elements)
 
-        X: Weighted coefficients (Ncoeff x nbus elements)
+        Q: Reactive power coefficients of the PV buses (Ncoeff x npv elements)
 
-        R: Voltage convolution coefficients (Ncoeff x nbus elements)
+        W: Inverse coefficients structure (Ncoeff x npq+npv elements)
 
-        W: Inverse coefficients structure (Ncoeff x nbus elements)
+        map_w: Position of every bus in the inverse coefficients structure
     Output:
-        Right hand side value
+        Right hand side values
     """
-    kk = map_idx[k]
     if n == 0:
-        return 0  # -1j * Q[0, kk] / conj(C[0, k])
+        return zeros(len(k), dtype=complex_type)  # -1j * Q[0, kk] / conj(C[0, k])
 
     else:
         kw = map_w[k]
-        # qw = calc_QW(n, k, kk, kw, Q, W, useFFT)
-        # rhs = S[k].real * conj(W[n-1, kw]) - 1j * qw - F[k] * C[n-1, k]
 
-
-        val = complex_type(0)
-        for l in range(1, n):   # this includes the n-1
-            val += Q[l, kk] * W[n-l, kw].conjugate()
+        # sum of Q[l] * conj(W[n-l]) for l = 1 ... n-1
+        val = np.einsum('ij,ij->j', Q[1:n, :], W[n-1:0:-1, kw].conjugate())
 
         P = S[k].real
         n1 = n-1
@@ -350,10 +318,9 @@ def calc_Vre(n, k, C, Vset_abs2, useFFT):
     Compute the real part of the voltage for PV ndes
     Args:
         n: order
-        k: PV node index
+        k: Array of indices of the PV nodes
+        C: Voltage coefficients (Ncoeff x nbus elements)
         Vset_abs2: Square of the set voltage module
-        R: Vo
-        map_idx: Voltage convolutions
 
     Returns:
         Real part of the voltage for the PV nodes
@@ -372,23 +339,21 @@ def calc_R(n, k, C, useFFT):
     Args:
         n: Order of the coefficients
 
-        k: Index of the bus
+        k: Array of indices of the buses
 
         C: Voltage coefficients (Ncoeff x nbus elements)
 
     Output:
-        Convolution coefficient of order n for the bus k
+        Convolution coefficients of order n for the buses k
     """
 
     if useFFT:
-        a = fftpack.fft(C[:, k])
-        e = fftpack.ifft(a * a.conjugate())
-        # e = fftpack.ifft(a * a)
-        result = e[n]
+        a = fftpack.fft(C[:n+1, k], axis=0)
+        e = fftpack.ifft(a * a.conjugate(), axis=0)
+        result = e[n, :]
     else:
-        result = complex_type(0)
-        for l in range(n+1):
-            result += C[l, k] * C[n-l, k].conjugate()
+        # sum of C[l] * conj(C[n-l]) for l = 0 ... n
+        result = np.einsum('ij,ij->j', C[:n+1, k], C[n::-1, k].conjugate())
 
     return result
 
@@ -430,6 +395,9 @@ def epsilon(Sn, n, E):
         AND THE SUMMATION OF DIVERGENT SERIES
 
         by Ernst Joachim Weniger
+
+    Several series are accelerated at once when Sn is a vector (one partial sum per series) and E is a matrix (one
+    column per series). Only the new partial sum Sn of order n is processed: E keeps the last diagonal of the table.
     """
     Zero = complex_type(0)
     One = complex_type(1)
@@ -439,26 +407,21 @@ def epsilon(Sn, n, E):
     E[n] = Sn
 
     if n == 0:
-        estim = Sn
+        estim = np.copy(Sn)
     else:
         AUX2 = Zero
 
         for j in range(n, 0, -1):  # range from n to 1 (both included)
             AUX1 = AUX2
-            AUX2 = E[j-1]
+            AUX2 = E[j-1].copy()
             DIFF = E[j] - AUX2
-
-            if abs(DIFF) <= Tiny:
-                E[j-1] = Huge
-            else:
-                if DIFF == 0:
-                    DIFF = Tiny
-                E[j-1] = AUX1 + One / DIFF
+            DIFF = np.where(DIFF == 0, Tiny, DIFF)
+            E[j-1] = np.where(abs(DIFF) <= Tiny, Huge, AUX1 + One / DIFF)
 
         if mod(n, 2) == 0:
-            estim = E[0]
+            estim = E[0].copy()
         else:
-            estim = E[1]
+            estim = E[1].copy()
 
     return estim, E
 
@@ -470,13 +433,20 @@ def pade_approximation(n, an, s=1):
     point s
 
     Arguments:
-        an: coefficient series
+        an: coefficient series (vector), or several series as the columns of a matrix
         n:  order of the series
         s: point of approximation
 
     Returns:
-        pade approximation at s
+        pade approximation at s, numerator and denominator coefficients
+        (one value and one row of coefficients per series when an is a matrix)
     """
+    an = np.asarray(an)
+    single = an.ndim == 1
+    if single:
+        an = an.reshape(-1, 1)
+    m = an.shape[1]
+
     nn = int(n/2)
     if mod(nn, 2) == 0:
         nn -= 1
@@ -484,33 +454,26 @@ def pade_approximation(n, an, s=1):
     L = nn
     M = nn
 
-    an = np.ndarray.flatten(an)
-    rhs = an[L+1:L+M+1]
+    # denominator systems of all the series (m x L x M): C[:, i, :] = an[L-M+i+1:L+i+1]
+    idx = (L - M + 1) + np.arange(L).reshape(-1, 1) + np.arange(M)
+    C = an[idx, :].transpose(2, 0, 1)
+    rhs = an[L+1:L+M+1, :].T
 
-    C = zeros((L, M), dtype=complex_type)
-    for i in range(L):
-        k = i + 1
-        C[i, :] = an[L-M+k:L+k]
+    b = linalg.solve(C, -rhs[:, :, np.newaxis])[:, :, 0]  # bn to b1
+    b = hstack((ones((m, 1), dtype=b.dtype), b[:, ::-1]))  # b0 = 1
 
-    b = solve(C, -rhs)  # bn to b1
-    b = r_[1, b[::-1]]  # b0 = 1
+    # numerator: a[k] = sum(an[k-j] * b[j], j = 0 ... k)
+    d = np.arange(L+1).reshape(-1, 1) - np.arange(M+1)
+    T = an[np.maximum(d, 0), :] * (d >= 0)[:, :, np.newaxis]
+    a = np.einsum('kjm,mj->mk', T, b)
 
-    a = zeros(L+1, dtype=complex_type)
-    a[0] = an[0]
-    for i in range(L):
-        val = complex_type(0)
-        k = i + 1
-        for j in range(k+1):
-            val += an[k-j] * b[j]
-        a[i+1] = val
+    p = a.dot(s ** np.arange(L+1))
+    q = b.dot(s ** np.arange(M+1))
 
-    p = complex_type(0)
-    q = complex_type(0)
-    for i in range(L+1):
-        p += a[i] * s**i
-        q += b[i] * s**i
-
-    return p/q, a, b
+    if single:
+        return p[0] / q[0], a[0], b[0]
+    else:
+        return p / q, a, b
 
 
 # @jit(cache=True)
@@ -564,16 +527,14 @@ def interprete_solution(nbus, npv, types, x_sol, Vre, map_idx):
     Returns:
         Voltages coeffients and reactive power coefficients for the PV nodes at the order of x_sol
     """
-    C = zeros(nbus, dtype=complex_type)
+    C = x_sol[0::2] + 1j * x_sol[1::2]
     Q = zeros(npv)
 
-    for k in range(nbus):
-        if types[k] == 2:
-            kk = map_idx[k]
-            Q[kk] = x_sol[2 * k]
-            C[k] = Vre[kk] + 1j * x_sol[2 * k+1]
-        else:
-            C[k] = x_sol[2 * k] + 1j * x_sol[2 * k+1]
+    # the PV buses solve for the reactive power instead of the real part of the voltage
+    pv = where(types == 2)[0]
+    kk = map_idx[pv]
+    Q[kk] = x_sol[2 * pv]
+    C[pv] = Vre[kk] + 1j * x_sol[2 * pv + 1]
 
     return C, Q
 
@@ -615,21 +576,27 @@ def helm(admittances, slackIndices, maxcoefficientCount, powerInjections, voltag
                                                slack_indices=array(slackIndices, dtype=int),
                                                Vset=voltageSetPoints, S=powerInjections,
                                                types=types)
-    nbus_red = np.shape(Ytrans)[0]
+
+    # number of coefficient orders that may be computed (0 ... maxcoefficientCount)
+    n_max = maxcoefficientCount + 1
 
     # declare the matrix of coefficients that will lead to the voltage computation
-    C = zeros((0, nbus), dtype=complex_type)
+    C = zeros((n_max, nbus), dtype=complex_type)
 
     # auxiliary array for the epsilon algorithm
-    E_v = zeros((0, nbus), dtype=complex_type)
-    E_q = zeros((0, npv), dtype=complex_type)
+    E_v = zeros((n_max, nbus), dtype=complex_type)
+    E_q = zeros((n_max, npv), dtype=complex_type)
 
     # Declare the inverse coefficients vector
     # (it is actually a matrix; a vector of coefficients per coefficient order)
-    W = zeros((0, npq+npv), dtype=complex_type)
+    W = zeros((n_max, npq+npv), dtype=complex_type)
 
     # Reactive power on the PV nodes
-    Q = zeros((0, npv), dtype=complex_type)
+    Q = zeros((n_max, npv), dtype=complex_type)
+
+    # buses that are not slack, and their position in the inverse coefficients structure
+    vd = where(types == 3)[0]
+    non_slack_w = map_w[non_slack_indices]
 
     # Squared values of the voltage module for the buses that are not of slack type
     Vset_abs2 = abs(voltageSetPoints) **2
@@ -651,15 +618,8 @@ def helm(admittances, slackIndices, maxcoefficientCount, powerInjections, voltag
 
     while n <= maxcoefficientCount and not converged and inside_precission:
 
-        # Reserve coefficients memory space
-        C = np.vstack((C, np.zeros((1, nbus), dtype=complex_type)))
-        E_v = np.vstack((E_v, np.zeros((1, nbus), dtype=complex_type)))
-        E_q = np.vstack((E_q, np.zeros((1, npv))))
-        W = np.vstack((W, np.zeros((1, npq+npv), dtype=complex_type)))
-        Q = np.vstack((Q, np.zeros((1, npv), dtype=complex_type)))
-
         # get the system independent term to solve the coefficients
-        rhs, Vre = RHS(n, nbus, pv, F, Ypv, S, Vset, Vset_abs2, C, W, Q, types, map_idx, map_w, useFFT)
+        rhs, Vre = RHS(n, nbus, pv, pq, vd, F, Ypv, S, Vset, Vset_abs2, C, W, Q, map_w, useFFT)
 
         # Solve the linear system to obtain the new coefficients
         x_sol = solve(rhs)
@@ -675,35 +635,30 @@ def helm(admittances, slackIndices, maxcoefficientCount, powerInjections, voltag
             Sn_q += Q[n, :]
 
         # Update the inverse voltage coefficients W for the non slack nodes
-        for k in non_slack_indices:
-            kw = map_w[k]  # actual index in the coefficients structure
-            W[n, kw] = calc_W(n, k, kw, C, W, map_idx, useFFT)
+        W[n, non_slack_w] = calc_W(n, non_slack_indices, non_slack_w, C, W, useFFT)
 
         # calculate the reactive power
-        for k in pv:
-            kk = map_idx[k]
-            if usePade:
-                if mod(n, 2) == 0 and n > 2:
-                    q, _ , _ = pade_approximation(n, Q)
-                    S[k] = S[k].real + 1j * q.real
-            else:
-                q, E_q[:, kk] = epsilon(Sn_q[kk], n, E_q[:, kk])
-                S[k] = S[k].real + 1j * q
+        if usePade:
+            if mod(n, 2) == 0 and n > 2 and npv > 0:
+                q, _, _ = pade_approximation(n, Q[:n+1, :])
+                S[pv] = S[pv].real + 1j * q.real
+        else:
+            q, E_q = epsilon(Sn_q, n, E_q)
+            S[pv] = S[pv].real + 1j * q
 
         # calculate the voltages
-        for k in non_slack_indices:
-            if usePade:
-                if mod(n, 2) == 0 and n > 2:
-                    v, _, _ = pade_approximation(n, C[:, k])
-                    voltages_vector[k] = v
-            else:
-                voltages_vector[k], E_v[:, k] = epsilon(Sn_v[k], n, E_v[:, k])
-
-            if np.isnan(voltages_vector[k]):
-                print('Maximum precission reached at ', n)
-                voltages_vector = Vred_last
-                inside_precission = False
-                break
+        if usePade:
+            if mod(n, 2) == 0 and n > 2:
+                v, _, _ = pade_approximation(n, C[:n+1, non_slack_indices])
+                voltages_vector[non_slack_indices] = v
+        else:
+            v, E_v = epsilon(Sn_v, n, E_v)
+            voltages_vector[non_slack_indices] = v[non_slack_indices]
+
+        if np.isnan(voltages_vector[non_slack_indices]).any():
+            logger.debug('Maximum precision reached at %d', n)
+            voltages_vector = Vred_last
+            inside_precission = False
 
         Vred_last = voltages_vector.copy()
 
@@ -732,6 +687,9 @@ def helm(admittances, slackIndices, maxcoefficientCount, powerInjections, voltag
 
     # return Vred_last, Ytrans, F, C, W, Q, errors, converged
 
+    # coefficients that have been computed
+    C = C[:n, :]
+
     return Vred_last, converged, normF, C, #W, X, R, H, Yred, Yrow, Iinj, errors
 
 
@@ -754,7 +712,6 @@ def helm_bifurcation_point(C, slackIndices):
             asint = np.roots(q[::-1])
             asint = np.sort(abs(asint))
             asint = asint[asint > 2]
-            print('Asymptotes', asint)
             # print('Asymptote:', asint[0])
 
             n = len(asint)
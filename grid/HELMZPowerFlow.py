@@ -29,7 +29,8 @@ def helmz(admittances, slackIndices, maxcoefficientCount, powerInjections, volta
     best_V = voltageSetPoints
     converged = False
     normF = 10
+    iterations = 0
 
-    return best_V, converged, normF
+    return best_V, converged, normF, iterations
 
 
@@ -11,7 +11,8 @@ from numpy import array, angle, exp, linalg, r_, Inf, conj, diag, asmatrix, asar
 
 from scipy.sparse import issparse, csr_matrix as sparse, hstack, vstack
 
-from scipy.sparse.linalg import spsolve
+from .JacobianBuilder import JacobianBuilder
+from .SparseLUSolver import SparseLUSolver
 
 import scipy
 scipy.ALLOW_THREADS = True
@@ -83,7 +84,7 @@ def dSbus_dV(Ybus, V):
     return dS_dVm, dS_dVa
 
 
-def mu(Ybus, J, F, dV, dx, pvpq, pq):
+def mu(Ybus, J, F, dV, dx, pvpq, pq, jac_builder=None):
     """
     Calculate the Iwamoto acceleration parameter as described in:
     "A Load Flow Calculation Method for Ill-Conditioned Power Systems" by Iwamoto, S. and Tamura, Y.
@@ -95,24 +96,28 @@ def mu(Ybus, J, F, dV, dx, pvpq, pq):
         dx: solution vector as calculated dx = solve(J, F)
         pvpq: array of the pq and pv indices
         pq: array of the pq indices
+        jac_builder: JacobianBuilder of (Ybus, pv, pq) (optional)
 
     Returns:
         the Iwamoto's optimal multiplier for ill conditioned systems
     """
     # evaluate the Jacobian of the voltage derivative
-    dS_dVm, dS_dVa = dSbus_dV(Ybus, dV)  # compute the derivatives
-
-    J11 = dS_dVa[array([pvpq]).T, pvpq].real
-    J12 = dS_dVm[array([pvpq]).T, pq].real
-    J21 = dS_dVa[array([pq]).T, pvpq].imag
-    J22 = dS_dVm[array([pq]).T, pq].imag
-
     # theoretically this is the second derivative matrix
     # since the Jacobian has been calculated with dV instead of V
-    J2 = vstack([
-            hstack([J11, J12]),
-            hstack([J21, J22])
-            ], format="csr")
+    if jac_builder is not None:
+        J2 = jac_builder.update_aux(dV)
+    else:
+        dS_dVm, dS_dVa = dSbus_dV(Ybus, dV)  # compute the derivatives
+
+        J11 = dS_dVa[array([pvpq]).T, pvpq].real
+        J12 = dS_dVm[array([pvpq]).T, pq].real
+        J21 = dS_dVa[array([pq]).T, pvpq].imag
+        J22 = dS_dVm[array([pq]).T, pq].imag
+
+        J2 = vstack([
+                hstack([J11, J12]),
+                hstack([J21, J22])
+                ], format="csr")
 
     a = F
     b = J * dx
@@ -128,7 +133,7 @@ def mu(Ybus, J, F, dV, dx, pvpq, pq):
     return roots[2].real
 
 
-def IwamotoNR(Ybus, Sbus, V0, pv, pq, tol, max_it, robust=False):
+def IwamotoNR(Ybus, Sbus, V0, pv, pq, tol, max_it, robust=False, jac_builder=None, lin_solver=None):
     """
     Solves the power flow using a full Newton's method.
 
@@ -155,8 +160,11 @@ def IwamotoNR(Ybus, Sbus, V0, pv, pq, tol, max_it, robust=False):
         pq: Array with the indices of the PQ buses
         tol: Tolerance
         max_it: Maximum number of iterations
-        verbose: Boolean variable for the verbose mode activation
+        robust: Use the Iwamoto optimal step multiplier?
+        jac_builder: JacobianBuilder instance for (Ybus, pv, pq) to reuse (optional, one is created if None)
+        lin_solver: SparseLUSolver to reuse (optional, one is created if None)
     Returns:
+        Voltages, convergence flag, mismatch norm and number of iterations
 
     @see: L{runpf}
 
@@ -164,6 +172,15 @@ def IwamotoNR(Ybus, Sbus, V0, pv, pq, tol, max_it, robust=False):
     @Author: Santiago Penate Vera
     """
 
+    # Jacobian structure (computed once, refilled at every iteration)
+    if jac_builder is None or not jac_builder.matches(Ybus, pv, pq):
+        jac_builder = JacobianBuilder(Ybus, pv, pq)
+
+    # linear solver (keeps the ordering of J between iterations and calls)
+    if lin_solver is None:
+        lin_solver = SparseLUSolver()
+    lin_solver.invalidate()
+
     # initialize
     converged = 0
     i = 0
@@ -205,20 +222,10 @@ def IwamotoNR(Ybus, Sbus, V0, pv, pq, tol, max_it, robust=False):
         i += 1
 
         # evaluate Jacobian
-        dS_dVm, dS_dVa = dSbus_dV(Ybus, V)  # compute the derivatives
-
-        J11 = dS_dVa[array([pvpq]).T, pvpq].real
-        J12 = dS_dVm[array([pvpq]).T, pq].real
-        J21 = dS_dVa[array([pq]).T, pvpq].imag
-        J22 = dS_dVm[array([pq]).T, pq].imag
-
-        J = vstack([
-                hstack([J11, J12]),
-                hstack([J21, J22])
-            ], format="csr")
+        J = jac_builder.update(V)
 
         # compute update step
-        dx = spsolve(J, F)
+        dx = lin_solver.solve(J, F)
 
         # reassign the solution vecor
         if npv:
@@ -230,7 +237,7 @@ def IwamotoNR(Ybus, Sbus, V0, pv, pq, tol, max_it, robust=False):
 
         # update voltage
         if robust:
-            mu_ = mu(Ybus, J, F, dV, dx, pvpq, pq)  # calculate the optimal multiplier for enhanced convergence
+            mu_ = mu(Ybus, J, F, dV, dx, pvpq, pq, jac_builder)  # calculate the optimal multiplier for enhanced convergence
             # print('mu:', mu_)
         else:
             mu_ = 1.0
@@ -247,9 +254,14 @@ def IwamotoNR(Ybus, Sbus, V0, pv, pq, tol, max_it, robust=False):
         F = r_[mis[pv].real, mis[pq].real, mis[pq].imag]  # concatenate again
 
         # check for convergence
+        normF_prev = normF
         normF = linalg.norm(F, Inf)
 
+        # an outdated factorization that does not reduce the mismatch is refreshed (only with dishonest Newton)
+        if normF > normF_prev:
+            lin_solver.invalidate()
+
         if normF < tol:
             converged = 1
 
-    return V, converged, normF
+    return V, converged, normF, i
@@ -0,0 +1,187 @@
+"""
+Power flow Jacobian with a fixed sparsity structure.
+
+The Jacobian of the polar power flow equations
+
+        | dP/dVa[pvpq, pvpq]   dP/dVm[pvpq, pq] |
+    J = |                                       |
+        | dQ/dVa[pq, pvpq]     dQ/dVm[pq, pq]   |
+
+has the sparsity pattern of Ybus (plus its diagonal) restricted to the pv and pq buses. That pattern does not change
+while Ybus and the bus types do not change, so it is computed once together with the maps from every Ybus entry to
+its position(s) in the data array of J. Every Newton iteration then only refills J.data in place.
+"""
+
+import numpy as np
+from numpy import arange, zeros, r_, conj, lexsort, bincount, cumsum, full
+from scipy.sparse import csr_matrix, issparse
+
+
+class JacobianBuilder(object):
+    """
+    Builds the power flow Jacobian for a given (Ybus, pv, pq) set, refilling a CSR matrix of constant structure
+    """
+
+    def __init__(self, Ybus, pv, pq):
+        """
+        Constructor: computes the sparsity structure of J and the index maps
+        Args:
+            Ybus: Admittance matrix (sparse)
+            pv: Array with the indices of the PV buses
+            pq: Array with the indices of the PQ buses
+        """
+        assert issparse(Ybus)
+
+        # matrix this structure was built for
+        self.source = Ybus
+
+        # keep a reference to Ybus when it is already a canonical CSR matrix so that in-place changes of its values
+        # are seen on the next update
+        if Ybus.format == 'csr' and Ybus.has_canonical_format:
+            self.Ybus = Ybus
+        else:
+            self.Ybus = csr_matrix(Ybus)
+            self.Ybus.sum_duplicates()
+
+        self.pv = np.array(pv, dtype=int)
+        self.pq = np.array(pq, dtype=int)
+        self.pvpq = r_[self.pv, self.pq]
+
+        n = self.Ybus.shape[0]
+        npv = len(self.pv)
+        npq = len(self.pq)
+        npvpq = npv + npq
+        self.n = n
+        self.nj = npvpq + npq
+
+        # coordinates of the Ybus entries
+        self.nnz_y = self.Ybus.nnz
+        rows = np.repeat(arange(n), np.diff(self.Ybus.indptr))
+        cols = self.Ybus.indices.copy()
+
+        # the diagonal is always part of the derivatives pattern even if Ybus does not store it
+        has_diag = zeros(n, dtype=bool)
+        has_diag[rows[rows == cols]] = True
+        missing = np.where(~has_diag)[0]
+        rows = r_[rows, missing]
+        cols = r_[cols, missing]
+        self.rows = rows
+        self.cols = cols
+        self.diag_entries = np.where(rows == cols)[0]
+        self.diag_buses = rows[self.diag_entries]
+
+        # position of each bus in the pvpq and pq lists (-1 if not present)
+        pvpq_pos = full(n, -1, dtype=int)
+        pvpq_pos[self.pvpq] = arange(npvpq)
+        pq_pos = full(n, -1, dtype=int)
+        pq_pos[self.pq] = arange(npq)
+
+        # entries of each of the four blocks: the source entry and the coordinates in J
+        r_pvpq = pvpq_pos[rows]
+        c_pvpq = pvpq_pos[cols]
+        r_pq = pq_pos[rows]
+        c_pq = pq_pos[cols]
+
+        e11 = np.where((r_pvpq >= 0) & (c_pvpq >= 0))[0]  # dP/dVa
+        e12 = np.where((r_pvpq >= 0) & (c_pq >= 0))[0]  # dP/dVm
+        e21 = np.where((r_pq >= 0) & (c_pvpq >= 0))[0]  # dQ/dVa
+        e22 = np.where((r_pq >= 0) & (c_pq >= 0))[0]  # dQ/dVm
+
+        j_rows = r_[r_pvpq[e11], r_pvpq[e12], npvpq + r_pq[e21], npvpq + r_pq[e22]]
+        j_cols = r_[c_pvpq[e11], npvpq + c_pq[e12], c_pvpq[e21], npvpq + c_pq[e22]]
+
+        # sort the entries in CSR order: the position of every block entry in J.data
+        order = lexsort((j_cols, j_rows))
+        position = zeros(len(order), dtype=int)
+        position[order] = arange(len(order))
+
+        n11, n12, n21 = len(e11), len(e12), len(e21)
+        self.src11, self.dst11 = e11, position[:n11]
+        self.src12, self.dst12 = e12, position[n11:n11 + n12]
+        self.src21, self.dst21 = e21, position[n11 + n12:n11 + n12 + n21]
+        self.src22, self.dst22 = e22, position[n11 + n12 + n21:]
+
+        indptr = r_[0, cumsum(bincount(j_rows, minlength=self.nj))]
+        indices = j_cols[order]
+
+        self.J = csr_matrix((zeros(len(order)), indices, indptr), shape=(self.nj, self.nj))
+        self.J_aux = None
+
+        # work arrays (one value per Ybus entry)
+        self.y = zeros(len(rows), dtype=complex)
+        self.dS_dVm = zeros(len(rows), dtype=complex)
+        self.dS_dVa = zeros(len(rows), dtype=complex)
+
+    def matches(self, Ybus, pv, pq):
+        """
+        Is this structure valid for the given admittance matrix and bus types?
+        Args:
+            Ybus: Admittance matrix
+            pv: Array with the indices of the PV buses
+            pq: Array with the indices of the PQ buses
+
+        Returns: True if the structure can be reused
+        """
+        return Ybus is self.source and np.array_equal(pv, self.pv) and np.array_equal(pq, self.pq)
+
+    def fill(self, V, data):
+        """
+        Evaluates the Jacobian at V writing the values into data (the data array of a matrix with this structure)
+        Args:
+            V: Voltages vector
+            data: array of length J.nnz
+        """
+        rows = self.rows
+        cols = self.cols
+
+        # admittance values (the missing diagonal entries stay at zero)
+        self.y[:self.nnz_y] = self.Ybus.data
+
+        Ibus = self.Ybus * V
+        Vnorm = V / np.abs(V)
+
+        # dS/dVm = diag(V) * conj(Ybus * diag(Vnorm)) + conj(diag(Ibus)) * diag(Vnorm)
+        np.multiply(self.y, Vnorm[cols], out=self.dS_dVm)
+        np.conjugate(self.dS_dVm, out=self.dS_dVm)
+        np.multiply(self.dS_dVm, V[rows], out=self.dS_dVm)
+
+        # dS/dVa = j * diag(V) * conj(diag(Ibus) - Ybus * diag(V))
+        np.multiply(self.y, V[cols], out=self.dS_dVa)
+        np.conjugate(self.dS_dVa, out=self.dS_dVa)
+        np.multiply(self.dS_dVa, V[rows], out=self.dS_dVa)
+        np.multiply(self.dS_dVa, -1j, out=self.dS_dVa)
+
+        d = self.diag_entries
+        b = self.diag_buses
+        self.dS_dVm[d] += conj(Ibus[b]) * Vnorm[b]
+        self.dS_dVa[d] += 1j * V[b] * conj(Ibus[b])
+
+        data[self.dst11] = self.dS_dVa[self.src11].real
+        data[self.dst12] = self.dS_dVm[self.src12].real
+        data[self.dst21] = self.dS_dVa[self.src21].imag
+        data[self.dst22] = self.dS_dVm[self.src22].imag
+
+    def update(self, V):
+        """
+        Refills the Jacobian at the voltage V
+        Args:
+            V: Voltages vector
+
+        Returns: The Jacobian (CSR matrix, the same object on every call)
+        """
+        self.fill(V, self.J.data)
+        return self.J
+
+    def update_aux(self, V):
+        """
+        Refills the auxiliary matrix (same structure as J) at V.
+        This is used when a second evaluation is needed without overwriting J (i.e. Iwamoto's multiplier)
+        Args:
+            V: Voltages vector (or voltage increments)
+
+        Returns: The auxiliary Jacobian (CSR matrix)
+        """
+        if self.J_aux is None:
+            self.J_aux = csr_matrix((zeros(self.J.nnz), self.J.indices, self.J.indptr), shape=self.J.shape)
+        self.fill(V, self.J_aux.data)
+        return self.J_aux
@@ -0,0 +1,218 @@
+"""
+Streaming statistical moments of the simulation results (i.e. the Monte Carlo samples).
+
+The mean and the sum of squared deviations (M2) of every element are updated one sample at a time with Welford's
+algorithm, which does not lose precision like the sum of squares does. Two sets of moments (i.e. computed by two
+processes over different samples) are merged with Chan's parallel formula, so the result does not depend on how the
+samples were split.
+
+For complex values the M2 is the sum of the squared magnitudes of the deviations: the variance is E[|x - mean|^2].
+The extremes and the quantiles are those of the magnitudes.
+
+The updates work in place over buffers allocated by the constructor: adding a sample does not allocate arrays.
+"""
+
+import numpy as np
+
+
+class QuantileSketch(object):
+    """
+    Streaming estimate of a quantile of every element of an array of real values with the P-square algorithm
+    (Jain & Chlamtac, 1985): five markers per element are moved with a piecewise parabolic interpolation, so the
+    memory does not grow with the number of samples.
+    """
+
+    def __init__(self, n, p):
+        """
+        Constructor
+        @param n: number of values of every sample
+        @param p: quantile estimated (0 < p < 1)
+        """
+        self.p = p
+
+        self.count = 0
+
+        # marker heights and positions (5 x n)
+        self.q = np.zeros((5, n))
+        self.positions = np.tile(np.arange(1.0, 6.0)[:, np.newaxis], (1, n))
+
+        # desired marker positions and their increments (the same for all the elements)
+        self.desired = np.array([1.0, 1.0 + 2.0 * p, 1.0 + 4.0 * p, 3.0 + 2.0 * p, 5.0])
+        self.increments = np.array([0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0])
+
+    def update(self, x):
+        """
+        Adds a sample
+        @param x: array of values
+        """
+        if self.count < 5:
+            # the first five samples are the initial markers
+            self.q[self.count] = x
+            self.count += 1
+            if self.count == 5:
+                self.q.sort(axis=0)
+            return
+
+        self.count += 1
+        q = self.q
+        n = self.positions
+
+        # extend the extremes, and shift the positions of the markers above the sample
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        for i in range(1, 4):
+            n[i] += x < q[i]
+        n[4] += 1.0
+
+        self.desired += self.increments
+
+        # adjust the inner markers that are off their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            move = ((d >= 1.0) & (n[i + 1] - n[i] > 1.0)) | ((d <= -1.0) & (n[i - 1] - n[i] < -1.0))
+            if not move.any():
+                continue
+
+            s = np.sign(d[move])
+            qm, q0, qp = q[i - 1, move], q[i, move], q[i + 1, move]
+            nm, n0, np_ = n[i - 1, move], n[i, move], n[i + 1, move]
+
+            # parabolic prediction, and linear one where the parabola does not keep the markers ordered
+            parabolic = q0 + s / (np_ - nm) * ((n0 - nm + s) * (qp - q0) / (np_ - n0) +
+                                               (np_ - n0 - s) * (q0 - qm) / (n0 - nm))
+            linear = np.where(s > 0, q0 + (qp - q0) / (np_ - n0), q0 - (qm - q0) / (nm - n0))
+
+            q[i, move] = np.where((qm < parabolic) & (parabolic < qp), parabolic, linear)
+            n[i, move] = n0 + s
+
+    def value(self):
+        """
+        Returns the quantile estimate of every element
+        """
+        if self.count == 0:
+            return np.full(self.q.shape[1], np.nan)
+
+        if self.count < 5:
+            # exact quantile of the few samples seen
+            return np.percentile(self.q[:self.count], 100.0 * self.p, axis=0)
+
+        return self.q[2].copy()
+
+
+class Moments(object):
+    """
+    Mean, sum of squared deviations, extremes and (optionally) quantiles of the samples of an array of values
+    """
+
+    def __init__(self, n, dtype=complex, quantiles=()):
+        """
+        Constructor
+        @param n: number of values of every sample
+        @param dtype: type of the values (complex or float)
+        @param quantiles: quantiles of the magnitudes to estimate (i.e. (0.05, 0.5, 0.95)), each one costs a
+                          QuantileSketch update per sample
+        """
+        self.count = 0
+
+        self.mean = np.zeros(n, dtype=dtype)
+
+        self.m2 = np.zeros(n)
+
+        # extremes of the magnitudes
+        self.minimum = np.full(n, np.inf)
+        self.maximum = np.full(n, -np.inf)
+
+        self.sketches = [QuantileSketch(n, p) for p in quantiles]
+
+        # work buffers of the updates
+        self.delta = np.zeros(n, dtype=dtype)
+        self.work = np.zeros(n, dtype=dtype)
+        self.magnitude = np.zeros(n)
+
+    def update(self, x):
+        """
+        Adds a sample
+        @param x: array of values
+        """
+        self.count += 1
+
+        # delta = x - mean; mean += delta / count
+        np.subtract(x, self.mean, out=self.delta)
+        np.divide(self.delta, self.count, out=self.work)
+        self.mean += self.work
+
+        # m2 += Re(delta * conj(x - mean))
+        np.subtract(x, self.mean, out=self.work)
+        np.conjugate(self.work, out=self.work)
+        np.multiply(self.delta, self.work, out=self.work)
+        self.m2 += self.work.real
+
+        np.abs(x, out=self.magnitude)
+        np.minimum(self.minimum, self.magnitude, out=self.minimum)
+        np.maximum(self.maximum, self.magnitude, out=self.maximum)
+
+        for sketch in self.sketches:
+            sketch.update(self.magnitude)
+
+    def update_quantiles(self, magnitude):
+        """
+        Adds the magnitudes of a sample to the quantile sketches only. The sketches cannot be merged, so the samples
+        whose moments are merged from another set of moments are added to the sketches this way.
+        @param magnitude: array of magnitudes of the values
+        """
+        for sketch in self.sketches:
+            sketch.update(magnitude)
+
+    def merge(self, other):
+        """
+        Adds the samples of another set of moments (except to the quantile sketches, see update_quantiles)
+        @param other: Moments of the same values
+        """
+        if other.count == 0:
+            return
+
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + (delta * np.conj(delta)).real * (self.count * other.count / n)
+        self.mean += delta * (other.count / n)
+        self.count = n
+
+        np.minimum(self.minimum, other.minimum, out=self.minimum)
+        np.maximum(self.maximum, other.maximum, out=self.maximum)
+
+    def variance(self):
+        """
+        Returns the sample variance (zero with less than two samples)
+        """
+        if self.count < 2:
+            return np.zeros_like(self.m2)
+        return self.m2 / (self.count - 1)
+
+    def std(self):
+        """
+        Returns the sample standard deviation
+        """
+        return np.sqrt(self.variance())
+
+    def standard_error(self):
+        """
+        Returns the standard error of the mean: the standard deviation of the mean estimate
+        """
+        if self.count < 2:
+            return np.full(len(self.m2), np.inf)
+        return np.sqrt(self.variance() / self.count)
+
+    def max_standard_error(self):
+        """
+        Returns the largest standard error of the mean of all the elements (without allocating arrays)
+        """
+        if self.count < 2:
+            return np.inf
+        return np.sqrt(self.m2.max() / (self.count * (self.count - 1)))
+
+    def quantiles(self):
+        """
+        Returns the quantile estimates of the magnitudes
+        @return: dictionary {quantile: array of values}
+        """
+        return {sketch.p: sketch.value() for sketch in self.sketches}
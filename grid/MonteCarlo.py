@@ -1,18 +1,21 @@
 import numpy as np
-import pandas as pd
 from enum import Enum
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
 from warnings import warn
-from matplotlib import pyplot as plt
-from PyQt4.QtCore import QThread, SIGNAL
-from numpy import zeros, r_
+from grid.Engine import Engine
 import time
 
 from grid.PowerFlow import MultiCircuitPowerFlow
 from grid.BusDefinitions import *
 from grid.GenDefinitions import *
 from grid.TimeSeries import TimeSeries
-import grid.InterpolationNDim as interp_nd
+from grid.ResultStore import ResultSchema
+from grid.Moments import Moments
+from grid.Telemetry import get_logger
+
+logger = get_logger('MonteCarlo')
 
 
 class TimeGroups(Enum):
@@ -21,6 +24,92 @@ class TimeGroups(Enum):
     ByHour = 2
 
 
+class SamplingMethod(Enum):
+    MonteCarlo = 0,
+    LatinHypercube = 1,
+    Sobol = 2,
+    Halton = 3
+
+
+def get_uniforms(method: SamplingMethod, npoints, dimension, rng):
+    """
+    Returns points uniformly distributed in the unit hypercube
+    @param method: SamplingMethod: pseudo random points, a Latin hypercube design, or a scrambled Sobol or Halton
+                   low discrepancy sequence (every call is an independent randomization of the design)
+    @param npoints: number of points (a power of 2 for Sobol)
+    @param dimension: dimension of the points
+    @param rng: random generator (numpy Generator)
+    @return: 2D array (npoints, dimension)
+    """
+    if method == SamplingMethod.MonteCarlo:
+        return rng.uniform(0, 1, (npoints, dimension))
+
+    elif method == SamplingMethod.LatinHypercube:
+        # one point in every one of the npoints strata of every dimension, in random order
+        strata = np.argsort(rng.uniform(0, 1, (npoints, dimension)), axis=0)
+        return (strata + rng.uniform(0, 1, (npoints, dimension))) / npoints
+
+    elif method in (SamplingMethod.Sobol, SamplingMethod.Halton):
+        # the quasi Monte Carlo engines are only needed by these methods (scipy >= 1.7)
+        from scipy.stats import qmc
+
+        # the engines get an integer seed drawn from the stream: the scrambling of some scipy versions does not
+        # advance a Generator given as seed, and every replicate would be the same
+        seed = int(rng.integers(2 ** 63))
+        if method == SamplingMethod.Sobol:
+            engine = qmc.Sobol(dimension, scramble=True, seed=seed)
+        else:
+            engine = qmc.Halton(dimension, scramble=True, seed=seed)
+        return engine.random(npoints)
+
+    else:
+        raise Exception('Unknown sampling method ' + str(method))
+
+
+def draw_samples(stat_groups, load_enabled_idx, gen_enabled_idx, npoints, method: SamplingMethod, rng):
+    """
+    Draws samples of the loads and generators of every time group
+    @param stat_groups: list of StatisticalCharacterization
+    @param load_enabled_idx: indices of the loads sampled
+    @param gen_enabled_idx: indices of the generators sampled
+    @param npoints: number of samples of every group
+    @param method: SamplingMethod of the probabilities of the samples
+    @param rng: random generator (numpy Generator)
+    @return: list with the generators and loads samples (npoints, devices) of every group
+    """
+    samples = list()
+    for stat_group in stat_groups:
+        columns = stat_group.get_columns(load_enabled_idx, gen_enabled_idx)
+        U = get_uniforms(method, npoints, stat_group.get_dimension(columns), rng)
+        samples.append(stat_group.get_values(stat_group.get_probabilities(U, columns), columns, len(load_enabled_idx)))
+    return samples
+
+
+def inverse_cdf(sorted_values, U, columns=None):
+    """
+    Batched inverse of the empirical cumulative density functions given by the columns of a matrix of sorted values
+    (the same as np.interp(u, prob, sorted_values[:, j]) for every element u of the column j of U)
+    @param sorted_values: 2D array with the values of every law sorted (points, laws)
+    @param U: 2D array of probabilities in [0, 1] (samples, columns)
+    @param columns: index of the law of every column of U (None for all the laws)
+    @return: 2D array with the values of the probabilities (samples, columns)
+    """
+    m = sorted_values.shape[0]
+
+    if columns is None:
+        columns = np.arange(sorted_values.shape[1])
+
+    if m == 1:
+        return np.repeat(sorted_values[:, columns], len(U), axis=0)
+
+    # position in the sorted values, and linear interpolation between the two values around it
+    x = U * (m - 1)
+    i = np.minimum(x.astype(int), m - 2)
+    lower = sorted_values[i, columns]
+    upper = sorted_values[i + 1, columns]
+    return lower + (x - i) * (upper - lower)
+
+
 class CDF(object):
     """
     Cumulative density function of a given array f data
@@ -32,14 +121,16 @@ class CDF(object):
         # calculate the proportional values of samples
         self.prob = 1. * np.arange(len(data)) / (len(data) - 1)
 
-    def get_sample(self, npoints=1):
+    def get_sample(self, npoints=1, rng=None):
         """
         Samples a number of uniform distributed points and
         returns the corresponding probability values given the CDF.
         @param npoints: Number of points to sample, 1 by default
+        @param rng: random generator (numpy Generator or RandomState). None uses the numpy global generator
         @return: Corresponding probabilities
         """
-        return np.interp(np.random.uniform(0, 1, npoints), self.prob, self.data_sorted)
+        rng = np.random if rng is None else rng
+        return np.interp(rng.uniform(0, 1, npoints), self.prob, self.data_sorted)
 
     def plot(self, ax=None):
         """
@@ -48,6 +139,7 @@ class CDF(object):
         @return:
         """
         if ax is None:
+            from matplotlib import pyplot as plt
             fig = plt.figure()
             ax = fig.add_subplot(111)
         ax.plot(self.prob, self.data_sorted)
@@ -63,6 +155,12 @@ class StatisticalCharacterization(object):
     - not grouped
     - grouped by day
     - grouped by hour
+
+    The laws of all the devices are stored as the columns of one matrix of sorted values (load P, load Q and
+    generation P), so that the samples of all the devices are drawn with one batched inverse CDF lookup.
+
+    The devices are sampled independently, or jointly with a Gaussian copula (see set_correlation) that keeps the
+    rank correlation of the profiles of the time group.
     """
     def __init__(self, gen_P: np.ndarray, load_P: np.ndarray, load_Q: np.ndarray):
         """
@@ -72,68 +170,140 @@ class StatisticalCharacterization(object):
         @param load_Q: 2D array with the reactive power load profiles time, load)
         @return:
         """
-        # Arrays where to store the statistical laws for sampling
-        self.gen_P_laws = list()
-        self.load_P_laws = list()
-        self.load_Q_laws = list()
+        if np.shape(load_P)[1] != np.shape(load_Q)[1]:
+            raise Exception('Different number of elements in the load active and reactive profiles.')
+
+        self.nl = np.shape(load_P)[1]
+        self.ng = np.shape(gen_P)[1]
+
+        # values of every law (time, load P + load Q + generation P): all the profiles of a time group have the same
+        # number of points
+        self.values = np.c_[load_P, load_Q, gen_P]
+        self.sorted_values = np.sort(self.values, axis=0)
+
+        # probability of every row of the sorted values
+        self.prob = 1. * np.arange(len(self.sorted_values)) / (len(self.sorted_values) - 1)
+
+        # Gaussian copula: the correlation matrix of the laws is factor * factor^T + diag(residual^2)
+        # (None for independent laws)
+        self.factor = None
+        self.residual = None
+
+    def set_correlation(self, correlated=True, explained=0.99, max_rank=None):
+        """
+        Sets how the laws are sampled: independently or with a Gaussian copula.
+        The copula correlation is the correlation of the normal scores of the profiles (a rank correlation). It has a
+        rank lower than the number of time points, so it is factorized with the SVD of the scores (time x laws)
+        without building the laws x laws matrix, and truncated to the factors that explain the given fraction of the
+        variance. The residual variance of every law is added as an independent term, so the marginal laws are kept.
+        @param correlated: sample with the copula? (False for independent laws)
+        @param explained: fraction of the variance of the scores explained by the factors kept
+        @param max_rank: maximum number of factors (None for no limit)
+        @return: Nothing
+        """
+        if not correlated:
+            self.factor = None
+            self.residual = None
+            return
+
+        from scipy.stats import rankdata
+        from scipy.special import ndtri
+
+        m, n = self.values.shape
+
+        # standardized normal scores of the profiles (the constant profiles are not correlated with the others)
+        scores = ndtri(rankdata(self.values, axis=0) / (m + 1))
+        scores -= scores.mean(axis=0)
+        std = scores.std(axis=0)
+        scores[:, std > 0] /= std[std > 0]
+        scores[:, std == 0] = 0.0
+
+        # correlation = V * (sigma^2 / m) * V^T
+        _, sigma, Vt = np.linalg.svd(scores, full_matrices=False)
+        eigenvalues = sigma ** 2 / m
+
+        total = eigenvalues.sum()
+        if total > 0:
+            k = int(np.searchsorted(np.cumsum(eigenvalues) / total, explained) + 1)
+        else:
+            k = 0
+        k = min(k, len(eigenvalues)) if max_rank is None else min(k, len(eigenvalues), max_rank)
+
+        self.factor = Vt[:k].T * np.sqrt(eigenvalues[:k])
+        self.residual = np.sqrt(np.maximum(1.0 - (self.factor ** 2).sum(axis=1), 0.0))
+
+    def get_dimension(self, columns):
+        """
+        Returns the number of uniform random numbers needed per sample of the laws of the given columns
+        @param columns: columns of the laws sampled (see get_columns)
+        """
+        if self.factor is None:
+            return len(columns)
+        return self.factor.shape[1] + len(columns)
 
-        # Create a CDF for every profile
-        rows, cols = np.shape(gen_P)
-        for i in range(cols):
-            cdf = CDF(gen_P[:, i])
-            self.gen_P_laws.append(cdf)
+    def get_probabilities(self, U, columns):
+        """
+        Returns the probabilities of the laws sampled from independent uniform random numbers: they are the same
+        numbers for independent laws, and the copula probabilities otherwise
+        @param U: 2D array of uniform random numbers in (0, 1) (points, get_dimension(columns))
+        @param columns: columns of the laws sampled (see get_columns)
+        @return: 2D array of probabilities (points, columns)
+        """
+        if self.factor is None:
+            return U
+
+        from scipy.special import ndtr, ndtri
 
-        rows, cols = np.shape(load_P)
-        for i in range(cols):
-            cdf = CDF(load_P[:, i])
-            self.load_P_laws.append(cdf)
+        # correlated normal variables: common factors plus the independent residual of every law
+        k = self.factor.shape[1]
+        Z = ndtri(np.clip(U, 1e-12, 1.0 - 1e-12))
+        X = Z[:, :k].dot(self.factor[columns].T) + Z[:, k:] * self.residual[columns]
+        return ndtr(X)
 
-        rows, cols = np.shape(load_Q)
-        for i in range(cols):
-            cdf = CDF(load_Q[:, i])
-            self.load_Q_laws.append(cdf)
+    def get_columns(self, load_enabled_idx, gen_enabled_idx):
+        """
+        Returns the columns of the sorted values of the laws sampled: load P, load Q and generation P
+        @param load_enabled_idx: indices of the loads sampled
+        @param gen_enabled_idx: indices of the generators sampled
+        @return: array of column indices
+        """
+        load_enabled_idx = np.asarray(load_enabled_idx, dtype=int)
+        gen_enabled_idx = np.asarray(gen_enabled_idx, dtype=int)
+        return np.r_[load_enabled_idx, self.nl + load_enabled_idx, 2 * self.nl + gen_enabled_idx]
 
-    def get_sample(self, load_enabled_idx, gen_enabled_idx, npoints=1):
+    def get_sample(self, load_enabled_idx, gen_enabled_idx, npoints=1, rng=None):
         """
         Returns a 2D array containing for load and generation profiles, shape (time, load)
         The profile is sampled from the original data CDF functions
 
         @param npoints: number of sampling points
+        @param rng: random generator (numpy Generator or RandomState). None uses the numpy global generator
         @return:
         PG: generators profile
         S: loads profile
         """
-        # nlp = len(self.load_P_laws)
-        # nlq = len(self.load_Q_laws)
-        # ngp = len(self.gen_P_laws)
-        nlp = len(load_enabled_idx)
-        ngp = len(gen_enabled_idx)
-
-        if len(self.load_P_laws) != len(self.load_Q_laws):
-            raise Exception('Different number of elements in the load active and reactive profiles.')
-
-        P = [None] * nlp
-        Q = [None] * nlp
-        PG = [None] * ngp
-
-        k = 0
-        for i in load_enabled_idx:
-            P[k] = self.load_P_laws[i].get_sample(npoints)
-            Q[k] = self.load_Q_laws[i].get_sample(npoints)
-            k += 1
+        rng = np.random if rng is None else rng
 
-        k = 0
-        for i in gen_enabled_idx:
-            PG[k] = self.gen_P_laws[i].get_sample(npoints)
-            k += 1
+        columns = self.get_columns(load_enabled_idx, gen_enabled_idx)
 
-        P = np.array(P)
-        Q = np.array(Q)
-        S = P + 1j * Q
+        U = rng.uniform(0, 1, (npoints, self.get_dimension(columns)))
 
-        PG = np.array(PG)
+        return self.get_values(self.get_probabilities(U, columns), columns, len(load_enabled_idx))
 
-        return PG.transpose(), S.transpose()
+    def get_values(self, U, columns, nlp):
+        """
+        Returns the load and generation values of the probabilities of the laws sampled
+        @param U: 2D array of probabilities (points, columns)
+        @param columns: columns of the laws sampled: load P, load Q and generation P (see get_columns)
+        @param nlp: number of loads sampled
+        @return:
+        PG: generators profile
+        S: loads profile
+        """
+        X = inverse_cdf(self.sorted_values, U, columns)
+        S = X[:, :nlp] + 1j * X[:, nlp:2 * nlp]
+        PG = X[:, 2 * nlp:]
+        return PG, S
 
     def plot(self, ax):
         """
@@ -142,20 +312,19 @@ class StatisticalCharacterization(object):
         @return:
         """
         if ax is None:
+            from matplotlib import pyplot as plt
             fig = plt.figure()
             ax = fig.add_subplot(111)
 
-        for cdf in self.gen_P_laws:
-            ax.plot(cdf.prob, cdf.data_sorted, color='r', marker='x')
-        for cdf in self.load_P_laws:
-            ax.plot(cdf.prob, cdf.data_sorted, color='g',  marker='x')
-        for cdf in self.load_Q_laws:
-            ax.plot(cdf.prob, cdf.data_sorted, color='b',  marker='x')
+        nl, ng = self.nl, self.ng
+        ax.plot(self.prob, self.sorted_values[:, 2 * nl:2 * nl + ng], color='r', marker='x')
+        ax.plot(self.prob, self.sorted_values[:, :nl], color='g', marker='x')
+        ax.plot(self.prob, self.sorted_values[:, nl:2 * nl], color='b', marker='x')
         ax.set_xlabel('$p(x)$')
         ax.set_ylabel('$x$')
 
 
-def classify_by_hour(t: pd.DatetimeIndex):
+def classify_by_hour(t: 'pd.DatetimeIndex'):
     """
     Passes an array of TimeStamps to an array of arrays of indices
     classified by hour of the year
@@ -179,7 +348,7 @@ def classify_by_hour(t: pd.DatetimeIndex):
     return arr
 
 
-def classify_by_day(t: pd.DatetimeIndex):
+def classify_by_day(t: 'pd.DatetimeIndex'):
     """
     Passes an array of TimeStamps to an array of arrays of indices
     classified by day of the year
@@ -203,7 +372,7 @@ def classify_by_day(t: pd.DatetimeIndex):
     return arr
 
 
-class MonteCarlo(QThread):
+class MonteCarlo(Engine):
     """
     This class imports a set of generation and load profiles and characterizes them statistically so an
     infinite number of in-range samples can be withdrawn. The aim is to perform a MonteCarlo simulation
@@ -217,7 +386,7 @@ class MonteCarlo(QThread):
             group_by: Option for date grouping
         """
 
-        QThread.__init__(self)
+        Engine.__init__(self)
 
         self.cancel = False
 
@@ -236,17 +405,26 @@ class MonteCarlo(QThread):
         self.pf_max_iterations = 20
         self.enforce_reactive_power_limits = False
 
-        # intermediate results
-        self.num_eval = 0
-        self.V_sum = None
-        self.I_sum = None
-        self.Loading_sum = None
-        self.Losses_sum = None
+        # seed of the random generator (None for a random seed)
+        self.seed = None
 
-        # self.V2 = None
-        # self.I2 = None
-        # self.Loading2 = None
-        # self.Losses2 = None
+        # sampling method, and number of iterations of every randomized design (replicate) of the methods other than
+        # SamplingMethod.MonteCarlo
+        self.sampling_method = SamplingMethod.MonteCarlo
+        self.replicate_size = 64
+        self.min_replicates = 10
+
+        # statistics options: quantiles of the magnitudes estimated, and iterations between the points stored in the
+        # convergence series
+        self.quantiles = ()
+        self.history_every = 1
+
+        # intermediate results: streaming moments of 'V', 'I', 'Loading' and 'Losses' (see Moments), and moments of
+        # the voltage means of the replicates of the designs
+        self.num_eval = 0
+        self.num_failed = 0
+        self.moments = None
+        self.replicate_moments = None
 
         self.V_avg = None
         self.I_avg = None
@@ -258,11 +436,16 @@ class MonteCarlo(QThread):
         self.Loading_std = None
         self.Losses_std = None
 
+        # convergence series (one point every history_every iterations, and the last one)
+        self.history_iterations = None
         self.V_avg_series = None
         self.V_std_series = None
         self.error_series = None
 
-        # interpolation tensor structure
+        # interpolation tensor structure: every sample is stored with the results schema while running (sample_values)
+        # and the samples are exposed as ResultView (sample x element) once the run is consolidated
+        self.result_schema = ResultSchema()
+        self.sample_values = None
         self.power_injection = None
         self.voltage_values = None
         self.loading_values = None
@@ -299,7 +482,7 @@ class MonteCarlo(QThread):
             # compute the statistical characterization of the sliced data
             self.stat_groups[i] = StatisticalCharacterization(GP, LP, LQ)
 
-        print('Monte Carlo initialized')
+        logger.info('Monte Carlo initialized with %d time groups', len(self.stat_groups))
 
     def set_run_options(self, tol=1e-3, max_it=1000, tol_pf=1e-3, max_it_pf=10, enforce_reactive_power_limits=True):
         """
@@ -317,6 +500,60 @@ class MonteCarlo(QThread):
         self.pf_max_iterations = max_it_pf
         self.enforce_reactive_power_limits = enforce_reactive_power_limits
 
+    def set_sampling_options(self, correlated=False, explained=0.99, max_rank=None,
+                             method=SamplingMethod.MonteCarlo, replicate_size=64, min_replicates=10):
+        """
+        Set how the loads and generators are sampled
+        @param correlated: sample them jointly with a Gaussian copula of their profiles? (independently otherwise)
+        @param explained: fraction of the variance of the copula correlation kept (see set_correlation)
+        @param max_rank: maximum rank of the copula correlation (None for no limit)
+        @param method: SamplingMethod. With SamplingMethod.MonteCarlo the error is the standard error of the samples
+                       mean. The other methods (Latin hypercube and quasi Monte Carlo) draw independent randomizations
+                       of a design of replicate_size iterations, and the error is the standard error of the mean of
+                       the replicates means, checked after every replicate (the maximum number of iterations is
+                       rounded up to whole replicates)
+        @param replicate_size: Number of iterations of every replicate (a power of 2 for Sobol)
+        @param min_replicates: Number of replicates before the error is checked: the standard error of a few replicates
+                               means is not a reliable estimate (with two replicates it has a single degree of freedom)
+        @return: Nothing
+        """
+        if method == SamplingMethod.Sobol and replicate_size & (replicate_size - 1):
+            raise Exception('The Sobol replicates must have a power of 2 iterations')
+
+        self.sampling_method = method
+        self.replicate_size = replicate_size
+        self.min_replicates = max(int(min_replicates), 2)
+
+        for stat_group in self.stat_groups:
+            stat_group.set_correlation(correlated, explained, max_rank)
+
+    def set_seed(self, seed=None):
+        """
+        Set the seed of the random generator of the samples
+        @param seed: integer seed (None for a random seed): the same seed gives the same results
+        @return: Nothing
+        """
+        self.seed = seed
+
+    def set_statistics_options(self, quantiles=(), history_every=1):
+        """
+        Set which statistics are computed and how often the convergence is stored
+        @param quantiles: quantiles of the magnitudes of the results to estimate (i.e. (0.05, 0.5, 0.95))
+        @param history_every: Number of iterations between the points of the convergence series (V_avg_series,
+                              V_std_series and error_series)
+        @return: Nothing
+        """
+        self.quantiles = tuple(quantiles)
+        self.history_every = max(1, int(history_every))
+
+    def set_result_schema(self, schema: ResultSchema):
+        """
+        Sets which parts of the samples results are stored and with which precision (see ResultSchema)
+        @param schema: ResultSchema instance
+        @return: Nothing
+        """
+        self.result_schema = schema
+
     def plot_stc(self, idx, ax):
         """
         Plot the statistical characterization at the given index
@@ -342,39 +579,31 @@ class MonteCarlo(QThread):
         nl = len(self.time_series.pf.branch)
 
         self.num_eval = 0
+        self.num_failed = 0
 
-        self.V_sum = zeros(nb, dtype=complex)
-        self.I_sum = zeros(nl, dtype=complex)
-        self.Loading_sum = zeros(nl, dtype=complex)
-        self.Losses_sum = zeros(nl, dtype=complex)
-
-        # self.V2 = zeros(nb, dtype=complex)
-        # self.I2 = zeros(nl, dtype=complex)
-        # self.Loading2 = zeros(nl, dtype=complex)
-        # self.Losses2 = zeros(nl, dtype=complex)
+        self.moments = {'V': Moments(nb, quantiles=self.quantiles),
+                        'I': Moments(nl, quantiles=self.quantiles),
+                        'Loading': Moments(nl, quantiles=self.quantiles),
+                        'Losses': Moments(nl, quantiles=self.quantiles)}
 
-        self.V_avg = zeros(nb, dtype=complex)
-        self.I_avg = zeros(nl, dtype=complex)
-        self.Loading_avg = zeros(nl, dtype=complex)
-        self.Losses_avg = zeros(nl, dtype=complex)
+        self.replicate_moments = Moments(nb)
 
-        self.V_std = zeros(nb, dtype=complex)
-        self.I_std = zeros(nl, dtype=complex)
-        self.Loading_std = zeros(nl, dtype=complex)
-        self.Losses_std = zeros(nl, dtype=complex)
+        self.set_moments()
 
+        self.history_iterations = list()
         self.V_avg_series = list()
         self.V_std_series = list()
         self.error_series = list()
 
         # interpolation tensor structure
-        self.power_injection = list()
-        self.voltage_values = list()
-        self.loading_values = list()
+        self.sample_values = dict()
+        self.power_injection = None
+        self.voltage_values = None
+        self.loading_values = None
 
     def process_values(self, S, V, I, Loading, Losses):
         """
-        After each power flow simulation, the results of it are stored and processed to obtain the convergence
+        After each power flow simulation, the results of it are stored and added to the statistics
         @param S: Array of power injections in p.u.
         @param V: Array of voltage values in p.u.
         @param I: Array of node current injections in p.u.
@@ -384,178 +613,231 @@ class MonteCarlo(QThread):
         """
 
         # store the tensor values
-        self.power_injection.append(S.copy())
-        self.voltage_values.append(V.copy())
-        self.loading_values.append(Loading.copy())
+        for name, quantity, values in [('power_injection', 'power', S),
+                                       ('voltage_values', 'voltage', V),
+                                       ('loading_values', 'loading', Loading)]:
+            for field, value in self.result_schema.encode(name, quantity, values).items():
+                self.sample_values.setdefault(field, list()).append(value)
 
         # increase the number of evaluations
         self.num_eval += 1
 
-        # sum of values
-        self.V_sum += V
-        self.I_sum += I
-        self.Loading_sum += Loading
-        self.Losses_sum += Losses
-
-        # sum of squares
-        # self.V2 += V**2
-        # self.I2 += I**2
-        # self.Loading2 += Loading**2
-        # self.Losses2 += Losses**2
-
-        # Mean
-        self.V_avg = self.V_sum / self.num_eval
-        self.I_avg = self.I_sum / self.num_eval
-        self.Loading_avg = self.Loading_sum / self.num_eval
-        self.Losses_avg = self.Losses_sum / self.num_eval
-
-        # Variance
-        if self.num_eval > 1:
-            self.V_std = (V - self.V_avg)**2 / (self.num_eval - 1)
-            self.I_std = (I - self.I_avg)**2 / (self.num_eval - 1)
-            self.Loading_std = (Loading - self.Loading_avg)**2 / (self.num_eval - 1)
-            self.Losses_std = (Losses - self.Losses_avg)**2 / (self.num_eval - 1)
-
-        self.V_avg_series.append(self.V_avg)
-        self.V_std_series.append(self.V_std)
-
-        # std_dev = max(r_[self.V_std, self.I_std, self.Loading_std, self.Losses_std])
-        std_dev = max(abs(self.V_std))
-        if self.num_eval > 1:
-            return std_dev
-        else:
-            return 1
+        # streaming moments (in place)
+        self.moments['V'].update(V)
+        self.moments['I'].update(I)
+        self.moments['Loading'].update(Loading)
+        self.moments['Losses'].update(Losses)
 
-    def consolidate(self):
+    def get_error(self):
         """
-        Once the simulation is finished, the list are turned into arrays
-        @return: Nothing
+        Returns the convergence error: the largest standard error of the voltage mean estimate (from the replicates
+        means with the design sampling methods)
         """
-        # store the tensor values
-        self.power_injection = np.array(self.power_injection)
-        self.voltage_values = np.array(self.voltage_values)
-        self.loading_values = np.array(self.loading_values)
+        if self.sampling_method == SamplingMethod.MonteCarlo:
+            err = self.moments['V'].max_standard_error()
+        else:
+            err = self.replicate_moments.max_standard_error()
+        if err == 0:
+            err = 1e-200  # to avoid division by zeros
+        return err
 
-    def worker(self, args):
+    def is_converged(self, err):
         """
-        Element that processes a MonteCarlo iteration
-        @param args: Power flow instance
-        @return:
+        Returns if the convergence error is within the tolerance, once the design sampling methods have the minimum
+        number of replicates
+        @param err: convergence error (see get_error)
         """
-        # pf: Power flow instance
-        pf = args
+        if self.sampling_method != SamplingMethod.MonteCarlo and self.replicate_moments.count < self.min_replicates:
+            return False
+        return err <= self.tolerance
 
-        std_dev = zeros(self.n_groups)
+    def set_moments(self):
+        """
+        Sets the statistics of the results from their moments
+        @return: Nothing
+        """
+        self.V_avg = self.moments['V'].mean.copy()
+        self.I_avg = self.moments['I'].mean.copy()
+        self.Loading_avg = self.moments['Loading'].mean.copy()
+        self.Losses_avg = self.moments['Losses'].mean.copy()
 
-        # get the enables for modification:
-        # since the power flow object is sent already with user modifications it should be up to date on every run
-        loads_enabled_for_change = np.where(self.time_series.pf.bus[:, FIX_POWER_BUS] == 0)[0]
-        gens_enabled_for_change = np.where(self.time_series.pf.gen[:, FIX_POWER_GEN] == 0)[0]
+        self.V_std = self.moments['V'].std()
+        self.I_std = self.moments['I'].std()
+        self.Loading_std = self.moments['Loading'].std()
+        self.Losses_std = self.moments['Losses'].std()
 
-        # this is the base load values, only those enabled for change will be replaced in the loop
-        S = self.time_series.load_p_0 + 1j * self.time_series.load_q_0
-        # this is the base generation values, only those enabled for change will be replaced in the loop
-        Pgen = self.time_series.gen_p_0
+    def record_history(self, iteration, err, last=False):
+        """
+        Stores a point of the convergence series every history_every iterations
+        @param iteration: Number of Monte Carlo iterations done
+        @param err: Convergence error
+        @param last: Is it the last iteration? (it is always stored)
+        @return: Nothing
+        """
+        if len(self.history_iterations) and self.history_iterations[-1] == iteration:
+            return
+
+        previous = self.history_iterations[-1] if len(self.history_iterations) else 0
+        if last or iteration - previous >= self.history_every:
+            self.history_iterations.append(iteration)
+            self.V_avg_series.append(self.moments['V'].mean.copy())
+            self.V_std_series.append(self.moments['V'].std())
+            self.error_series.append(err)
 
-        for i in range(self.n_groups):  # for every time group get a sample and run a power flow
+    def consolidate(self):
+        """
+        Once the simulation is finished, the list are turned into arrays
+        @return: Nothing
+        """
+        # store the tensor values
+        arrays = {field: np.array(values) for field, values in self.sample_values.items()}
+        if len(arrays) > 0:
+            self.power_injection = self.result_schema.view(arrays, 'power_injection', 'power')
+            self.voltage_values = self.result_schema.view(arrays, 'voltage_values', 'voltage')
+            self.loading_values = self.result_schema.view(arrays, 'loading_values', 'loading')
 
-            # get stochastic sample
-            Pgen_mod, Smod = self.stat_groups[i].get_sample(loads_enabled_for_change, gens_enabled_for_change)
+    def worker(self, pf, S, Pgen, loads_enabled_for_change, gens_enabled_for_change, samples, replicate=None):
+        """
+        Element that processes a MonteCarlo iteration: a power flow for the sample of every time group
+        @param pf: Power flow instance
+        @param S: Array of load powers (the values enabled for change are replaced)
+        @param Pgen: Array of generation powers (the values enabled for change are replaced)
+        @param loads_enabled_for_change: indices of the loads that are sampled
+        @param gens_enabled_for_change: indices of the generators that are sampled
+        @param samples: list with the generators and loads sample of every time group
+        @param replicate: Moments of the voltages of the current replicate (None if not needed)
+        @return: Nothing
+        """
+        for Pgen_mod, Smod in samples:  # for every time group sample run a power flow
 
             # modify the default arrays withe values that are set to change during the simulation
-            Pgen[gens_enabled_for_change] = Pgen_mod[0]
-            S[loads_enabled_for_change] = Smod[0]
+            Pgen[gens_enabled_for_change] = Pgen_mod
+            S[loads_enabled_for_change] = Smod
 
             # Setting the states
             pf.set_generators(Pgen)
             pf.set_loads(np.real(S), np.imag(S))
 
             # run the power flow
-            pf.run()
+            try:
+                pf.run()
+            except (ValueError, np.linalg.LinAlgError) as e:
+                # a solver breakdown (i.e. NaN voltages) must not stop the simulation: the sample is discarded
+                logger.warning('Monte Carlo sample discarded, the power flow failed: %s', e)
+                self.num_failed += 1
+                continue
 
             # gather the results (the results are ensured to have the same length as the time master)
-            std_dev[i] = self.process_values(pf.power, pf.voltage, pf.current, pf.loading, pf.losses)
+            self.process_values(pf.power, pf.voltage, pf.current, pf.loading, pf.losses)
 
-            # if self.cancel:
-            #     continue_run = False
-
-        return max(std_dev)
+            if replicate is not None:
+                replicate.update(pf.voltage)
 
     def run(self):
         """
         Run the monte carlo algorithm using a single thread
         @return:
         """
-        start = time.clock()
+        start = time.time()
 
         self.cancel = False
 
         # initialize the structures to store the data and perform the average
         self.initialize()
 
+        pf = self.time_series.pf
+        pf.set_run_options(pf.solver_type, self.pf_tolerance, self.pf_max_iterations,
+                           self.enforce_reactive_power_limits, False, solver_to_retry_with=pf.solver_to_retry_with)
+
+        # get the enables for modification:
+        # since the power flow object is sent already with user modifications it should be up to date on every run
+        loads_enabled_for_change = np.where(pf.bus[:, FIX_POWER_BUS] == 0)[0]
+        gens_enabled_for_change = np.where(pf.gen[:, FIX_POWER_GEN] == 0)[0]
+
+        # these are the base values, only those enabled for change will be replaced in the loop
+        S = self.time_series.load_p_0 + 1j * self.time_series.load_q_0
+        Pgen = self.time_series.gen_p_0.copy()
+
+        rng = np.random.default_rng(self.seed)
+
+        # the designs are sampled and checked by replicate
+        design = self.sampling_method != SamplingMethod.MonteCarlo
+        block = self.replicate_size if design else 1
+
         continue_run = True
 
         prog = 0.0
         iter = 0
         err = 0
-        std_sum = 0
-        self.emit(SIGNAL('progress(float)'), prog)
+        self.report_progress(prog)
 
         while continue_run:
 
+            samples = draw_samples(self.stat_groups, loads_enabled_for_change, gens_enabled_for_change, block,
+                                   self.sampling_method, rng)
+            replicate = Moments(len(pf.bus)) if design else None
+
             # Execute time series of group runs
-            mx_stdev = self.worker(self.time_series.pf)
+            for it in range(block):
+                self.worker(pf, S, Pgen, loads_enabled_for_change, gens_enabled_for_change,
+                            [(Pgen_mod[it], Smod[it]) for Pgen_mod, Smod in samples], replicate)
+
+            if design and replicate.count > 0:
+                self.replicate_moments.update(replicate.mean)
 
             # Increase iteration
-            iter += 1
+            iter += block
 
-            std_sum += mx_stdev
-            err = std_sum / iter
-            if err == 0:
-                err = 1e-200  # to avoid division by zeros
-            self.error_series.append(err)
+            err = self.get_error()
+            self.record_history(iter, err)
 
             # emmit the progress signal
             prog = 100 * self.tolerance / err
             if prog > 100:
                 prog = 100
-            self.emit(SIGNAL('progress(float)'), prog)
+            self.report_progress(prog)
 
             if self.cancel:
                 continue_run = False
 
             # check if to stop
-            if iter >= self.max_iterations or err <= self.tolerance:
+            if iter >= self.max_iterations or self.is_converged(err):
                 continue_run = False
 
+        self.set_moments()
+        self.record_history(iter, err, last=True)
+
         # consolidate the results
         self.consolidate()
 
         # send the finnish signal
-        self.emit(SIGNAL('done()'))
+        self.report_done()
 
-        elapsed = (time.clock() - start)
-        print('Elapsed time: ', elapsed)
+        elapsed = time.time() - start
+        logger.info('Monte Carlo finished: %d power flows in %.3f s', self.num_eval, elapsed)
+        if self.num_failed:
+            logger.warning('%d Monte Carlo samples were discarded because their power flow failed', self.num_failed)
 
     def plot_convergence(self):
         """
         Plot the Monte Carlo run convergence
         @return:
         """
-        print('plotting...')
+        from matplotlib import pyplot as plt
+
         plt.figure()
         plt.subplot(1, 3, 1)
-        plt.plot(self.V_avg_series)
+        plt.plot(self.history_iterations, np.abs(self.V_avg_series))
         plt.title('Voltage average evolution')
 
         plt.subplot(1, 3, 2)
-        plt.plot(self.V_std_series)
+        plt.plot(self.history_iterations, self.V_std_series)
         plt.title('Voltage standard deviation evolution')
         plt.yscale('log')
 
         plt.subplot(1, 3, 3)
-        plt.plot(self.error_series)
-        plt.title('Error: Standard deviation average')
+        plt.plot(self.history_iterations, self.error_series)
+        plt.title('Error: Standard error of the voltage mean')
         plt.yscale('log')
 
         plt.show()
@@ -564,76 +846,264 @@ class MonteCarlo(QThread):
 class MonteCarloMultiThread(MonteCarlo):
     """
     Inherits all the MonteCarlo functionality and overrides the run function to have it implemented
-    making use of al the computer cores
+    making use of al the computer cores.
+
+    Every worker process builds its own replica of the power flow object once, and solves batches of Monte Carlo
+    iterations with its own random stream (one independent seed per batch, spawned from the run seed, so the results
+    do not depend on which process solves which batch). A batch returns the moments of its samples (see Moments),
+    and the master merges them to compute the statistics and check the convergence after every round of batches.
+    The quantile sketches cannot be merged: when quantiles are estimated the batches also return the magnitudes of
+    their samples, and the master adds them to its sketches in order.
     """
 
+    def __init__(self, base_time_series_object: TimeSeries, group_by: TimeGroups):
+        """
+        Class constructor
+        Args:
+            base_time_series_object: TimeSeries object from which to take the data
+            group_by: Option for date grouping
+        """
+        MonteCarlo.__init__(self, base_time_series_object, group_by)
+
+        # parallel options
+        self.n_processes = cpu_count()
+        self.batch_size = 10
+
+    def set_parallel_options(self, n_processes=None, batch_size=10, seed=None):
+        """
+        Set how the Monte Carlo iterations are distributed
+        @param n_processes: Number of worker processes (None for all the cpus)
+        @param batch_size: Number of Monte Carlo iterations (one sample of every time group) per batch
+        @param seed: Seed of the random streams (None for a random seed): the same seed gives the same results
+        @return: Nothing
+        """
+        self.n_processes = cpu_count() if n_processes is None else n_processes
+        self.batch_size = batch_size
+        self.seed = seed
+
+    def get_worker_model(self):
+        """
+        Returns what the workers need to build their replica of the power flow object and to sample the profiles
+        @return: dictionary
+        """
+        pf = self.time_series.pf
+        return {'baseMVA': pf.baseMVA,
+                'bus': pf.bus,
+                'gen': pf.gen,
+                'branch': pf.branch,
+                'solver_type': pf.solver_type,
+                'solver_to_retry_with': pf.solver_to_retry_with,
+                'S': self.time_series.load_p_0 + 1j * self.time_series.load_q_0,
+                'Pgen': self.time_series.gen_p_0,
+                'stat_groups': self.stat_groups}
+
     def run(self):
         """
         Run the Monte carlo algorithm using multi-thread techniques
         @return:
         """
+        start = time.time()
+
         self.cancel = False
 
         self.initialize()
 
         continue_run = True
 
-        print('Monte Carlo run, Not implemented')
         prog = 0.0
         iter = 0
         err = 0
-        std_sum = 0
-        self.emit(SIGNAL('progress(float)'), prog)
+        self.report_progress(prog)
 
-        # setup the multi-treading variables
-        cores = cpu_count()
-        pool = Pool(processes=cores)
+        seeds = np.random.SeedSequence(self.seed)
 
-        pf_instances = list()
-        for i in range(cores):
-            pf_instances.append(self.time_series.pf)
+        options = (self.pf_tolerance, self.pf_max_iterations, self.enforce_reactive_power_limits, self.result_schema,
+                   self.quantiles, self.sampling_method)
 
-        while continue_run:
+        # the batches of the designs are whole replicates
+        design = self.sampling_method != SamplingMethod.MonteCarlo
+        batch_size = self.replicate_size if design else self.batch_size
 
-            # Execute time series of group runs in parallel
-            mx_stdev_arr = pool.map(self.worker, pf_instances)
+        with ProcessPoolExecutor(max_workers=self.n_processes, initializer=init_monte_carlo_worker,
+                                 initargs=(self.get_worker_model(), options)) as executor:
 
-            # Increase iteration
-            iter += 1
+            while continue_run:
 
-            std_sum += max(mx_stdev_arr)
-            err = std_sum / iter
-            if err == 0:
-                err = 1e-200  # to avoid division by zeros
-            self.error_series.append(err)
+                # one batch per process, without exceeding the maximum number of iterations
+                sizes = list()
+                remaining = self.max_iterations - iter
+                while remaining > 0 and len(sizes) < self.n_processes:
+                    sizes.append(batch_size if design else min(batch_size, remaining))
+                    remaining -= sizes[-1]
 
-            # emmit the progress signal
-            prog = 100 * self.tolerance / err
-            if prog > 100:
-                prog = 100
-            self.emit(SIGNAL('progress(float)'), prog)
-            # self.emit(SIGNAL('progress(float)'), 100 * (iter+1)/self.max_iterations)
+                # Execute the batches of time series of group runs in parallel
+                futures = [executor.submit(run_monte_carlo_batch, seed, size)
+                           for seed, size in zip(seeds.spawn(len(sizes)), sizes)]
 
-            if self.cancel:
-                continue_run = False
+                # merge the batches in order, so that a seed always gives the same results
+                for future in futures:
+                    batch_moments, magnitudes, sample_values, n_eval, n_failed = future.result()
 
-            # check if to stop
-            if iter >= self.max_iterations or err <= self.tolerance:
-                continue_run = False
+                    if design and batch_moments['V'].count > 0:
+                        self.replicate_moments.update(batch_moments['V'].mean)
+
+                    for name, m in batch_moments.items():
+                        self.moments[name].merge(m)
+                        if magnitudes is not None:
+                            for magnitude in magnitudes[name]:
+                                self.moments[name].update_quantiles(magnitude)
+
+                    for field, values in sample_values.items():
+                        self.sample_values.setdefault(field, list()).extend(values)
+
+                    self.num_eval += n_eval
+                    self.num_failed += n_failed
+
+                # Increase iteration
+                iter += sum(sizes)
+
+                err = self.get_error()
+                self.record_history(iter, err)
+
+                # emmit the progress signal
+                prog = 100 * self.tolerance / err
+                if prog > 100:
+                    prog = 100
+                self.report_progress(prog)
 
-        # close pools
-        pool.close()
-        pool.terminate()
+                if self.cancel:
+                    continue_run = False
+
+                # check if to stop
+                if iter >= self.max_iterations or self.is_converged(err):
+                    continue_run = False
+
+        self.set_moments()
+        self.record_history(iter, err, last=True)
+
+        # consolidate the results
+        self.consolidate()
 
         # send the finnish signal
-        self.emit(SIGNAL('done()'))
+        self.report_done()
+
+        elapsed = time.time() - start
+        logger.info('Monte Carlo finished: %d power flows in %.3f s with %d processes', self.num_eval, elapsed,
+                    self.n_processes)
+        if self.num_failed:
+            logger.warning('%d Monte Carlo samples were discarded because their power flow failed', self.num_failed)
+
+
+# state of the Monte Carlo worker processes (see init_monte_carlo_worker)
+monte_carlo_worker_state = dict()
+
+
+def init_monte_carlo_worker(model, options):
+    """
+    Initializes a Monte Carlo worker process: it builds its own replica of the power flow object
+    @param model: power flow data and sampling laws (see MonteCarloMultiThread.get_worker_model)
+    @param options: power flow tolerance, power flow maximum iterations, enforce the reactive power limits?, the
+                    ResultSchema of the samples, the quantiles estimated and the SamplingMethod
+    """
+    tol, max_it, enforce_q_limits, schema, quantiles, method = options
 
+    pf = MultiCircuitPowerFlow(model['baseMVA'], model['bus'], model['gen'], model['branch'], None,
+                               model['solver_type'])
+    pf.set_run_options(solver_type=model['solver_type'], tol=tol, max_it=max_it,
+                       enforce_reactive_power_limits=enforce_q_limits, isMaster=False,
+                       solver_to_retry_with=model['solver_to_retry_with'])
 
-class StochasticCollocation(QThread):
+    monte_carlo_worker_state['pf'] = pf
+    monte_carlo_worker_state['model'] = model
+    monte_carlo_worker_state['schema'] = schema
+    monte_carlo_worker_state['collect_magnitudes'] = len(quantiles) > 0
+    monte_carlo_worker_state['method'] = method
+
+
+def run_monte_carlo_batch(seed, n_iterations):
+    """
+    Runs a batch of Monte Carlo iterations in a worker process: every iteration samples every time group and runs
+    its power flow
+    @param seed: numpy SeedSequence of the random stream of the batch
+    @param n_iterations: number of iterations
+    @return: dictionary with the Moments of 'V', 'I', 'Loading' and 'Losses', dictionary with their list of
+             magnitudes of every sample (None if no quantiles are estimated), dictionary with the list of stored
+             values of every sample field (see MonteCarlo.process_values), number of power flows, number of samples
+             discarded because their power flow failed
+    """
+    # the power flow changes its bus types when enforcing the reactive power limits: every batch starts from a copy
+    # of the initial replica, so that its results do not depend on the batches solved before by the process
+    pf = deepcopy(monte_carlo_worker_state['pf'])
+    model = monte_carlo_worker_state['model']
+    schema = monte_carlo_worker_state['schema']
+
+    rng = np.random.default_rng(seed)
+
+    nb = len(pf.bus)
+    nl = len(pf.branch)
+    moments = {'V': Moments(nb), 'I': Moments(nl), 'Loading': Moments(nl), 'Losses': Moments(nl)}
+    sample_values = dict()
+
+    # the quantile sketches are updated by the master, from the magnitudes of the samples
+    magnitudes = {name: list() for name in moments} if monte_carlo_worker_state['collect_magnitudes'] else None
+
+    # get the enables for modification
+    loads_enabled_for_change = np.where(pf.bus[:, FIX_POWER_BUS] == 0)[0]
+    gens_enabled_for_change = np.where(pf.gen[:, FIX_POWER_GEN] == 0)[0]
+
+    # base values, only those enabled for change are replaced in the loop
+    S = model['S'].copy()
+    Pgen = model['Pgen'].copy()
+
+    # draw the samples of every time group for all the iterations at once (a replicate of the designs)
+    samples = draw_samples(model['stat_groups'], loads_enabled_for_change, gens_enabled_for_change, n_iterations,
+                           monte_carlo_worker_state['method'], rng)
+
+    n_eval = 0
+    n_failed = 0
+    for it in range(n_iterations):
+        for Pgen_mod, Smod in samples:
+
+            # stochastic sample of the iteration
+            Pgen[gens_enabled_for_change] = Pgen_mod[it]
+            S[loads_enabled_for_change] = Smod[it]
+
+            # Setting the states and run the power flow
+            pf.set_generators(Pgen)
+            pf.set_loads(np.real(S), np.imag(S))
+            try:
+                pf.run()
+            except (ValueError, np.linalg.LinAlgError) as e:
+                # a solver breakdown (i.e. NaN voltages) must not stop the other batches: the sample is discarded
+                logger.warning('Monte Carlo sample discarded, the power flow failed: %s', e)
+                n_failed += 1
+                continue
+
+            moments['V'].update(pf.voltage)
+            moments['I'].update(pf.current)
+            moments['Loading'].update(pf.loading)
+            moments['Losses'].update(pf.losses)
+
+            if magnitudes is not None:
+                for name, m in moments.items():
+                    magnitudes[name].append(m.magnitude.copy())
+
+            for name, quantity, values in [('power_injection', 'power', pf.power),
+                                           ('voltage_values', 'voltage', pf.voltage),
+                                           ('loading_values', 'loading', pf.loading)]:
+                for field, value in schema.encode(name, quantity, values).items():
+                    sample_values.setdefault(field, list()).append(value)
+
+            n_eval += 1
+
+    return moments, magnitudes, sample_values, n_eval, n_failed
+
+
+class StochasticCollocation(Engine):
 
     def __init__(self, ts: TimeSeries, level):
 
-        QThread.__init__(self)
+        Engine.__init__(self)
 
         self.time_series = ts
 
@@ -676,13 +1146,13 @@ class StochasticCollocation(QThread):
         self.ng_used = len(self.gen_idx)
         self.nl_used = len(self.load_idx)
 
-        print('Stochastic collocation')
+        logger.info('Stochastic collocation initialized')
 
     def run(self):
-        print('Stochastic collocation run')
+        logger.info('Stochastic collocation run')
 
         prog = 0.0
-        self.emit(SIGNAL('progress(float)'), prog)
+        self.report_progress(prog)
 
         self.level = 2
 
@@ -718,7 +1188,7 @@ class StochasticCollocation(QThread):
         # to be done...
 
         # send the finnish signal
-        self.emit(SIGNAL('done()'))
+        self.report_done()
 
     def pre_process(self, level, data_series):
         """
@@ -741,7 +1211,7 @@ class StochasticCollocation(QThread):
         max_number_of_samples = list()
         data_series1 = list()
         number_of_samples_per_dimension = list()
-        self.emit(SIGNAL('progress(float)'), 0)
+        self.report_progress(0)
         for idx_d in range(dimensions):
             # Sort and scale
             data1 = sf.sort_and_scale(data_series[idx_d])
@@ -753,7 +1223,7 @@ class StochasticCollocation(QThread):
             # print(data1)
 
             # Gram-Schmidt Orthogonalization
-            print('Obtaining quadrature points for data series ' + str(idx_d))
+            logger.debug('Obtaining the quadrature points for the data series %d', idx_d)
             roots, Z, NS = sf.get_quadrature_points(data1, NL, 0)
 
             number_of_samples_per_dimension.append(NS)
@@ -762,12 +1232,12 @@ class StochasticCollocation(QThread):
             max_number_of_samples.append(NS)
 
             prog = 100 * (idx_d+1) / dimensions
-            self.emit(SIGNAL('progress(float)'), prog)
+            self.report_progress(prog)
 
         # print('Creating full-tensor:')
         # sampling_points, Weights, index_tensor = sf.full_tensor(levels, roots_list, weights)
 
-        print('Creating sparse-tensor:')
+        logger.debug('Creating the sparse tensor')
         sampling_points_s, Weights_s, index_tensor_s, sub_tensor_results_map = sf.sparse_grids_tensor(level, roots_list,
                                                                                                       weights)
 
@@ -788,13 +1258,11 @@ class StochasticCollocation(QThread):
         @param sub_tensor_results_map:
         @return:
         """
-        print('')
-
         # computing of the moments
-        print('Post-Processing full-tensor:')
+        logger.debug('Post-processing the full tensor')
         moments = sf.moments_computation(weights, results)
 
-        print('Post-Processing sparse-tensor:')
+        logger.debug('Post-processing the sparse tensor')
         # moments_s = sf.moments_computation(Weights_s, results_s)
 
         # compute the moments by generating new points and performing Monte Carlo
@@ -812,4 +1280,4 @@ class StochasticCollocation(QThread):
                                                                    num_samples_per_dimension, levels, dimensions,
                                                                    single_level)
 
-        print('MC average = ' + str(np.average(interpolated_points)))
\ No newline at end of file
+        logger.info('MC average = %s', np.average(interpolated_points))
\ No newline at end of file
@@ -5,17 +5,22 @@
 """Solves the power flow using a full Newton's method.
 """
 
-import sys
+import numpy as np
 
-from numpy import array, angle, exp, linalg, r_, Inf, conj, diag, asmatrix, asarray
+from numpy import array, angle, exp, linalg, r_, c_, Inf, conj, diag, asmatrix, asarray, zeros, isfinite, \
+    broadcast_to, ix_
 
-from scipy.sparse import issparse, csr_matrix as sparse, hstack, vstack
+from scipy.sparse import issparse, csr_matrix as sparse
 
-from scipy.sparse.linalg import spsolve
+from .JacobianBuilder import JacobianBuilder
+from .SparseLUSolver import SparseLUSolver
+from .Telemetry import get_logger
 
 import scipy
 scipy.ALLOW_THREADS = True
 
+logger = get_logger('NewtonRaphsonPowerFlow')
+
 
 def dSbus_dV(Ybus, V):
     """
@@ -80,7 +85,7 @@ def dSbus_dV(Ybus, V):
     return dS_dVm, dS_dVa
 
 
-def newtonpf(Ybus, Sbus, V0, pv, pq, tol, max_it, verbose=False):
+def newtonpf(Ybus, Sbus, V0, pv, pq, tol, max_it, verbose=False, jac_builder=None, lin_solver=None):
     """
     Solves the power flow using a full Newton's method.
 
@@ -107,14 +112,26 @@ def newtonpf(Ybus, Sbus, V0, pv, pq, tol, max_it, verbose=False):
         pq: Array with the indices of the PQ buses
         tol: Tolerance
         max_it: Maximum number of iterations
-        verbose: Boolean variable for the verbose mode activation
+        verbose: Log the convergence at the DEBUG level (1), and every iteration mismatch (2)
+        jac_builder: JacobianBuilder instance for (Ybus, pv, pq) to reuse (optional, one is created if None)
+        lin_solver: SparseLUSolver to reuse (optional, one is created if None)
     Returns:
+        Voltages, convergence flag, mismatch norm and number of iterations
 
     @see: L{runpf}
 
     @author: Ray Zimmerman (PSERC Cornell)
     """
 
+    # Jacobian structure (computed once, refilled at every iteration)
+    if jac_builder is None or not jac_builder.matches(Ybus, pv, pq):
+        jac_builder = JacobianBuilder(Ybus, pv, pq)
+
+    # linear solver (keeps the ordering of J between iterations and calls)
+    if lin_solver is None:
+        lin_solver = SparseLUSolver()
+    lin_solver.invalidate()
+
     # initialize
     converged = 0
     i = 0
@@ -123,7 +140,6 @@ def newtonpf(Ybus, Sbus, V0, pv, pq, tol, max_it, verbose=False):
     Vm = abs(V)
 
     # set up indexing for updating V
-    pvpq = r_[pv, pq]
     npv = len(pv)
     npq = len(pq)
 
@@ -147,14 +163,12 @@ def newtonpf(Ybus, Sbus, V0, pv, pq, tol, max_it, verbose=False):
     normF = linalg.norm(F, Inf)
 
     if verbose > 1:
-        sys.stdout.write('\n it    max P & Q mismatch (p.u.)')
-        sys.stdout.write('\n----  ---------------------------')
-        sys.stdout.write('\n%3d        %10.3e' % (i, normF))
+        logger.debug('Newton iteration %3d, max P & Q mismatch (p.u.) %10.3e', i, normF)
 
     if normF < tol:
         converged = 1
         if verbose > 1:
-            sys.stdout.write('\nConverged!\n')
+            logger.debug('Converged!')
 
     # do Newton iterations
     while not converged and i < max_it:
@@ -162,20 +176,10 @@ def newtonpf(Ybus, Sbus, V0, pv, pq, tol, max_it, verbose=False):
         i += 1
 
         # evaluate Jacobian
-        dS_dVm, dS_dVa = dSbus_dV(Ybus, V)  # compute the derivatives
-
-        J11 = dS_dVa[array([pvpq]).T, pvpq].real
-        J12 = dS_dVm[array([pvpq]).T, pq].real
-        J21 = dS_dVa[array([pq]).T, pvpq].imag
-        J22 = dS_dVm[array([pq]).T, pq].imag
-
-        J = vstack([
-                hstack([J11, J12]),
-                hstack([J21, J22])
-            ], format="csr")
+        J = jac_builder.update(V)
 
         # compute update step
-        dx = -1 * spsolve(J, F)
+        dx = -1 * lin_solver.solve(J, F)
 
         # update voltage
         if npv:
@@ -194,19 +198,115 @@ def newtonpf(Ybus, Sbus, V0, pv, pq, tol, max_it, verbose=False):
                mis[pq].imag]  # concatenate again
 
         # check for convergence
+        normF_prev = normF
         normF = linalg.norm(F, Inf)
         if verbose > 1:
-            sys.stdout.write('\n%3d        %10.3e' % (i, normF))
+            logger.debug('Newton iteration %3d, max P & Q mismatch (p.u.) %10.3e', i, normF)
+
+        # an outdated factorization that does not reduce the mismatch is refreshed (only with dishonest Newton)
+        if normF > normF_prev:
+            lin_solver.invalidate()
 
         if normF < tol:
             converged = 1
             if verbose:
-                sys.stdout.write("\nNewton's method power flow converged in "
-                                 "%d iterations.\n" % i)
+                logger.debug("Newton's method power flow converged in %d iterations", i)
 
     if verbose:
         if not converged:
-            sys.stdout.write("\nNewton's method power did not converge in %d "
-                             "iterations.\n" % i)
+            logger.debug("Newton's method power flow did not converge in %d iterations", i)
+
+    return V, converged, normF, i
+
+
+def newtonpf_batch(Ybus, Sbus, V0, pv, pq, tol, max_it, jac_builder=None, lin_solver=None, contraction=0.5):
+    """
+    Solves several power flow snapshots that share the admittance matrix and the bus types (i.e. the steps of a time
+    series) with a Newton-like method.
+
+    All the snapshots are iterated together: the mismatches and the convergence checks are evaluated for the whole
+    block at once, and the updates of all the snapshots come from a single multiple right hand side solve with the
+    same factorized Jacobian. The Jacobian is factorized at the initial voltages and it is only refreshed (at the
+    voltages of the worst snapshot) when the mismatch of some snapshot does not decrease fast enough. The snapshots
+    that converge are frozen while the rest keep iterating.
+
+    Args:
+        Ybus: Admittance matrix
+        Sbus: Matrix of nodal power injections (one snapshot per row)
+        V0: Initial voltages, either one array for all the snapshots or a matrix with one row per snapshot
+        pv: Array with the indices of the PV buses
+        pq: Array with the indices of the PQ buses
+        tol: Tolerance
+        max_it: Maximum number of iterations
+        jac_builder: JacobianBuilder instance for (Ybus, pv, pq) to reuse (optional, one is created if None)
+        lin_solver: SparseLUSolver to reuse (optional, one is created if None)
+        contraction: Minimum mismatch reduction ratio per iteration to keep the factorized Jacobian
+
+    Returns:
+        Voltages matrix (one row per snapshot), convergence flags, mismatch norms and number of iterations of every
+        snapshot
+    """
+    if jac_builder is None or not jac_builder.matches(Ybus, pv, pq):
+        jac_builder = JacobianBuilder(Ybus, pv, pq)
+
+    if lin_solver is None:
+        lin_solver = SparseLUSolver()
+
+    nt, nb = Sbus.shape
+    V = array(broadcast_to(V0, (nt, nb)), dtype=complex)
+    Va = angle(V)
+    Vm = abs(V)
+
+    pvpq = r_[pv, pq]
+    npvpq = len(pvpq)
+    nj = npvpq + len(pq)
+
+    def mismatch(V):
+        mis = V * conj((Ybus * V.T).T) - Sbus
+        F = c_[mis[:, pvpq].real, mis[:, pq].imag]
+        normF = abs(F).max(axis=1) if nj > 0 else zeros(nt)
+        return F, normF
+
+    F, normF = mismatch(V)
+    iterations = zeros(nt, dtype=int)
+    converged = normF < tol
+    active = ~converged & isfinite(normF)
+
+    # Jacobian at the initial voltages of the first snapshot
+    try:
+        lin_solver.factorize(jac_builder.update(V[0, :]))
+    except RuntimeError:  # singular Jacobian
+        return V, converged, normF, iterations
+
+    i = 0
+    while active.any() and i < max_it:
+        i += 1
+
+        # one solve for all the snapshots still iterating
+        dx = -1 * lin_solver.solve_factorized(F[active, :].T).T
+
+        Va[ix_(active, pvpq)] += dx[:, :npvpq]
+        Vm[ix_(active, pq)] += dx[:, npvpq:]
+        V[active, :] = Vm[active, :] * exp(1j * Va[active, :])
+        Vm = abs(V)
+        Va = angle(V)
+
+        normF_prev = normF
+        F, normF = mismatch(V)
+        iterations[active] += 1
+
+        # refresh the Jacobian when the fixed one does not reduce the mismatch of some snapshot fast enough
+        slow = active & ~(normF < contraction * normF_prev)
+
+        converged = normF < tol
+        active = ~converged & isfinite(normF)
+
+        slow &= active
+        if slow.any():
+            worst = np.where(slow)[0][np.argmax(normF[slow])]
+            try:
+                lin_solver.factorize(jac_builder.update(V[worst, :]))
+            except RuntimeError:  # singular Jacobian
+                break
 
-    return V, converged, normF
+    return V, converged, normF, iterations
@@ -0,0 +1,133 @@
+"""
+Cache of solved operating points.
+
+The time series profiles repeat often (auto-repeated profiles, flat nights, identical week days), and every repeated
+state gives the same power flow solution. The solutions are stored under a key that identifies the state:
+
+    - the power injections, quantized to a resolution so that the values that only differ by rounding noise match
+    - the branches status
+    - the bus types
+
+The keys are hashes of those arrays, and the cache keeps the most recently used entries within a memory budget.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+class OperatingPointCache(object):
+    """
+    Least recently used cache of power flow solutions, bounded by the memory taken by the stored values
+    """
+
+    def __init__(self, max_bytes=64 * 1024 ** 2, resolution=1e-6):
+        """
+        Constructor
+        @param max_bytes: Memory budget of the stored values (bytes)
+        @param resolution: Quantization step of the power injections (same units as the injections)
+        """
+        self.max_bytes = max_bytes
+
+        self.resolution = resolution
+
+        # key -> (value, size in bytes), ordered from the least to the most recently used
+        self.entries = OrderedDict()
+
+        self.nbytes = 0
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_key(self, power, branch_status, bus_types):
+        """
+        Computes the key of a state
+        @param power: Array of power injections (complex or real; a state may be described by several of them, i.e.
+                      the loads and the generation, concatenated)
+        @param branch_status: Array with the status of the branches
+        @param bus_types: Array with the bus types
+        @return: key (bytes)
+        """
+        power = np.asarray(power)
+        if np.iscomplexobj(power):
+            power = np.r_[power.real, power.imag]
+
+        quantized = np.round(power / self.resolution).astype(np.int64)
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(quantized.tobytes())
+        digest.update(np.asarray(branch_status, dtype=np.int8).tobytes())
+        digest.update(np.asarray(bus_types, dtype=np.int8).tobytes())
+        return digest.digest()
+
+    def get(self, key):
+        """
+        Returns the value stored for a key, or None if there is none
+        @param key: state key (see get_key)
+        @return: stored value or None
+        """
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries that do not fit in the memory budget
+        @param key: state key (see get_key)
+        @param value: dictionary of numpy arrays
+        """
+        size = sum(arr.nbytes for arr in value.values())
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[1]
+
+        self.entries[key] = (value, size)
+        self.nbytes += size
+
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.nbytes -= evicted_size
+            self.evictions += 1
+
+    def add_hits(self, n):
+        """
+        Counts n lookups that have been served without querying the cache (i.e. repeated states within a batch)
+        @param n: number of hits
+        """
+        self.hits += n
+
+    def hit_rate(self):
+        """
+        Fraction of the lookups that found a stored value
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def reset_stats(self):
+        """
+        Resets the statistics (the entries are kept)
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        """
+        Removes all the entries
+        """
+        self.entries.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self.entries)
@@ -7,35 +7,40 @@ This file contains the classes to run power flow simulations recursively
 """
 
 from scipy.sparse.linalg import splu
-from PyQt4.QtCore import QThread, SIGNAL
+from .Engine import Engine
 from warnings import warn
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import time
-import pandas as pd
+import logging
 import numpy as np
 from numpy import asarray, argmax, arange, array, zeros, pi, exp, r_, c_, conj, \
                   angle, ix_, complex_, nonzero, copy, finfo
 
-from scipy.sparse.linalg import inv as sparse_inv
 from scipy.sparse import csr_matrix
-from scipy.optimize import minimize, linprog
 from .DCPowerFlow import dcpf
-from .NewtonRaphsonPowerFlow import newtonpf
+from .NewtonRaphsonPowerFlow import newtonpf, newtonpf_batch
 from .IwamotoPowerFlow import IwamotoNR
+from .JacobianBuilder import JacobianBuilder
+from .SparseLUSolver import SparseLUSolver
 from .ContinuationPowerFlow import runcpf2
 from .FastDecoupledPowerFlow import fdpf
 from .GaussSeidelPowerFlow import gausspf
 from .HELMPowerFlow import helm, helm_bifurcation_point
 from .HELMZPowerFlow import helmz
 from .ZbusPowerFlow import zbus
+from .Topology import get_island_indices, renumber_buses
 from .BranchDefinitions import *
 from .BusDefinitions import *
 from .GenDefinitions import *
+from .Telemetry import get_logger, log_solve
 
 from enum import Enum
 
 import scipy
 scipy.ALLOW_THREADS = True
 
+logger = get_logger('PowerFlow')
+
 
 class SolverType(Enum):
     NR = 1
@@ -50,12 +55,59 @@ class SolverType(Enum):
     HELMZ = 10
 
 
-class MultiCircuitVoltageStability(QThread):
+class ParallelMode(Enum):
+    SERIAL = 1
+    THREADS = 2
+    PROCESSES = 3
+
+
+class WarmStart(Enum):
+    NONE = 1  # start from the initial voltages of the case
+    PREVIOUS = 2  # start from the last solution
+    PREDICTOR = 3  # start from the last solution corrected with the sensitivities of the last Jacobian
+
+
+def solve_island_power_flow(circuit_power_flow, tol, max_it, enforce_q_limits, set_last_solution,
+                            solver_to_retry_with=None, warm_start=WarmStart.NONE):
+    """
+    Runs the power flow of an island, retrying with another solver if it does not converge.
+    This is a module level function so that it can be dispatched to a process pool: the power flow object travels to
+    the worker and back (see CircuitPowerFlow.__getstate__).
+    Args:
+        circuit_power_flow: CircuitPowerFlow instance of the island
+        tol: Solution tolerance
+        max_it: Maximum number of iterations
+        enforce_q_limits: Enforce the generators reactive power limits?
+        set_last_solution: Start from the last solution?
+        solver_to_retry_with: Solver type to use if the first attempt fails (None to not retry)
+        warm_start: WarmStart policy: where the solution starts from
+
+    Returns:
+        The CircuitPowerFlow instance after solving, convergence flag
+    """
+    remember_last_solution = warm_start != WarmStart.NONE
+    verbose = logger.isEnabledFor(logging.DEBUG)
+    succeeded = circuit_power_flow.run(tol=tol, max_it=max_it, enforce_q_limits=enforce_q_limits,
+                                       remember_last_solution=remember_last_solution, verbose=verbose,
+                                       set_last_solution=set_last_solution,
+                                       predict=warm_start == WarmStart.PREDICTOR)
+    if not succeeded:
+        if solver_to_retry_with is not None:
+            logger.info('%s did not converge, retrying with %s', circuit_power_flow.solver_type, solver_to_retry_with)
+            circuit_power_flow.solver_type = solver_to_retry_with
+            succeeded = circuit_power_flow.run(tol=tol, max_it=max_it, enforce_q_limits=enforce_q_limits,
+                                               remember_last_solution=remember_last_solution, verbose=verbose,
+                                               set_last_solution=set_last_solution)
+
+    return circuit_power_flow, succeeded
+
+
+class MultiCircuitVoltageStability(Engine):
     """
     This class handles the power flow simulation that allows the simulation of multiple islands
     """
     def __init__(self, baseMVA,  bus, gen, branch, graph, solver_type, is_an_island=False):
-        QThread.__init__(self)
+        Engine.__init__(self)
 
         self.run_continuation_pf = False
 
@@ -63,7 +115,7 @@ class MultiCircuitVoltageStability(QThread):
         self.bus = bus.copy()
         self.gen = gen.copy()
         self.branch = branch.copy()
-        self.graph = graph.copy()
+        self.graph = graph  # not modified (the islands are found from the branches status), so it is shared
         self.recalculate_islands = True
         self.solver_type = solver_type
 
@@ -123,72 +175,33 @@ class MultiCircuitVoltageStability(QThread):
     def get_islands(self, graph, baseMVA, bus, gen, branch):
         """
         Computes the islands of this circuit and composes the respective island's data structures
+        Args:
+            graph: Circuit graph (not used, the islands are found from the branches status)
+            baseMVA: Base power
+            bus: Buses structure
+            gen: Generators structure
+            branch: Branches structure
 
         Returns:
             list of Circuit instances with the data of this circuit split by island groups.
         """
-        from networkx import connected_components
-
-        # get the failed edges
-        failed_edges = self.get_failed_edges(branch)
-
-        # remove the failed edges from the graph
-        G = graph.copy()
-        if failed_edges is not None:
-            for e in failed_edges:
-                G.remove_edge(*e)
-
-        # get he groups of nodes that are connected together
-        groups = connected_components(G)
-        islands = list()
-        for island in groups:
-            islands.append(list(island))
-
         nl = len(branch)
-        branch[:, O_INDEX] = list(range(nl))
+        branch[:, O_INDEX] = arange(nl)
+
+        original_indices, _, _ = get_island_indices(self.bus, self.gen, self.branch)
 
         island_circuits = list()
-        original_indices = list()
-
-        for island in islands:
-            island.sort()
-            original_indices_entry = [None] * 3  # this stores the original indices of bus, gen, branch of the island
-
-            # island is a list of the nodes that form an island
-            # print(island)
-
-            # populate the buses structure
-            bus = array(self.bus[island, :].copy())
-            original_indices_entry[0] = island
-
-            # Populate the generators structure
-            bus_gen_idx = self.gen[:, GEN_BUS].astype(np.int)
-
-            # for i in range(len(bus_gen_idx)):
-            #     if bus_gen_idx[i] in island:
-            #         generators.append(self.gen[i, :])
-            gen_original_indices = [i for i in range(len(bus_gen_idx)) if bus_gen_idx[i] in island]
-            gen = self.gen[gen_original_indices, :]
-            original_indices_entry[1] = gen_original_indices
-
-            # Populate the branches structure
-            bus_from_idx = self.branch[:, F_BUS].astype(np.int)
-            bus_to_idx = self.branch[:, T_BUS].astype(np.int)
-            # for i in range(len(bus_from_idx)):
-            #     if bus_from_idx[i] in island and bus_to_idx[i] in island:
-            #         branches.append(self.branch[i, :].copy())
-            branch_original_indices = [i for i in range(len(bus_from_idx)) if bus_from_idx[i] in island and bus_to_idx[i] in island]
-            branch = self.branch[branch_original_indices, :].copy()
-            original_indices_entry[2] = branch_original_indices
+
+        for bus_idx, gen_idx, branch_idx in original_indices:
 
             # new circuit hosting the island grid
-            circuit = MultiCircuitVoltageStability(baseMVA, bus, gen, branch, graph, self.solver_type, is_an_island=True)
+            circuit = MultiCircuitVoltageStability(baseMVA, self.bus[bus_idx, :], self.gen[gen_idx, :],
+                                                   self.branch[branch_idx, :], graph, self.solver_type,
+                                                   is_an_island=True)
 
             # add the circuit to the islands
             island_circuits.append(circuit)
 
-            original_indices.append(original_indices_entry)
-
         recalculate_islands = False
         return island_circuits, original_indices, recalculate_islands
 
@@ -199,25 +212,7 @@ class MultiCircuitVoltageStability(QThread):
 
         # now it is needed to re number the buses in all the structures
         if self.is_an_island:
-            bus = self.bus.copy()
-            gen = self.gen.copy()
-            branch = self.branch.copy()
-
-            for i in range(len(bus)):
-                # i is the new bus index, the old bus index has to be replaced in the branches and generation structures
-                old_i = bus[i, BUS_I]
-
-                for k in range(len(gen)):
-                    if gen[k, GEN_BUS] == old_i:
-                        gen[k, GEN_BUS] = i
-
-                for k in range(len(branch)):
-                    if branch[k, F_BUS] == old_i:
-                        branch[k, F_BUS] = i
-                    elif branch[k, T_BUS] == old_i:
-                        branch[k, T_BUS] = i
-
-                bus[i, BUS_I] = int(i)
+            bus, gen, branch = renumber_buses(self.bus, self.gen, self.branch)
         else:
             bus = self.bus
             gen = self.gen
@@ -274,7 +269,7 @@ class MultiCircuitVoltageStability(QThread):
             island_count = len(self.island_circuits)
 
             if self.isMaster:
-                self.emit(SIGNAL('progress(float)'), 0.0)
+                self.report_progress(0.0)
 
             mismatches = list()
 
@@ -297,14 +292,14 @@ class MultiCircuitVoltageStability(QThread):
                         k += 1
                     self.has_results = True
                 else:
-                    print('The island did not had a continuation power flow result.')
+                    logger.warning('The island %d did not have a continuation power flow result', i)
 
                     self.has_results = False
 
                 # emmit the progress signal
                 if self.isMaster:
                     prog = ((i+1)/island_count)*100
-                    self.emit(SIGNAL('progress(float)'), prog)
+                    self.report_progress(prog)
 
                 i += 1
 
@@ -313,7 +308,7 @@ class MultiCircuitVoltageStability(QThread):
 
         # send the finnish signal
         if self.isMaster:
-            self.emit(SIGNAL('done()'))
+            self.report_done()
 
     def end_process(self):
         self.cancel = True
@@ -352,25 +347,25 @@ class MultiCircuitVoltageStability(QThread):
             if 49 <= last_freq <= 51:
                 # is stable
                 self.grid_survives = True
-                print("Survives")
+                logger.debug('The grid survives')
             else:
                 self.grid_survives = False
         else:
             self.grid_survives = True
 
 
-class MultiCircuitPowerFlow(QThread):
+class MultiCircuitPowerFlow(Engine):
     """
     This class handles the power flow simulation that allows the simulation of multiple islands
     """
     def __init__(self, baseMVA,  bus, gen, branch, graph, solver_type, is_an_island=False):
-        QThread.__init__(self)
+        Engine.__init__(self)
 
         self.baseMVA = baseMVA
         self.bus = bus.copy()
         self.gen = gen.copy()
         self.branch = branch.copy()
-        self.graph = graph.copy()
+        self.graph = graph  # not modified (the islands are found from the branches status), so it is shared
         self.recalculate_islands = True
         self.solver_type = solver_type
 
@@ -383,6 +378,9 @@ class MultiCircuitPowerFlow(QThread):
 
         self.mismatch = 0
 
+        # iterations of the last run (the maximum of the islands)
+        self.iterations = 0
+
         # declare power flow results arrays:
         nb = len(self.bus)
         nl = len(self.branch)
@@ -419,7 +417,7 @@ class MultiCircuitPowerFlow(QThread):
                 val = self.gen_rosetta[(self.gen_rosetta.Fixed == 0) & (self.gen_rosetta.island_idx == i)].values
                 self.list_gen_enabled_indices.append([val[:, 0], val[:, 1]])
 
-            print('This is not an island :)')
+            logger.debug('Circuit split in %d islands', len(self.island_circuits))
         else:
             self.circuit_power_flow = self.get_power_flow_instance(solver_type)
 
@@ -431,6 +429,13 @@ class MultiCircuitPowerFlow(QThread):
         self.isMaster = True
         self.cancel = False
         self.solver_to_retry_with = None
+        self.warm_start = WarmStart.NONE
+        self.refactor_every = 1
+
+        # islands execution options (see set_parallel_options)
+        self.parallel_mode = ParallelMode.SERIAL
+        self.max_workers = None
+        self.executor = None
 
     def set_loads(self, P, Q, indices_list=None):
         """
@@ -477,110 +482,55 @@ class MultiCircuitPowerFlow(QThread):
     def get_islands(self, graph, baseMVA, bus_original, gen_original, branch_original):
         """
         Computes the islands of this circuit and composes the respective island's data structures
+        Args:
+            graph: Circuit graph (not used, the islands are found from the branches status)
+            baseMVA: Base power
+            bus_original: Buses structure
+            gen_original: Generators structure
+            branch_original: Branches structure
 
         Returns:
             list of Circuit instances with the data of this circuit split by island groups.
         """
-        from networkx import connected_components
-
-        # get the failed edges
-        failed_edges = self.get_failed_edges(branch_original)
-
-        # remove the failed edges from the graph
-        G = graph.copy()
-        if failed_edges is not None:
-            for e in failed_edges:
-                G.remove_edge(*e)
-
-        # get he groups of nodes that are connected together
-        groups = connected_components(G)
-        islands = list()
-        bus_island = dict()
-        island_idx = 0
-        for island in groups:
-            isl = list(island)
-            isl.sort()
-            islands.append(array(isl))
-            for bus in isl:
-                bus_island[bus] = island_idx
-            island_idx += 1
-
         nl = len(branch_original)
         nb = len(bus_original)
         ng = len(gen_original)
-        branch_original[:, O_INDEX] = list(range(nl))
+        branch_original[:, O_INDEX] = arange(nl)
+
+        original_indices, bus_labels, gen_labels = get_island_indices(self.bus, self.gen, self.branch)
 
         island_circuits = list()
-        original_indices = list()
         fixed_power_indices = list()
 
-        bus_rosetta_vals = zeros((nb, 4), dtype=int)
-        gen_rosetta_vals = zeros((ng, 4), dtype=int)
-
-        island_idx = 0
-        for island in islands:
-
-            original_indices_entry = [None] * 3  # this stores the original indices of bus, gen, branch of the island
-            fixed_power = [None] * 3
-
-            # island is a list of the nodes that form an island
-            # print('island ', island)
-
-            # fill rosetta
-            bus_rosetta_vals[island, 0] = island  # original indices
-            bus_rosetta_vals[island, 1] = np.arange(0, len(island))  # indices in the current island
-            bus_rosetta_vals[island, 2] = np.ones(len(island)) * island_idx  # index of the island itself
-            bus_rosetta_vals[island, 3] = bus_original[island, FIX_POWER_BUS]  # index of the island itself
-
-            # populate the buses structure
-            bus_island = array(self.bus[island, :].copy())
-            fix_idx = np.where(bus_original[:, FIX_POWER_BUS] == 0)[0]
-            original_indices_entry[0] = array(island)
-            fixed_power[0] = fix_idx
-
-            # Populate the generators structure
-            bus_gen_idx = self.gen[:, GEN_BUS].astype(np.int)
-
-            # for i in range(len(bus_gen_idx)):
-            #     if bus_gen_idx[i] in island:
-            #         generators.append(self.gen[i, :])
-            gen_original_indices = array([i for i in range(len(bus_gen_idx)) if bus_gen_idx[i] in island], dtype=int)
-            gen_island = self.gen[gen_original_indices, :]
-            fix_idx = np.where(gen_original[:, FIX_POWER_GEN] == 0)[0]
-            original_indices_entry[1] = gen_original_indices
-            fixed_power[1] = fix_idx
-
-            gen_rosetta_vals[gen_original_indices, 0] = gen_original_indices
-            gen_rosetta_vals[gen_original_indices, 1] = np.arange(0, len(gen_original_indices))
-            gen_rosetta_vals[gen_original_indices, 2] = np.ones(len(gen_original_indices)) * island_idx
-            gen_rosetta_vals[gen_original_indices, 3] = gen_original[gen_original_indices, FIX_POWER_GEN]
-
-            # Populate the branches structure
-            bus_from_idx = self.branch[:, F_BUS].astype(np.int)
-            bus_to_idx = self.branch[:, T_BUS].astype(np.int)
-            # for i in range(len(bus_from_idx)):
-            #     if bus_from_idx[i] in island and bus_to_idx[i] in island:
-            #         branches.append(self.branch[i, :].copy())
-            branch_original_indices = array([i for i in range(len(bus_from_idx)) if bus_from_idx[i] in island and bus_to_idx[i] in island], dtype=int)
-            branch_island = self.branch[branch_original_indices, :].copy()
-            original_indices_entry[2] = branch_original_indices
+        # position of every bus and generator within its island
+        bus_at_island = zeros(nb, dtype=int)
+        gen_at_island = zeros(ng, dtype=int)
+
+        bus_fix_idx = np.where(bus_original[:, FIX_POWER_BUS] == 0)[0]
+        gen_fix_idx = np.where(gen_original[:, FIX_POWER_GEN] == 0)[0]
+
+        for bus_idx, gen_idx, branch_idx in original_indices:
+
+            bus_at_island[bus_idx] = arange(len(bus_idx))
+            gen_at_island[gen_idx] = arange(len(gen_idx))
+            fixed_power_indices.append([bus_fix_idx, gen_fix_idx, None])
 
             # new circuit hosting the island grid
-            circuit = MultiCircuitPowerFlow(baseMVA, bus_island, gen_island, branch_island, graph, self.solver_type, is_an_island=True)
+            circuit = MultiCircuitPowerFlow(baseMVA, self.bus[bus_idx, :], self.gen[gen_idx, :],
+                                            self.branch[branch_idx, :], graph, self.solver_type, is_an_island=True)
 
             # add the circuit to the islands
             island_circuits.append(circuit)
-            original_indices.append(original_indices_entry)
-            fixed_power_indices.append(fixed_power)
-
-            island_idx += 1
 
         recalculate_islands = False
 
         # turn rosetta into a pandas dataframe, it will allow easy querying later)
+        import pandas as pd
         cols = ['Original_idx', 'at_island_idx', 'island_idx', 'Fixed']
-        bus_rosetta = pd.DataFrame(data=bus_rosetta_vals, columns=cols, dtype=int)
-        gen_rosetta = pd.DataFrame(data=gen_rosetta_vals, columns=cols, dtype=int)
+        bus_rosetta_vals = np.c_[arange(nb), bus_at_island, bus_labels, bus_original[:, FIX_POWER_BUS]]
+        gen_rosetta_vals = np.c_[arange(ng), gen_at_island, gen_labels, gen_original[:, FIX_POWER_GEN]]
+        bus_rosetta = pd.DataFrame(data=bus_rosetta_vals.astype(int), columns=cols, dtype=int)
+        gen_rosetta = pd.DataFrame(data=gen_rosetta_vals.astype(int), columns=cols, dtype=int)
 
         return island_circuits, original_indices, recalculate_islands, fixed_power_indices, bus_rosetta, gen_rosetta
 
@@ -591,25 +541,7 @@ class MultiCircuitPowerFlow(QThread):
 
         # now it is needed to re number the buses in all the structures
         if self.is_an_island:
-            bus = self.bus.copy()
-            gen = self.gen.copy()
-            branch = self.branch.copy()
-
-            for i in range(len(bus)):
-                # i is the new bus index, the old bus index has to be replaced in the branches and generation structures
-                old_i = bus[i, BUS_I]
-
-                for k in range(len(gen)):
-                    if gen[k, GEN_BUS] == old_i:
-                        gen[k, GEN_BUS] = i
-
-                for k in range(len(branch)):
-                    if branch[k, F_BUS] == old_i:
-                        branch[k, F_BUS] = i
-                    elif branch[k, T_BUS] == old_i:
-                        branch[k, T_BUS] = i
-
-                bus[i, BUS_I] = int(i)
+            bus, gen, branch = renumber_buses(self.bus, self.gen, self.branch)
         else:
             bus = self.bus
             gen = self.gen
@@ -618,7 +550,26 @@ class MultiCircuitPowerFlow(QThread):
         return CircuitPowerFlow(self.baseMVA, bus, branch, gen, solver_type)
 
     def set_run_options(self, solver_type=SolverType.NRFD_BX, tol=1e-3, max_it=10, enforce_reactive_power_limits=True,
-                        isMaster=True, set_last_solution=True, solver_to_retry_with=None):
+                        isMaster=True, set_last_solution=True, solver_to_retry_with=None, warm_start=WarmStart.NONE,
+                        refactor_every=1):
+        """
+        Set the execution parameters
+        Args:
+            solver_type: Power flow solver
+            tol: Solution tolerance
+            max_it: Maximum number of iterations
+            enforce_reactive_power_limits: Enforce the generators reactive power limits?
+            isMaster: Emit the progress signals?
+            set_last_solution: Use the last solution? (or use the flat start)
+            solver_to_retry_with: Solver type to use if the first attempt fails (None to not retry)
+            warm_start: WarmStart policy. With WarmStart.NONE every run starts from the initial voltages of the case,
+                        otherwise it starts from the last solution (i.e. the previous step of a time series),
+                        corrected with the last Jacobian sensitivities to the power changes with WarmStart.PREDICTOR
+            refactor_every: Number of Newton-Raphson linear solves done with the same LU factorization: 1 is the
+                            regular Newton-Raphson, k > 1 a dishonest Newton-Raphson that refreshes the factorization
+                            every k solves or when the mismatch grows. A factorization is never reused from one run to
+                            the next (only its fill-reducing ordering is)
+        """
         self.solver_type = solver_type
         self.tolerance = tol
         self.max_iterations = max_it
@@ -626,6 +577,188 @@ class MultiCircuitPowerFlow(QThread):
         self.isMaster = isMaster
         self.set_last_solution = set_last_solution
         self.solver_to_retry_with = solver_to_retry_with
+        self.warm_start = warm_start
+        self.refactor_every = max(int(refactor_every), 1)
+
+    def set_parallel_options(self, parallel_mode=ParallelMode.SERIAL, max_workers=None):
+        """
+        Set how the islands are solved
+        Args:
+            parallel_mode: ParallelMode.SERIAL solves the islands one after the other, ParallelMode.THREADS dispatches
+                           them to a thread pool (the sparse factorizations release the GIL) and
+                           ParallelMode.PROCESSES to a process pool (the island power flow objects are sent to the
+                           workers and back on every run)
+            max_workers: Number of workers of the pool (None for the executor default)
+        """
+        if parallel_mode != self.parallel_mode or max_workers != self.max_workers:
+            self.shutdown_executor()
+
+        self.parallel_mode = parallel_mode
+        self.max_workers = max_workers
+
+    def get_executor(self):
+        """
+        Returns the pool used to solve the islands, creating it the first time (it is kept between runs)
+        """
+        if self.executor is None:
+            if self.parallel_mode == ParallelMode.PROCESSES:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def shutdown_executor(self):
+        """
+        Releases the workers pool
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def update_island_results(self):
+        """
+        Copies the results of the island power flow object to the results arrays of this island
+        """
+        self.grid_survives = self.circuit_power_flow.is_the_solution_collapsed()
+        # if self.solver_type == SolverType.HELM and not self.last_power_flow_succeeded:
+        #     self.grid_survives = False
+
+        # get the nodal results
+        self.voltage[:] = self.circuit_power_flow.get_voltage_pu()
+        self.power[:] = self.circuit_power_flow.get_power_pu()
+        self.collapsed_nodes[:] = 1 - int(self.grid_survives)
+
+        # get the branches results
+        self.circuit_power_flow.update_branches_power_flow()  # calculate the branches flow
+        # only valid branches are used
+        self.power_from[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.Sf
+        self.power_to[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.St
+        self.current[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.get_branch_current_flows()
+        self.loading[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.get_branch_loading()
+        self.losses[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.get_losses()
+        self.mismatch = self.circuit_power_flow.mismatch
+        self.iterations = self.circuit_power_flow.iterations
+
+    def gather_island_results(self, i):
+        """
+        Copies the results of the island i into the results arrays of the complete circuit
+        Args:
+            i: island index
+        """
+        island = self.island_circuits[i]
+        b_idx = self.original_indices[i][0]
+        br_idx = self.original_indices[i][2]
+
+        self.last_power_flow_succeeded[i] = island.last_power_flow_succeeded
+
+        # get the nodal results
+        self.voltage[b_idx] = island.voltage
+        self.collapsed_nodes[b_idx] = island.collapsed_nodes
+        self.power[b_idx] = island.power
+
+        # get the branches results
+        # only valid branches are used
+        self.power_from[br_idx] = island.power_from
+        self.power_to[br_idx] = island.power_to
+        self.current[br_idx] = island.current
+        self.loading[br_idx] = island.loading
+        self.losses[br_idx] = island.losses
+        logger.debug('Island %d mismatch: %s', i, island.mismatch)
+
+    def run_islands_serial(self):
+        """
+        Runs the islands one after the other
+        Returns: list of the mismatches of the islands that have been solved
+        """
+        island_count = len(self.island_circuits)
+        mismatches = list()
+
+        for i, island in enumerate(self.island_circuits):
+
+            # run island power flow
+            island.set_run_options(self.solver_type, self.tolerance, self.max_iterations,
+                                   self.enforce_reactive_power_limits,
+                                   solver_to_retry_with=self.solver_to_retry_with, warm_start=self.warm_start,
+                                   refactor_every=self.refactor_every)
+            island.run()
+
+            self.gather_island_results(i)
+            mismatches.append(island.mismatch)
+
+            # emmit the progress signal
+            if self.isMaster:
+                self.report_progress(((i + 1) / island_count) * 100)
+
+            if self.cancel:
+                break
+
+        return mismatches
+
+    def run_islands_parallel(self):
+        """
+        Runs the islands concurrently in the pool selected with set_parallel_options.
+        The results are gathered (and the progress is reported) as the islands finish.
+        Returns: list of the mismatches of the islands that have been solved
+        """
+        island_count = len(self.island_circuits)
+        executor = self.get_executor()
+        mismatches = list()
+
+        futures = dict()
+        finished = 0
+        for i, island in enumerate(self.island_circuits):
+            island.set_run_options(self.solver_type, self.tolerance, self.max_iterations,
+                                   self.enforce_reactive_power_limits,
+                                   solver_to_retry_with=self.solver_to_retry_with, warm_start=self.warm_start,
+                                   refactor_every=self.refactor_every)
+
+            if self.parallel_mode == ParallelMode.PROCESSES:
+                # only the power flow object is sent to the worker (not the island object with its callbacks)
+                if island.circuit_power_flow is None:
+                    island.circuit_power_flow = island.get_power_flow_instance(self.solver_type)
+                else:
+                    island.circuit_power_flow.solver_type = self.solver_type
+                island.circuit_power_flow.linear_solver.refactor_every = self.refactor_every
+
+                if island.circuit_power_flow.the_grid_is_disabled:
+                    # nothing to solve
+                    island.run()
+                    self.gather_island_results(i)
+                    mismatches.append(island.mismatch)
+                    finished += 1
+                    continue
+
+                future = executor.submit(solve_island_power_flow, island.circuit_power_flow, self.tolerance,
+                                         self.max_iterations, self.enforce_reactive_power_limits,
+                                         island.set_last_solution, self.solver_to_retry_with, self.warm_start)
+            else:
+                future = executor.submit(island.run)
+
+            futures[future] = i
+
+        for future in as_completed(futures):
+            i = futures[future]
+            island = self.island_circuits[i]
+            result = future.result()
+
+            if result is not None:
+                # solved by a worker process: take its power flow object back and compute the island results here
+                island.circuit_power_flow, island.last_power_flow_succeeded = result
+                island.update_island_results()
+
+            self.gather_island_results(i)
+            mismatches.append(island.mismatch)
+
+            finished += 1
+            if self.isMaster:
+                self.report_progress((finished / island_count) * 100)
+
+            if self.cancel:
+                for f in futures:
+                    f.cancel()
+                break
+
+        return mismatches
 
     def run(self):
         """
@@ -638,6 +771,7 @@ class MultiCircuitPowerFlow(QThread):
                 self.circuit_power_flow = self.get_power_flow_instance(self.solver_type)
             else:
                 self.circuit_power_flow.solver_type = self.solver_type
+            self.circuit_power_flow.linear_solver.refactor_every = self.refactor_every
 
             if self.circuit_power_flow.the_grid_is_disabled:
                 warn('There are no results since the grid is imposible to solve')
@@ -645,98 +779,36 @@ class MultiCircuitPowerFlow(QThread):
 
             else:
                 # Solve and check if converged
-                self.last_power_flow_succeeded = self.circuit_power_flow.run(tol=self.tolerance, max_it=self.max_iterations,
-                                                                             enforce_q_limits=self.enforce_reactive_power_limits,
-                                                                             remember_last_solution=False, verbose=True,
-                                                                             set_last_solution=self.set_last_solution)
-                print('Succeeded: ', self.last_power_flow_succeeded)
-                if not self.last_power_flow_succeeded:
-                    if self.solver_to_retry_with is not None:
-                        print('Retrying with ', self.solver_to_retry_with)
-                        self.circuit_power_flow.solver_type = self.solver_to_retry_with
-                        self.last_power_flow_succeeded = self.circuit_power_flow.run(tol=self.tolerance, max_it=self.max_iterations,
-                                                                                     enforce_q_limits=self.enforce_reactive_power_limits,
-                                                                                     remember_last_solution=False, verbose=True,
-                                                                                     set_last_solution=self.set_last_solution)
-
-                self.grid_survives = self.circuit_power_flow.is_the_solution_collapsed()
-                # if self.solver_type == SolverType.HELM and not self.last_power_flow_succeeded:
-                #     self.grid_survives = False
-
-                # get the nodal results
-                self.voltage[:] = self.circuit_power_flow.get_voltage_pu()
-                self.power[:] = self.circuit_power_flow.get_power_pu()
-                self.collapsed_nodes[:] = 1 - int(self.grid_survives)
-
-                # get the branches results
-                self.circuit_power_flow.update_branches_power_flow()  # calculate the branches flow
-                # only valid branches are used
-                self.power_from[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.Sf
-                self.power_to[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.St
-                self.current[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.get_branch_current_flows()
-                self.loading[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.get_branch_loading()
-                self.losses[self.circuit_power_flow.in_service_branches] = self.circuit_power_flow.get_losses()
-                self.mismatch = self.circuit_power_flow.mismatch
+                self.circuit_power_flow, \
+                    self.last_power_flow_succeeded = solve_island_power_flow(self.circuit_power_flow,
+                                                                             self.tolerance, self.max_iterations,
+                                                                             self.enforce_reactive_power_limits,
+                                                                             self.set_last_solution,
+                                                                             self.solver_to_retry_with,
+                                                                             self.warm_start)
+                self.update_island_results()
 
         else:
             # run all the islands
             self.last_power_flow_succeeded = [0] * len(self.island_circuits)
-            i = 0
             self.cancel = False
-            island_count = len(self.island_circuits)
 
             if self.isMaster:
-                self.emit(SIGNAL('progress(float)'), 0.0)
-
-            mismatches = list()
+                self.report_progress(0.0)
 
-            for island in self.island_circuits:
-
-                # run island power flow
-                island.set_run_options(self.solver_type, self.tolerance, self.max_iterations,
-                                       self.enforce_reactive_power_limits,
-                                       solver_to_retry_with=self.solver_to_retry_with)
-
-                island.run()
-                b_idx = self.original_indices[i][0]
-                br_idx = self.original_indices[i][2]
-
-                self.last_power_flow_succeeded[i] = island.last_power_flow_succeeded
-
-                # if island.last_power_flow_succeeded or self.solver_type == SolverType.HELM:
-
-                # get the nodal results
-                self.voltage[b_idx] = island.voltage
-                self.collapsed_nodes[b_idx] = island.collapsed_nodes
-                self.power[b_idx] = island.power
-
-                # get the branches results
-                # only valid branches are used
-                self.power_from[br_idx] = island.power_from
-                self.power_to[br_idx] = island.power_to
-                self.current[br_idx] = island.current
-                self.loading[br_idx] = island.loading
-                self.losses[br_idx] = island.losses
-                mismatches.append(island.mismatch)
-                print('Mismatch (island): ', island.mismatch)
+            if self.parallel_mode == ParallelMode.SERIAL or len(self.island_circuits) < 2:
+                mismatches = self.run_islands_serial()
+            else:
+                mismatches = self.run_islands_parallel()
 
+            if len(mismatches) > 0:
                 self.mismatch = max(mismatches)
-
+                self.iterations = max(island.iterations for island in self.island_circuits)
                 self.has_results = True
 
-                # emmit the progress signal
-                if self.isMaster:
-                    prog = ((i+1)/island_count)*100
-                    self.emit(SIGNAL('progress(float)'), prog)
-
-                i += 1
-
-                if self.cancel:
-                    break
-
         # send the finnish signal
         if self.isMaster:
-            self.emit(SIGNAL('done()'))
+            self.report_done()
 
     def end_process(self):
         self.cancel = True
@@ -793,7 +865,7 @@ class MultiCircuitPowerFlow(QThread):
             if 49 <= last_freq <= 51:
                 # is stable
                 self.grid_survives = True
-                print("Survives")
+                logger.debug('The grid survives')
             else:
                 self.grid_survives = False
         else:
@@ -853,6 +925,9 @@ class CircuitPowerFlow(object):
         # list of pv and pq indices for the DC calculation
         self.pvpq_list = list()
 
+        # sorted list of the non slack bus indices (ordering of the reduced matrices)
+        self.non_slack_list = list()
+
         # Admittance matrix
         self.Ybus = None
 
@@ -876,12 +951,20 @@ class CircuitPowerFlow(object):
         # Bpp matrix sparse factorization
         self.Bpp_solver = None
 
+        # bus indices of the rows and columns of Bp and Bpp (they are reduced to the pv-pq and pq buses)
+        self.Bp_buses = None
+
+        self.Bpp_buses = None
+
         # vector of power injections
         self.Sbus = None
 
         # vector of the initial voltage
         self.V0 = None
 
+        # did the last run converge? Only a converged solution is remembered as the next starting point
+        self.last_solution_converged = False
+
         # vector of the taps of the branches
         self.tap = None
 
@@ -949,9 +1032,30 @@ class CircuitPowerFlow(object):
 
         self.mismatch = 0
 
+        # iterations of the last run, as counted by the solver (i.e. the HELM series coefficients plus the Iwamoto
+        # refinement iterations, or the corrector iterations of all the continuation steps)
+        self.iterations = 0
+
         self.continuation_Sbus = None
 
         self.continuation_V0 = None
+
+        # Reduced admittance matrix (without the slack rows and columns)
+        self.Yred = None
+
+        # Lazily built sparse LU factorization of Yred (see the Zred property)
+        self._Zred = None
+
+        # Jacobian structure of the Newton-Raphson methods, reused while Ybus and the bus types do not change
+        self.jacobian_builder = None
+
+        # Sparse LU solver of the Newton-Raphson methods: keeps the ordering of the Jacobian between iterations and
+        # runs (i.e. time series steps). Its refactor_every > 1 gives a dishonest Newton-Raphson (see
+        # MultiCircuitPowerFlow.set_run_options)
+        self.linear_solver = SparseLUSolver()
+
+        # Sparse LU solver of the batched Newton-Raphson (block diagonal Jacobians of several snapshots, see run_batch)
+        self.batch_linear_solver = None
         ################################################################################################################
 
         self.solver_type = solver_type
@@ -993,13 +1097,17 @@ class CircuitPowerFlow(object):
 
         # build admittance matrices
         self.Ybus, self.Yf, self.Yt, self.Ysh, self.A = self.makeYbus(self.baseMVA, self.bus, self.branch)
+        # canonical CSR format: the Jacobian builder then shares it, so the in place patches are seen by the solvers
+        self.Ybus = csr_matrix(self.Ybus)
+        self.Ybus.sum_duplicates()
 
         # get bus index lists of each type of bus
         self.ref_list, self.pv_list, self.pq_list, self.bus_types, self.the_grid_is_disabled = bustypes(self.bus, self.gen, self.Sbus)
         self.pvpq_list = r_[self.pv_list, self.pq_list]
+        self.non_slack_list = np.setdiff1d(arange(self.nb), self.ref_list)
 
-        # make reduced magnitudes
-        self.Yred, self.Zred, self.Iind = self.makeReduced(self.Ybus, self.V0, self.Sbus, self.ref_list, self.pvpq_list)
+        # make reduced magnitudes (the impedance matrix factorization is only computed on demand)
+        self.Yred, self.Iind = self.makeReduced(self.Ybus, self.V0, self.Sbus, self.ref_list, self.non_slack_list)
 
         if not self.the_grid_is_disabled:
 
@@ -1024,6 +1132,8 @@ class CircuitPowerFlow(object):
             pvpq_ = r_[self.pv_list, self.pq_list]
             self.Bp = self.Bp[array([pvpq_]).T, pvpq_].tocsc()  # splu requires a CSC matrix
             self.Bpp = self.Bpp[array([self.pq_list]).T, self.pq_list].tocsc()
+            self.Bp_buses = pvpq_
+            self.Bpp_buses = array(self.pq_list, dtype=int)
 
             # factor B matrices
             self.Bp_solver = None
@@ -1046,18 +1156,302 @@ class CircuitPowerFlow(object):
             # update the transformers and lines tap variables
             self.update_taps()
 
+    def __getstate__(self):
+        """
+        State used to pickle the object (i.e. to send it to a worker process).
+        The sparse LU factorizations can not be pickled, they are dropped and recomputed when needed.
+        """
+        state = self.__dict__.copy()
+        state['Bp_solver'] = None
+        state['Bpp_solver'] = None
+        state['_Zred'] = None
+        return state
+
+    @property
+    def Zred(self):
+        """
+        Reduced impedance matrix in factorized form.
+        The inverse of Yred is never formed (it is almost dense), instead the sparse LU factorization of Yred is
+        computed the first time it is requested and cached. Use Zred.solve(I) to compute Zred x I.
+        @return: scipy SuperLU object of Yred
+        """
+        if self._Zred is None:
+            self._Zred = splu(self.Yred.tocsc())
+        return self._Zred
+
+    def get_jacobian_builder(self, pv, pq):
+        """
+        Returns the Jacobian structure for the current Ybus and the given bus types. It is only rebuilt when they change.
+        @param pv: Array with the indices of the PV buses
+        @param pq: Array with the indices of the PQ buses
+        @return: JacobianBuilder instance
+        """
+        if self.jacobian_builder is None or not self.jacobian_builder.matches(self.Ybus, pv, pq):
+            self.jacobian_builder = JacobianBuilder(self.Ybus, pv, pq)
+        return self.jacobian_builder
+
+    @staticmethod
+    def add_to_entries(M, rows, cols, vals):
+        """
+        Adds values to some entries of a sparse matrix.
+        When all the entries are stored in the matrix (CSR or CSC), the data array is modified in place and the same
+        object is returned, otherwise a new matrix with the extended structure is returned.
+        @param M: CSR or CSC sparse matrix
+        @param rows: row indices of the entries
+        @param cols: column indices of the entries
+        @param vals: values to add
+        @return: The modified matrix
+        """
+        if M.format == 'csr':
+            major, minor = rows, cols
+        else:
+            major, minor = cols, rows
+
+        positions = zeros(len(vals), dtype=int)
+        for k in range(len(vals)):
+            a = M.indptr[major[k]]
+            b = M.indptr[major[k] + 1]
+            found = np.where(M.indices[a:b] == minor[k])[0]
+            if len(found) == 0:
+                # the structure changes: the caches that depend on it are rebuilt
+                return (M + csr_matrix((vals, (rows, cols)), shape=M.shape)).asformat(M.format)
+            positions[k] = a + found[0]
+
+        np.add.at(M.data, positions, vals)
+        return M
+
+    @staticmethod
+    def branch_admittances(branch):
+        """
+        Computes the admittance primitives of some branches the same way makeYbus does
+        @param branch: MATPOWER branch structure (rows of the branches)
+        @return: Yff, Yft, Ytf, Ytt arrays
+        """
+        stat = branch[:, BR_STATUS]
+        Ys = stat / (branch[:, BR_R] + 1j * branch[:, BR_X])
+        Bc = stat * branch[:, BR_B]
+        tap = ones(branch.shape[0], dtype=complex_)
+        i = nonzero(branch[:, TAP])
+        tap[i] = branch[i, TAP]
+        tap *= exp(1j * pi / 180 * branch[:, SHIFT])
+
+        Ytt = Ys + 1j * Bc / 2
+        Yff = Ytt / (tap * conj(tap))
+        Yft = - Ys / conj(tap)
+        Ytf = - Ys / tap
+
+        return Yff, Yft, Ytf, Ytt
+
+    def branch_dc_parameters(self, branch):
+        """
+        Computes the series susceptance and the phase shift injection of some branches the same way makeBdc does
+        @param branch: MATPOWER branch structure (rows of the branches)
+        @return: b, Pfinj arrays
+        """
+        b = branch[:, BR_STATUS] / branch[:, BR_X]
+        tap = ones(branch.shape[0])
+        i = find(branch[:, TAP])
+        tap[i] = branch[i, TAP]
+        b = b / tap
+        Pfinj = b * (-branch[:, SHIFT] * pi / 180)
+        return b, Pfinj
+
+    def fast_decoupled_branches(self, branch):
+        """
+        Returns copies of some branches modified the same way makeB does to form Bp and Bpp
+        @param branch: MATPOWER branch structure (rows of the branches)
+        @return: branches for Bp, branches for Bpp
+        """
+        branch_p = copy(branch)
+        branch_p[:, BR_B] = 0      # zero out line charging shunts
+        branch_p[:, TAP] = 1       # cancel out taps
+        if self.solver_type == SolverType.NRFD_XB:
+            branch_p[:, BR_R] = 0  # zero out line resistance
+
+        branch_pp = copy(branch)
+        branch_pp[:, SHIFT] = 0    # zero out phase shifters
+        if self.solver_type == SolverType.NRFD_BX:
+            branch_pp[:, BR_R] = 0  # zero out line resistance
+
+        return branch_p, branch_pp
+
+    def add_to_reduced(self, M, buses, rows, cols, vals):
+        """
+        Adds values given in full bus indices to a matrix reduced to some buses
+        @param M: Reduced sparse matrix
+        @param buses: bus index of every row and column of M
+        @param rows: bus indices of the rows
+        @param cols: bus indices of the columns
+        @param vals: values to add
+        @return: The modified matrix
+        """
+        pos = -ones(self.nb, dtype=int)
+        pos[buses] = arange(len(buses))
+        r = pos[rows]
+        c = pos[cols]
+        sel = (r >= 0) & (c >= 0) & (vals != 0)
+        if not sel.any():
+            return M
+        return self.add_to_entries(M, r[sel], c[sel], vals[sel])
+
+    def update_branches(self, idx, new_branch):
+        """
+        Replaces the data of some branches and patches the admittance and susceptance matrices accordingly.
+        Only the entries of the buses connected by those branches change, so Ybus, Yf, Yt, Yred, Bp, Bpp, B and Bf
+        are updated in place instead of being rebuilt, and only the factorizations of the modified matrices are
+        discarded. Changes that split the circuit in islands need a full rebuild of the power flow object.
+        @param idx: indices of the branches
+        @param new_branch: new rows of the branch structure for those branches
+        """
+        idx = np.atleast_1d(idx).astype(int)
+        old_branch = self.branch[idx, :].copy()
+        new_branch = np.atleast_2d(new_branch)
+
+        f = old_branch[:, F_BUS].astype(int)
+        t = old_branch[:, T_BUS].astype(int)
+        rows = r_[f, f, t, t]
+        cols = r_[f, t, f, t]
+
+        # admittance matrices
+        d = [n - o for n, o in zip(self.branch_admittances(new_branch), self.branch_admittances(old_branch))]
+        if any(np.any(x != 0) for x in d):
+            dYff, dYft, dYtf, dYtt = d
+            self.Ybus = self.add_to_entries(self.Ybus, rows, cols, r_[dYff, dYft, dYtf, dYtt])
+            self.Yf = self.add_to_entries(self.Yf, r_[idx, idx], r_[f, t], r_[dYff, dYft])
+            self.Yt = self.add_to_entries(self.Yt, r_[idx, idx], r_[f, t], r_[dYtf, dYtt])
+            if np.in1d(r_[f, t], self.ref_list).any():
+                # the slack injections change as well
+                self.Yred, self.Iind = self.makeReduced(self.Ybus, self.V0, self.Sbus, self.ref_list,
+                                                        self.non_slack_list)
+            else:
+                self.Yred = self.add_to_reduced(self.Yred, self.non_slack_list, rows, cols,
+                                                r_[dYff, dYft, dYtf, dYtt])
+            self._Zred = None
+
+        if self.Bp is not None:
+            # fast decoupled matrices
+            old_p, old_pp = self.fast_decoupled_branches(old_branch)
+            new_p, new_pp = self.fast_decoupled_branches(new_branch)
+
+            dp = -1 * r_[tuple(n - o for n, o in zip(self.branch_admittances(new_p),
+                                                      self.branch_admittances(old_p)))].imag
+            if np.any(dp != 0):
+                self.Bp = self.add_to_reduced(self.Bp, self.Bp_buses, rows, cols, dp)
+                self.Bp_solver = None
+
+            dpp = -1 * r_[tuple(n - o for n, o in zip(self.branch_admittances(new_pp),
+                                                       self.branch_admittances(old_pp)))].imag
+            if np.any(dpp != 0):
+                self.Bpp = self.add_to_reduced(self.Bpp, self.Bpp_buses, rows, cols, dpp)
+                self.Bpp_solver = None
+
+            # DC matrices
+            b_old, Pfinj_old = self.branch_dc_parameters(old_branch)
+            b_new, Pfinj_new = self.branch_dc_parameters(new_branch)
+            db = b_new - b_old
+            if np.any(db != 0):
+                self.B = self.add_to_entries(self.B, rows, cols, r_[db, -db, -db, db])
+                self.Bf = self.add_to_entries(self.Bf, r_[idx, idx], r_[f, t], r_[db, -db])
+            dPfinj = Pfinj_new - Pfinj_old
+            if np.any(dPfinj != 0):
+                self.Pfinj[idx] += dPfinj
+                np.add.at(self.Pbusinj, f, dPfinj)
+                np.add.at(self.Pbusinj, t, -dPfinj)
+
+        # branch data
+        self.branch[idx, :] = new_branch
+        tap = ones(len(idx), dtype=complex_)
+        i = nonzero(new_branch[:, TAP])
+        tap[i] = new_branch[i, TAP]
+        if self.tap is not None:
+            self.tap[idx] = tap * exp(1j * pi / 180 * new_branch[:, SHIFT])
+        self.out_of_service_branches = find(self.branch[:, BR_STATUS] == 0)
+        self.in_service_branches = find(self.branch[:, BR_STATUS]).astype(int)
+        self.need_to_update_branches_power = True
+
+    def set_branch_status(self, idx, status):
+        """
+        Connects or disconnects branches, updating the system matrices in place
+        @param idx: index or array of indices of the branches
+        @param status: 1 (in service) or 0 (out of service), scalar or array
+        """
+        idx = np.atleast_1d(idx).astype(int)
+        branch = self.branch[idx, :].copy()
+        branch[:, BR_STATUS] = status
+        self.update_branches(idx, branch)
+
+    def set_tap(self, idx, tap):
+        """
+        Sets the tap ratio of branches, updating the system matrices in place
+        @param idx: index or array of indices of the branches
+        @param tap: tap ratio (0 means no transformer, this is, a ratio of 1), scalar or array
+        """
+        idx = np.atleast_1d(idx).astype(int)
+        branch = self.branch[idx, :].copy()
+        branch[:, TAP] = tap
+        self.update_branches(idx, branch)
+
+    def set_shift(self, idx, shift):
+        """
+        Sets the phase shift angle of branches, updating the system matrices in place
+        @param idx: index or array of indices of the branches
+        @param shift: phase shift in degrees, scalar or array
+        """
+        idx = np.atleast_1d(idx).astype(int)
+        branch = self.branch[idx, :].copy()
+        branch[:, SHIFT] = shift
+        self.update_branches(idx, branch)
+
+    def set_impedance(self, idx, r=None, x=None, b=None):
+        """
+        Sets the series impedance and/or the total charging susceptance of branches, updating the system matrices
+        in place
+        @param idx: index or array of indices of the branches
+        @param r: resistance in p.u. (None to keep the current value)
+        @param x: reactance in p.u. (None to keep the current value)
+        @param b: total line charging susceptance in p.u. (None to keep the current value)
+        """
+        idx = np.atleast_1d(idx).astype(int)
+        branch = self.branch[idx, :].copy()
+        if r is not None:
+            branch[:, BR_R] = r
+        if x is not None:
+            branch[:, BR_X] = x
+        if b is not None:
+            branch[:, BR_B] = b
+        self.update_branches(idx, branch)
+
     def set_original_values(self):
         self.gen[:, PG] = self.generator_P.copy()
         self.gen[:, QG] = self.generator_Q.copy()
         self.bus[:, VM] = self.bus_Vm.copy()
         self.bus[:, VA] = self.bus_Va.copy()
 
-        self.V0 = self.bus[:, VM] * exp(1j * pi/180.0 * self.bus[:, VA])
+        self.V0 = self.get_initial_voltage()
 
-        if np.isnan(np.sum(self.V0)) or np.count_nonzero(self.V0):
-            self.V0 = ones(self.nb, dtype=complex)
+    def get_initial_voltage(self):
+        """
+        Returns the voltage vector the power flow starts from when the last solution is not remembered
+        (see set_original_values)
+        """
+        V0 = self.bus_Vm * exp(1j * pi/180.0 * self.bus_Va)
 
-        self.V0[self.active_generators_buses] = self.gen[self.active_generators, VG] / abs(self.V0[self.active_generators_buses]) * self.V0[self.active_generators_buses]
+        if np.isnan(np.sum(V0)) or np.count_nonzero(V0):
+            V0 = ones(self.nb, dtype=complex)
+
+        V0[self.active_generators_buses] = self.gen[self.active_generators, VG] / abs(V0[self.active_generators_buses]) * V0[self.active_generators_buses]
+
+        return V0
+
+    def set_generators_voltage(self, V, buses):
+        """
+        Sets the voltage magnitude of the generators buses to the generators set point, keeping the angle
+        @param V: voltage vector (modified in place)
+        @param buses: buses whose voltage is controlled (i.e. the PV and slack buses)
+        """
+        controlled = np.isin(self.active_generators_buses, buses)
+        gen_buses = self.active_generators_buses[controlled]
+        V[gen_buses] = self.gen[self.active_generators[controlled], VG] / abs(V[gen_buses]) * V[gen_buses]
 
     def set_continuation_initial_state(self, S0, V0):
         self.continuation_Sbus = S0.copy()
@@ -1070,6 +1464,39 @@ class CircuitPowerFlow(object):
         self.Sbus = self.makeSbus(self.baseMVA, self.bus, self.gen, self.active_generators, self.Cg)
         self.some_power_changed = False
 
+    def predict_voltage(self, Sbus_prev):
+        """
+        First order prediction of the solution for the current power injections, from the last solution (V0) computed
+        for the injections Sbus_prev. The voltage change is the solution of
+
+            J * [dVa(pv, pq), dVm(pq)] = [dP(pv, pq), dQ(pq)]
+
+        with the last factorization of the Newton-Raphson Jacobian, so it costs a single triangular solve.
+        Args:
+            Sbus_prev: Power injections of the last solution (p.u.)
+
+        Returns: Predicted voltages (the last solution if there is no Jacobian factorization to use)
+        """
+        pv = self.pv_list
+        pq = self.pq_list
+        npv = len(pv)
+        npq = len(pq)
+        n = npv + 2 * npq
+
+        if self.V0 is None or self.linear_solver.factor is None or self.linear_solver.shape != (n, n):
+            return self.V0
+
+        dS = self.Sbus - Sbus_prev
+        dx = self.linear_solver.solve_factorized(r_[dS[pv].real, dS[pq].real, dS[pq].imag])
+
+        Va = angle(self.V0)
+        Vm = abs(self.V0)
+        Va[pv] += dx[:npv]
+        Va[pq] += dx[npv:npv + npq]
+        Vm[pq] += dx[npv + npq:]
+
+        return Vm * exp(1j * Va)
+
     def update_taps(self):
         """
         update the tap configuration of the branch elements
@@ -1281,6 +1708,8 @@ class CircuitPowerFlow(object):
     def makeReduced(self, Ybus, V0, Sbus, ref, pvpq):
         """
         Produce the reduced system matrices
+        The reduced impedance matrix is not computed here since it is only needed by the Z-bus solver,
+        see the Zred property.
         @param Ybus: Complete admittance matrix
         @param V0: Complete (set) voltages vector
         @param Sbus: Complete power injectuons vector
@@ -1288,7 +1717,6 @@ class CircuitPowerFlow(object):
         @param pvpq: list of non-slack nodes
         @return:
         - Reduced admittance matrix
-        - Reduced impedance matrix
         - Reduced current injections (only valid for the given voltage)
         """
 
@@ -1304,13 +1732,7 @@ class CircuitPowerFlow(object):
         # vector of currents being injected by the slack nodes (Matrix vector product)
         Iind = -1 * np.ndarray.flatten(array(Yslack.dot(Vslack)))
 
-        # Invert Yred
-        Zred = sparse_inv(Yred)
-
-        # Vector of reduced power values (Non slack power injections)
-        Sred = Sbus[pvpq]
-
-        return Yred, Zred, Iind
+        return Yred, Iind
     
     def makeBdc(self, bus, branch):
         """
@@ -1410,7 +1832,8 @@ class CircuitPowerFlow(object):
     
         return Bp, Bpp
 
-    def run(self, tol=1e-3, max_it=10, enforce_q_limits=True, remember_last_solution=False, verbose=False, set_last_solution=True):
+    def run(self, tol=1e-3, max_it=10, enforce_q_limits=True, remember_last_solution=False, verbose=False,
+            set_last_solution=True, predict=False):
         """
         Runs a power flow.
 
@@ -1441,7 +1864,10 @@ class CircuitPowerFlow(object):
 
             enforce_q_limits: Boolean to review the reactive power limits on PV buses or not
 
-            verbose: Boolean variable to print on the console while solving
+            verbose: Log the solver details at the DEBUG level (the solve record is logged anyway, see grid.Telemetry)
+
+            predict: When remembering the last solution, correct it with the first order sensitivities to the power
+                     injections changes (see predict_voltage)
 
         @author: Ray Zimmerman (PSERC Cornell)
         """
@@ -1454,9 +1880,19 @@ class CircuitPowerFlow(object):
 
         if not remember_last_solution:
             self.set_original_values()
+        elif not self.last_solution_converged:
+            # a diverged (or never computed) solution is not a valid starting point
+            self.V0 = self.get_initial_voltage()
+        elif len(self.ref_list) > 0:
+            # the last solution may be referred to another slack (see the reactive power limits enforcement)
+            ref = self.ref_list[0]
+            self.V0 = self.V0 * exp(1j * (pi / 180.0 * self.bus_Va[ref] - np.angle(self.V0[ref])))
 
         if self.some_power_changed:
+            Sbus_prev = self.Sbus
             self.update_power()
+            if predict and remember_last_solution and self.last_solution_converged and Sbus_prev is not None:
+                self.V0 = self.predict_voltage(Sbus_prev)
 
         if self.solver_type == SolverType.DC:
             # initial state
@@ -1488,6 +1924,7 @@ class CircuitPowerFlow(object):
             self.gen[refgen, PG] += (self.B[self.ref_list, :] * Va - Pbus[self.ref_list]) * self.baseMVA
 
             success = 1
+            iterations = 1  # a single linear system solved
 
         else:  # if it is not DC, it is AC.
 
@@ -1497,6 +1934,7 @@ class CircuitPowerFlow(object):
             # if enforce_q_limits:
             ref0 = self.ref_list                    # save index and angle of
             Varef0 = self.bus[ref0, VA]             # original reference bus(es)
+            bus_types0 = self.bus[:, BUS_TYPE].copy()  # and the bus types, changed by the Q limits enforcement
 
             # remember the types because they might change during the iteration
             ref = self.ref_list
@@ -1506,13 +1944,19 @@ class CircuitPowerFlow(object):
 
             limited = []                            # list of indices of gens @ Q lims
             fixedQg = zeros(self.gen.shape[0])      # Qg of gens at Q limits
+            iterations = 0                          # of all the runs of the Q limits enforcement
 
             repeat = True
             while repeat:
 
+                # the remembered solution may come from other set points or bus types
+                self.set_generators_voltage(self.V0, r_[ref, pv])
+
                 # run the power flow
                 if self.solver_type == SolverType.NR:
-                    V, success, self.mismatch = newtonpf(self.Ybus, self.Sbus, self.V0, pv, pq, tol, max_it, verbose)
+                    V, success, self.mismatch, it = newtonpf(self.Ybus, self.Sbus, self.V0, pv, pq, tol, max_it,
+                                                             verbose, jac_builder=self.get_jacobian_builder(pv, pq),
+                                                             lin_solver=self.linear_solver)
                     # success = 1
 
                 elif self.solver_type == SolverType.NRFD_BX or self.solver_type == SolverType.NRFD_XB:
@@ -1523,15 +1967,24 @@ class CircuitPowerFlow(object):
                         pvpq_ = r_[pv, pq]
                         self.Bp = self.Bp[array([pvpq_]).T, pvpq_].tocsc()  # splu requires a CSC matrix
                         self.Bpp = self.Bpp[array([pq]).T, pq].tocsc()
+                        self.Bp_buses = pvpq_
+                        self.Bpp_buses = array(pq, dtype=int)
                         # factor B matrices
                         self.Bp_solver = splu(self.Bp)
                         self.Bpp_solver = splu(self.Bpp)
 
-                    V, success, self.mismatch = fdpf(self.Ybus, self.Sbus, self.V0, self.Bp_solver, self.Bpp_solver,
-                                                    pv, pq, tol, max_it, verbose)
+                    # refactor the B matrices that have been modified since their last factorization
+                    if self.Bp_solver is None:
+                        self.Bp_solver = splu(self.Bp)
+                    if self.Bpp_solver is None:
+                        self.Bpp_solver = splu(self.Bpp)
+
+                    V, success, self.mismatch, it = fdpf(self.Ybus, self.Sbus, self.V0, self.Bp_solver,
+                                                        self.Bpp_solver, pv, pq, tol, max_it, verbose)
 
                 elif self.solver_type == SolverType.GAUSS:
-                    V, success, self.mismatch = gausspf(self.Ybus, self.Sbus, self.V0, ref, pv, pq, tol, max_it, verbose)
+                    V, success, self.mismatch, it = gausspf(self.Ybus, self.Sbus, self.V0, ref, pv, pq, tol, max_it,
+                                                            verbose)
 
                 elif self.solver_type == SolverType.HELM:
                     cmax = 151
@@ -1539,21 +1992,26 @@ class CircuitPowerFlow(object):
                         ref, pv, pq, btypes, self.the_grid_is_disabled = bustypes(self.bus, self.gen, self.Sbus)
 
                     if not self.the_grid_is_disabled:
-                        V, success, self.mismatch, _ = helm(self.Ybus, ref, cmax, self.Sbus, self.V0, btypes, eps=1e-3)
-                        print('HELM converged:', success, '  err:', self.mismatch)
+                        V, success, self.mismatch, C = helm(self.Ybus, ref, cmax, self.Sbus, self.V0, btypes, eps=1e-3)
+                        logger.debug('HELM converged: %s, mismatch: %s', success, self.mismatch)
 
                         # Re-do with Iwamoto: Sure shot
-                        V, success, self.mismatch = IwamotoNR(self.Ybus, self.Sbus, V, pv, pq, tol, max_it,
-                                                              robust=True)
-                        print('Iwamoto converged:', success, '  err:', self.mismatch)
-                        print(V)
+                        V, success, self.mismatch, it = IwamotoNR(self.Ybus, self.Sbus, V, pv, pq, tol, max_it,
+                                                                  robust=True,
+                                                                  jac_builder=self.get_jacobian_builder(pv, pq),
+                                                                  lin_solver=self.linear_solver)
+                        logger.debug('Iwamoto converged: %s, mismatch: %s', success, self.mismatch)
+                        it += len(C)  # one linear system solved per series coefficient
                     else:
                         V = self.V0
                         success = False
+                        it = 0
 
                 elif self.solver_type == SolverType.IWAMOTO:
 
-                    V, success, self.mismatch = IwamotoNR(self.Ybus, self.Sbus, self.V0, pv, pq, tol, max_it, robust=True)
+                    V, success, self.mismatch, it = IwamotoNR(self.Ybus, self.Sbus, self.V0, pv, pq, tol, max_it,
+                                                              robust=True, jac_builder=self.get_jacobian_builder(pv, pq),
+                                                              lin_solver=self.linear_solver)
 
                 elif self.solver_type == SolverType.ZBUS:
 
@@ -1564,7 +2022,14 @@ class CircuitPowerFlow(object):
                             Qlim[ii-1] = [self.gen[jj, QMIN]/self.baseMVA, self.gen[jj, QMAX]/self.baseMVA]
                         jj += 1
 
-                    V, success, self.mismatch = zbus(self.Ybus, ref, max_it, self.Sbus, self.V0, btypes, Qlim, tol, self.V0)
+                    # the cached factorization is only valid while the slack buses are the original ones
+                    if np.array_equal(ref, self.ref_list):
+                        Zred = self.Zred
+                    else:
+                        Zred = None
+
+                    V, success, self.mismatch, it = zbus(self.Ybus, ref, max_it, self.Sbus, self.V0, btypes, Qlim, tol,
+                                                         self.V0, Zred=Zred)
 
                 elif self.solver_type == SolverType.CONTINUATION_NR:
                     # here we'll use the continuation power flow to solve critical states
@@ -1576,32 +2041,34 @@ class CircuitPowerFlow(object):
                     stop_at = 1  # 'NOSE'or 'FULL', with 1 we stop at the given power
 
                     Voltage_series, Lambda_series, \
-                    self.mismatch, success = runcpf2(self.Ybus, self.continuation_Sbus, self.Sbus,
-                                                     self.continuation_V0, pv, pq, step,
-                                                     approximation_order, adapt_step, step_min,
-                                                     step_max, error_tol=1e-3, tol=tol,
-                                                     max_it=max_it, stop_at=stop_at, verbose=False)
+                    self.mismatch, success, it = runcpf2(self.Ybus, self.continuation_Sbus, self.Sbus,
+                                                         self.continuation_V0, pv, pq, step,
+                                                         approximation_order, adapt_step, step_min,
+                                                         step_max, error_tol=1e-3, tol=tol,
+                                                         max_it=max_it, stop_at=stop_at, verbose=False)
 
                     nn = len(Voltage_series)
-                    print('nn: ', nn)
+                    logger.debug('Continuation steps: %d', nn)
                     if success:
                         V = Voltage_series[nn-1]
                         self.set_continuation_initial_state(self.Sbus, V)
                     else:
-                        print('Reinitializing Predictor-Corrector with IWAMOTO')
-                        V, success, iwa_mismatch = IwamotoNR(self.Ybus, self.Sbus, self.V0, pv, pq, tol, max_it, robust=True)
+                        logger.debug('Reinitializing the predictor-corrector with Iwamoto')
+                        V, success, iwa_mismatch, iwa_it = IwamotoNR(self.Ybus, self.Sbus, self.V0, pv, pq, tol,
+                                                                     max_it, robust=True)
 
                         self.set_continuation_initial_state(self.Sbus, V)
 
                         Voltage_series, Lambda_series, \
-                        self.mismatch, success = runcpf2(self.Ybus, self.continuation_Sbus, self.Sbus,
-                                                         self.continuation_V0, pv, pq, step,
-                                                         approximation_order, adapt_step, step_min,
-                                                         step_max, error_tol=1e-3, tol=tol,
-                                                         max_it=max_it, stop_at=stop_at, verbose=False)
+                        self.mismatch, success, it2 = runcpf2(self.Ybus, self.continuation_Sbus, self.Sbus,
+                                                              self.continuation_V0, pv, pq, step,
+                                                              approximation_order, adapt_step, step_min,
+                                                              step_max, error_tol=1e-3, tol=tol,
+                                                              max_it=max_it, stop_at=stop_at, verbose=False)
+                        it += iwa_it + it2
 
                         nn = len(Voltage_series)
-                        print('nn: ', nn)
+                        logger.debug('Continuation steps: %d', nn)
                         if success:
                             V = Voltage_series[nn-1]
                             self.set_continuation_initial_state(self.Sbus, V)
@@ -1612,8 +2079,6 @@ class CircuitPowerFlow(object):
 
                 elif self.solver_type == SolverType.HELMZ:
 
-                    print('HELM-Z')
-
                     # #  Perform DC approximation of the angles
 
                     # compute complex bus power injections [generation - load]
@@ -1631,14 +2096,15 @@ class CircuitPowerFlow(object):
 
                     # perform normal HELM (Only with PQ and VD nodes)
                     cmax = 50
-                    V, success, self.mismatch = helmz(self.Ybus, ref_, cmax, self.Sbus, Vin, btypes2, eps=tol, usePade=False)
-                    print('converged:', success, '  err:', self.mismatch)
-                    print(V)
+                    V, success, self.mismatch, it = helmz(self.Ybus, ref_, cmax, self.Sbus, Vin, btypes2, eps=tol,
+                                                          usePade=False)
+                    logger.debug('HELM-Z converged: %s, mismatch: %s', success, self.mismatch)
 
                 else:
                     raise Exception('Solver not recognised')
 
                 self.V0 = V  # Store he voltage solution as the initial solution for later
+                iterations += it
                 # print('Mismatch: ', self.mismatch)
 
                 # update data matrices with solution
@@ -1680,11 +2146,11 @@ class CircuitPowerFlow(object):
 
                         if verbose and len(mx) > 0:
                             for i in range(len(mx)):
-                                print('Gen ' + str(mx[i] + 1) + ' at upper Q limit, converting to PQ bus\n')
+                                logger.debug('Gen %d at upper Q limit, converting to PQ bus', mx[i] + 1)
 
                         if verbose and len(mn) > 0:
                             for i in range(len(mn)):
-                                print('Gen ' + str(mn[i] + 1) + ' at lower Q limit, converting to PQ bus\n')
+                                logger.debug('Gen %d at lower Q limit, converting to PQ bus', mn[i] + 1)
 
                         # save corresponding limit values
                         fixedQg[mx] = self.gen[mx, QMAX]
@@ -1707,7 +2173,7 @@ class CircuitPowerFlow(object):
                         ref_temp = ref
                         ref, pv, pq, btypes, self.the_grid_is_disabled = bustypes(self.bus, self.gen, self.Sbus)
                         if verbose and ref != ref_temp:
-                            print('Bus ', ref, ' is new slack bus\n')
+                            logger.debug('Bus %s is the new slack bus', ref)
 
                         limited = r_[limited, mx].astype(int)  # list of generator indices that have been limited
                     else:
@@ -1728,8 +2194,13 @@ class CircuitPowerFlow(object):
                     # adjust voltage angles to make original ref bus correct
                     self.bus[:, VA] = self.bus[:, VA] - self.bus[ref0, VA] + Varef0
 
-        end = time.time()
-        print('\nElapsed:', end - start)
+                # the next run starts from the original bus types
+                self.bus[:, BUS_TYPE] = bus_types0
+
+        self.iterations = iterations
+        self.last_solution_converged = bool(success)
+
+        log_solve(self.solver_type.name, self.nb, success, self.iterations, self.mismatch, time.time() - start)
 
         return success
 
@@ -1752,9 +2223,8 @@ class CircuitPowerFlow(object):
             V, success, self.mismatch, C = helm(self.Ybus, ref, cmax, self.Sbus, self.V0, btypes, eps=1e-3)
 
             # Compute bifurcation curves by Pade algorithm
-            print('Computing pade approximants...')
+            logger.debug('Computing the Pade approximants')
             voltage_series, lambda_series =  helm_bifurcation_point(C, ref)
-            print('Done!')
 
             power_series = list()
             i = 0
@@ -1775,7 +2245,7 @@ class CircuitPowerFlow(object):
             self.Sbus = load_parameter * self.continuation_Sbus
 
             voltage_series, lambda_series, \
-            self.mismatch, success = runcpf2(self.Ybus, self.continuation_Sbus, self.Sbus,
+            self.mismatch, success, _ = runcpf2(self.Ybus, self.continuation_Sbus, self.Sbus,
                                              self.continuation_V0, self.pv_list, self.pq_list, step,
                                              approximation_order, adapt_step, step_min,
                                              step_max, error_tol=1e-3, tol=tol,
@@ -1788,10 +2258,11 @@ class CircuitPowerFlow(object):
             i = 0
             for lam in lambda_series:
                 V = voltage_series[i]
-                Spv = V[self.active_generators_buses] * conj(self.Ybus[self.active_generators_buses, :] * V) * self.baseMVA
+                # power injected at the PV buses (in p.u. like the rest of Sfinal)
+                Spv = V[self.pv_list] * conj(self.Ybus[self.pv_list, :] * V)
                 Sfinal[self.pv_list] = Spv
                 power_series.append(lam * Sfinal)
-                i += 0
+                i += 1
 
         return voltage_series, power_series, lambda_series
 
@@ -1877,12 +2348,12 @@ class CircuitPowerFlow(object):
         Returns the branches loading in per unit with respect to the Rate_A
         """
 
-        idx = np.where(self.branch[self.in_service_branches, RATE_A] != 0)[0]
-        if self.solver_type == SolverType.DC:
-            return np.abs(self.get_branches_power_flow()[idx]) / self.branch[idx, RATE_A]
-        else:
-            return np.abs(self.get_branches_power_flow()[idx]) / self.branch[idx, RATE_A]
-        # raise Exception('Some branch ratings are zero, therefore the loading calculation cannot be performed.')
+        # the branches without rating get zero loading
+        rate = self.branch[self.in_service_branches, RATE_A]
+        idx = np.where(rate != 0)[0]
+        loading = zeros(len(rate))
+        loading[idx] = np.abs(self.get_branches_power_flow()[idx]) / rate[idx]
+        return loading
 
     def get_bus_voltage_deviation(self):
         """
@@ -1925,6 +2396,77 @@ class CircuitPowerFlow(object):
                 self.update_branches_power_flow()
             return np.absolute(self.Sf.real - self.St.real)
 
+    def makeSbus_profile(self, S_load, P_gen):
+        """
+        Builds the power injections of several snapshots (i.e. the steps of a time series)
+        Args:
+            S_load: Matrix of complex bus loads in MVA (one snapshot per row, one column per bus)
+            P_gen: Matrix of generators active power in MW (one snapshot per row, one column per generator)
+
+        Returns: Matrix of complex bus power injections in per unit (one snapshot per row)
+        """
+        on = self.active_generators
+        Sgen = P_gen[:, on] + 1j * self.gen[on, QG]
+        return ((self.Cg * Sgen.T).T - S_load) / self.baseMVA
+
+    def run_batch(self, Sbus, V0=None, tol=1e-3, max_it=20):
+        """
+        Solves several snapshots of the power injections at once with the Newton-Raphson method.
+        Ybus and the bus types are kept fixed (the generators reactive power limits are not enforced) and the state of
+        this object is not modified.
+        Args:
+            Sbus: Matrix of complex bus power injections in per unit (one snapshot per row)
+            V0: Initial voltages (one array for all the snapshots or one row per snapshot). By default the voltages
+                set_original_values starts from
+            tol: Solution tolerance
+            max_it: Maximum number of iterations
+
+        Returns:
+            Voltages matrix (one row per snapshot), convergence flags, mismatch norms and iterations of every snapshot
+        """
+        if V0 is None:
+            V0 = self.get_initial_voltage()
+
+        if self.batch_linear_solver is None:
+            self.batch_linear_solver = SparseLUSolver()
+
+        jac_builder = self.get_jacobian_builder(self.pv_list, self.pq_list)
+
+        return newtonpf_batch(self.Ybus, Sbus, V0, self.pv_list, self.pq_list, tol, max_it,
+                              jac_builder=jac_builder, lin_solver=self.batch_linear_solver)
+
+    def get_branch_results_batch(self, V):
+        """
+        Computes the results of the in service branches for several voltage snapshots, the same way the single
+        snapshot functions do (see get_branch_current_flows, get_branch_loading and get_losses)
+        Args:
+            V: Voltages matrix (one snapshot per row)
+
+        Returns: currents (kA), loading (p.u.) and losses (MW) matrices (one row per snapshot, one column per in
+                 service branch)
+        """
+        br = self.in_service_branches
+        f = self.branch[br, F_BUS].astype(int)
+        t = self.branch[br, T_BUS].astype(int)
+
+        Sf = V[:, f] * conj((self.Yf[br, :] * V.T).T) * self.baseMVA
+        St = V[:, t] * conj((self.Yt[br, :] * V.T).T) * self.baseMVA
+
+        if not self.are_zero_Vn:
+            current = np.minimum(Sf / (np.sqrt(3) * self.Vn_from[br]), St / (np.sqrt(3) * self.Vn_to[br]))
+        else:
+            warn('Since there are nominal voltages equal to zero, it is impossible to compute the currents.')
+            current = zeros(Sf.shape, dtype=complex)
+
+        rate = self.branch[br, RATE_A]
+        idx = np.where(rate != 0)[0]
+        loading = zeros(Sf.shape)
+        loading[:, idx] = np.abs(np.minimum(Sf[:, idx], St[:, idx])) / rate[idx]
+
+        losses = np.absolute(Sf.real - St.real)
+
+        return current, loading, losses
+
     def set_loads(self, P, Q=None, in_pu=True, indices_list=None):
         """
         Set all the systems loads
@@ -1991,6 +2533,12 @@ class CircuitPowerFlow(object):
                 if Q is not None:
                     self.gen[indices_list, QG] = Q
 
+        # the runs that do not remember the last solution restore the generation set here (see set_original_values)
+        idx = slice(None) if indices_list is None else indices_list
+        self.generator_P[idx] = self.gen[idx, PG]
+        if Q is not None:
+            self.generator_Q[idx] = self.gen[idx, QG]
+
         self.some_power_changed = True
 
     def is_the_voltage_valid(self):
@@ -2038,6 +2586,7 @@ class CircuitPowerFlow(object):
         bounds = tuple(bounds)
 
         # solve the linear program
+        from scipy.optimize import linprog
         res = linprog(c, bounds=bounds, options={"disp": True})
 
         # Assign the solution
@@ -2056,7 +2605,7 @@ class CircuitPowerFlow(object):
             True if succeeded or False if not
         """
         np.set_printoptions(precision=3, linewidth=500)
-        print("Optimizing load shedding...")
+        logger.info('Optimizing the load shedding')
 
         # calculate the load shedding values
         total_load = sum(self.original_load)
@@ -2088,8 +2637,6 @@ class CircuitPowerFlow(object):
 
         is_valid = self.is_the_voltage_valid()
 
-        print(self.V0)
-
         bnds = list()
         for i in load_idx:
             bnds.append((0, self.original_load[i]))
@@ -2114,16 +2661,15 @@ class CircuitPowerFlow(object):
             else:
                 f = 1e6
 
-            print(f, x)
-            print(self.bus[:, VM])
-            print()
+            logger.debug('Load shedding objective: %s', f)
             return f
 
+        from scipy.optimize import minimize
         res = minimize(f_obj, x0=x0, method='SLSQP', bounds=bnds, tol=1e-2)
 
         # set the solution
         # f_obj(res.x)
-        print("Done!")
+        logger.info('Load shedding optimized')
         return is_valid
 
 
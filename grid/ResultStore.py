@@ -0,0 +1,295 @@
+"""
+Storage of the results of the long simulations (i.e. time series).
+
+The results are a set of named arrays whose first dimension is the simulation step. They are either held in memory or
+in memory mapped .npy files: in the second case the simulation streams every step into the files and the readers
+(i.e. the plots) only load the slices they access, so the size of a study is limited by the disk, not by the RAM.
+
+What is stored of every result (i.e. only the magnitude of the branch loadings, in single precision) is chosen with a
+ResultSchema.
+"""
+
+import os
+from enum import Enum
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+class ResultStore(object):
+    """
+    Set of named result arrays, held in memory or memory mapped from a folder (one .npy file per array)
+    """
+
+    def __init__(self, shapes, path=None):
+        """
+        Constructor: allocates the arrays (initialized to zero)
+        @param shapes: dictionary name -> (shape, dtype) of the arrays
+        @param path: folder where the arrays are mapped. If None the arrays are held in memory
+        """
+        self.path = path
+
+        self.arrays = dict()
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+        for name, (shape, dtype) in shapes.items():
+            if path is None:
+                self.arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                # open_memmap creates the file filled with zeros
+                self.arrays[name] = open_memmap(self.get_file_name(name), mode='w+', dtype=dtype, shape=shape)
+
+    @staticmethod
+    def open(path, mode='r'):
+        """
+        Opens the arrays stored in a folder
+        @param path: folder of the store
+        @param mode: 'r' to read only, 'r+' to read and write
+        @return: ResultStore instance
+        """
+        store = ResultStore(dict(), path=None)
+        store.path = path
+        for file_name in sorted(os.listdir(path)):
+            name, extension = os.path.splitext(file_name)
+            if extension == '.npy':
+                store.arrays[name] = np.load(os.path.join(path, file_name), mmap_mode=mode)
+        return store
+
+    def get_file_name(self, name):
+        """
+        File of an array of a mapped store
+        @param name: array name
+        @return: file path
+        """
+        return os.path.join(self.path, name + '.npy')
+
+    def is_mapped(self):
+        """
+        Are the arrays mapped to disk?
+        """
+        return self.path is not None
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def keys(self):
+        return self.arrays.keys()
+
+    def read(self, name, rows=None, cols=None):
+        """
+        Reads a slice of an array (only that slice is loaded from disk in a mapped store)
+        @param name: array name
+        @param rows: rows selection (index, slice or array of indices). None selects all
+        @param cols: columns selection (index, slice or array of indices). None selects all
+        @return: numpy array with a copy of the values
+        """
+        arr = self.arrays[name]
+        rows = slice(None) if rows is None else rows
+
+        if cols is None or arr.ndim == 1:
+            return np.array(arr[rows])
+        else:
+            return np.array(arr[rows, cols])
+
+    def get_specs(self):
+        """
+        Returns the description needed to open the arrays of a mapped store from another process (see attach)
+        """
+        if not self.is_mapped():
+            raise Exception('Only the arrays of a mapped store can be shared with other processes')
+
+        return {name: self.get_file_name(name) for name in self.arrays.keys()}
+
+    @staticmethod
+    def attach(specs):
+        """
+        Opens the arrays of a mapped store for writing (i.e. from a worker process)
+        @param specs: dictionary name -> file path (see get_specs)
+        @return: dictionary name -> memory mapped array
+        """
+        return {name: np.load(file_name, mmap_mode='r+') for name, file_name in specs.items()}
+
+    def flush(self):
+        """
+        Writes the pending changes to disk (nothing to do for a store in memory)
+        """
+        for arr in self.arrays.values():
+            if isinstance(arr, np.memmap):
+                arr.flush()
+
+    def close(self):
+        """
+        Flushes and releases the arrays
+        """
+        self.flush()
+        self.arrays = dict()
+
+
+class StorageFormat(Enum):
+    """
+    How a complex result is stored
+    """
+    COMPLEX = 0  # the complex values
+    POLAR = 1  # magnitude and angle (radians), in two real arrays
+    MAGNITUDE = 2  # the magnitude only
+    REAL = 3  # the real part only (i.e. for real results like the mismatch)
+
+
+class ResultSchema(object):
+    """
+    Describes which part of every result quantity is stored and with which precision.
+
+    The quantities are 'voltage', 'current', 'loading', 'losses', 'power' and 'error'. A result array of a quantity is
+    stored as one or two arrays (fields) named after it: <name> for the COMPLEX and REAL formats, <name>_abs and
+    <name>_angle for the POLAR format and <name>_abs for the MAGNITUDE format.
+    """
+
+    def __init__(self, formats=None, dtype=np.float64):
+        """
+        Constructor
+        @param formats: dictionary quantity -> StorageFormat. The quantities not given are stored as COMPLEX (the
+                        'error' as REAL)
+        @param dtype: precision of the stored values: np.float64 or np.float32 (the complex values are stored with
+                      the corresponding complex type)
+        """
+        self.formats = {'voltage': StorageFormat.COMPLEX,
+                        'current': StorageFormat.COMPLEX,
+                        'loading': StorageFormat.COMPLEX,
+                        'losses': StorageFormat.COMPLEX,
+                        'power': StorageFormat.COMPLEX,
+                        'error': StorageFormat.REAL}
+
+        if formats is not None:
+            self.formats.update(formats)
+
+        self.dtype = np.dtype(dtype)
+
+        self.complex_dtype = np.result_type(self.dtype, np.complex64)
+
+    @staticmethod
+    def compact():
+        """
+        Schema with the values used by the results displays only, in single precision: voltage magnitude and angle,
+        and the current, loading and losses magnitudes. It takes between 2 (voltages) and 4 (branches) times less
+        memory than the default schema.
+        """
+        return ResultSchema(formats={'voltage': StorageFormat.POLAR,
+                                     'current': StorageFormat.MAGNITUDE,
+                                     'loading': StorageFormat.MAGNITUDE,
+                                     'losses': StorageFormat.MAGNITUDE},
+                            dtype=np.float32)
+
+    def get_fields(self, name, quantity, shape):
+        """
+        Returns the arrays that store a result
+        @param name: result name
+        @param quantity: result quantity
+        @param shape: shape of the result
+        @return: dictionary field name -> (shape, dtype)
+        """
+        storage = self.formats[quantity]
+
+        if storage == StorageFormat.COMPLEX:
+            return {name: (shape, self.complex_dtype)}
+        elif storage == StorageFormat.POLAR:
+            return {name + '_abs': (shape, self.dtype), name + '_angle': (shape, self.dtype)}
+        elif storage == StorageFormat.MAGNITUDE:
+            return {name + '_abs': (shape, self.dtype)}
+        else:
+            return {name: (shape, self.dtype)}
+
+    def encode(self, name, quantity, values):
+        """
+        Converts the values of a result to its stored representation
+        @param name: result name
+        @param quantity: result quantity
+        @param values: result values (array)
+        @return: dictionary field name -> array
+        """
+        storage = self.formats[quantity]
+
+        if storage == StorageFormat.COMPLEX:
+            return {name: np.array(values, dtype=self.complex_dtype)}
+        elif storage == StorageFormat.POLAR:
+            return {name + '_abs': np.abs(values).astype(self.dtype),
+                    name + '_angle': np.angle(values).astype(self.dtype)}
+        elif storage == StorageFormat.MAGNITUDE:
+            return {name + '_abs': np.abs(values).astype(self.dtype)}
+        else:
+            return {name: np.real(values).astype(self.dtype)}
+
+    def view(self, arrays, name, quantity):
+        """
+        Returns an array-like access to a stored result
+        @param arrays: dictionary with the stored fields (i.e. ResultStore.arrays)
+        @param name: result name
+        @param quantity: result quantity
+        @return: ResultView
+        """
+        return ResultView(arrays, name, self.formats[quantity], self.complex_dtype)
+
+
+class ResultView(object):
+    """
+    Array-like access to a result stored with a ResultSchema: indexing returns the decoded values (complex for the
+    COMPLEX and POLAR formats, real for the others) and assigning encodes them.
+    """
+
+    def __init__(self, arrays, name, storage, complex_dtype=np.complex128):
+        """
+        Constructor
+        @param arrays: dictionary with the stored fields
+        @param name: result name
+        @param storage: StorageFormat of the result
+        @param complex_dtype: type of the decoded POLAR values
+        """
+        self.storage = storage
+
+        self.complex_dtype = complex_dtype
+
+        if storage in (StorageFormat.POLAR, StorageFormat.MAGNITUDE):
+            self.abs = arrays[name + '_abs']
+            self.angle = arrays[name + '_angle'] if storage == StorageFormat.POLAR else None
+            self.values = None
+        else:
+            self.abs = None
+            self.angle = None
+            self.values = arrays[name]
+
+    @property
+    def shape(self):
+        return self.abs.shape if self.values is None else self.values.shape
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if self.storage == StorageFormat.POLAR:
+            return (self.abs[key] * np.exp(1j * self.angle[key])).astype(self.complex_dtype)
+        elif self.storage == StorageFormat.MAGNITUDE:
+            return np.array(self.abs[key])
+        else:
+            return np.array(self.values[key])
+
+    def __setitem__(self, key, values):
+        if self.storage == StorageFormat.POLAR:
+            self.abs[key] = np.abs(values)
+            self.angle[key] = np.angle(values)
+        elif self.storage == StorageFormat.MAGNITUDE:
+            self.abs[key] = np.abs(values)
+        elif self.storage == StorageFormat.REAL:
+            self.values[key] = np.real(values)
+        else:
+            self.values[key] = values
+
+    def __abs__(self):
+        # the magnitude is read directly when it is stored
+        return np.array(self.abs) if self.values is None else np.abs(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[...]
+        return values if dtype is None else values.astype(dtype)
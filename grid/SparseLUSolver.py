@@ -0,0 +1,198 @@
+"""
+Sparse LU solver for sequences of linear systems that share the same sparsity pattern.
+
+The Newton-Raphson like power flow methods solve J * dx = F once per iteration, and a time series runs those methods
+once per time step. J is rebuilt with the same structure every time (see JacobianBuilder), so the expensive symbolic
+part of the factorization (the fill-reducing column ordering) only has to be computed once per pattern:
+
+    1. The first matrix of a given pattern is factorized with the COLAMD ordering, and the column permutation chosen
+       by SuperLU is stored together with the map from the entries of the matrix to the entries of the column
+       permuted matrix in CSC format.
+    2. Every following matrix with the same pattern is permuted by copying its data array through that map and it is
+       factorized with the natural ordering, this is, only the numeric factorization is performed.
+
+Optionally the numeric factorization can be kept for several solves ("dishonest" Newton): the linear systems are
+then solved with a slightly outdated Jacobian, which trades some extra iterations for much cheaper ones.
+"""
+
+from warnings import warn
+
+import numpy as np
+from numpy import arange, zeros, full, nan
+from scipy.sparse import csr_matrix, csc_matrix, issparse
+from scipy.sparse.linalg import splu
+
+
+class SparseLUSolver(object):
+    """
+    Solves A * x = b reusing the ordering of A between calls while its sparsity pattern does not change
+    """
+
+    def __init__(self, refactor_every=1, permc_spec='COLAMD'):
+        """
+        Constructor
+        Args:
+            refactor_every: Number of solves done with the same numeric factorization. 1 refactorizes on every solve
+                            (regular Newton), k > 1 keeps the factorization for k solves (dishonest Newton)
+            permc_spec: Fill-reducing ordering used when a new sparsity pattern is analyzed
+        """
+        self.refactor_every = max(int(refactor_every), 1)
+
+        self.permc_spec = permc_spec
+
+        # pattern of the analyzed matrix
+        self.format = None
+        self.shape = None
+        self.indptr = None
+        self.indices = None
+
+        # column order: A[:, order] is factorized with the natural ordering
+        self.order = None
+
+        # column permuted matrix (CSC) and the map from A.data to its data array
+        self.Ap = None
+        self.data_map = None
+
+        # current numeric factorization, number of solves done with it and whether it is the factorization of the
+        # column permuted matrix (all of them except the one computed by analyze, which factorizes A itself)
+        self.factor = None
+        self.uses = 0
+        self.factor_is_permuted = False
+
+        # statistics
+        self.analysis_count = 0
+        self.factorization_count = 0
+        self.solve_count = 0
+
+    def __getstate__(self):
+        """
+        State used to pickle the solver: the ordering is kept but the numeric factorization (a SuperLU object) is
+        dropped, the next solve refactorizes.
+        """
+        state = self.__dict__.copy()
+        state['factor'] = None
+        return state
+
+    def matches(self, A):
+        """
+        Does A have the sparsity pattern that has been analyzed?
+        Args:
+            A: Sparse matrix (CSR or CSC)
+
+        Returns: True if the stored ordering can be reused
+        """
+        if self.indices is None or A.format != self.format or A.shape != self.shape or A.nnz != len(self.indices):
+            return False
+
+        if A.indices is self.indices and A.indptr is self.indptr:
+            return True
+
+        return np.array_equal(A.indptr, self.indptr) and np.array_equal(A.indices, self.indices)
+
+    def analyze(self, A):
+        """
+        Computes the fill-reducing ordering of A and factorizes it
+        Args:
+            A: Sparse matrix (CSR or CSC in canonical format)
+        """
+        nnz = A.nnz
+
+        # the first factorization also provides the column ordering
+        self.factor = splu(csc_matrix(A), permc_spec=self.permc_spec)
+        self.uses = 0
+        self.factor_is_permuted = False
+        self.order = np.argsort(self.factor.perm_c)
+
+        # permute a matrix whose values are the positions in A.data to know where every entry of A lands
+        if A.format == 'csr':
+            positions = csr_matrix((arange(nnz), A.indices, A.indptr), shape=A.shape)
+        else:
+            positions = csc_matrix((arange(nnz), A.indices, A.indptr), shape=A.shape)
+        Pp = csc_matrix(positions[:, self.order])
+        Pp.sort_indices()
+
+        self.data_map = Pp.data
+        self.Ap = csc_matrix((A.data[self.data_map], Pp.indices, Pp.indptr), shape=A.shape)
+
+        self.format = A.format
+        self.shape = A.shape
+        self.indptr = A.indptr
+        self.indices = A.indices
+
+        self.analysis_count += 1
+        self.factorization_count += 1
+
+    def factorize(self, A):
+        """
+        Numeric factorization of A, analyzing it first if its pattern is new
+        Args:
+            A: Sparse matrix (CSR or CSC in canonical format)
+        """
+        if not self.matches(A):
+            self.analyze(A)
+        else:
+            self.Ap.data[:] = A.data[self.data_map]
+            self.factor = splu(self.Ap, permc_spec='NATURAL')
+            self.uses = 0
+            self.factor_is_permuted = True
+            self.factorization_count += 1
+
+    def solve_factorized(self, b):
+        """
+        Solves with the current factorization, without checking if it is up to date (see factorize)
+        Args:
+            b: right hand side vector or matrix (one right hand side per column)
+
+        Returns: x (same shape as b)
+        """
+        y = self.factor.solve(b)
+        self.solve_count += 1
+
+        if self.factor_is_permuted:
+            x = zeros(y.shape, dtype=y.dtype)
+            x[self.order] = y
+            return x
+        else:
+            return y
+
+    def invalidate(self):
+        """
+        Forces a numeric factorization on the next solve (the ordering is kept)
+        """
+        self.factor = None
+
+    def solve(self, A, b):
+        """
+        Solves A * x = b
+        Args:
+            A: Sparse matrix (CSR or CSC)
+            b: right hand side vector
+
+        Returns: x (filled with NaN if A is singular, like scipy's spsolve)
+        """
+        assert issparse(A)
+
+        if A.format not in ('csr', 'csc') or not A.has_canonical_format:
+            A = csr_matrix(A)
+            A.sum_duplicates()
+
+        try:
+            if self.factor is None or self.uses >= self.refactor_every or not self.matches(A):
+                self.factorize(A)
+
+            y = self.factor.solve(b)
+
+        except RuntimeError:
+            warn('Matrix is exactly singular')
+            self.factor = None
+            return full(A.shape[0], nan)
+
+        self.uses += 1
+        self.solve_count += 1
+
+        if self.factor_is_permuted:
+            x = zeros(len(y), dtype=y.dtype)
+            x[self.order] = y
+            return x
+        else:
+            return y
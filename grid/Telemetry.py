@@ -0,0 +1,155 @@
+"""
+Logging and telemetry of the simulations.
+
+The grid modules do not print on the console: they log through the 'grid' logger hierarchy of the standard logging
+module, with lazy formatting, so that a disabled level costs a level check. Large arrays are never logged.
+
+Every power flow solve emits a structured SolveRecord (solver, buses, convergence, iterations, mismatch and wall
+time) on the 'grid.solve' logger at the INFO level. The record travels in the 'solve' attribute of the log record,
+so a handler (i.e. SolveRecorder) can collect them without parsing the messages.
+
+usage:
+    from grid.Telemetry import enable_logging, SolveRecorder
+
+    enable_logging(logging.INFO)     # print the log on the console
+    recorder = SolveRecorder()       # collect the solve records
+    ...
+    recorder.detach()
+    df = pd.DataFrame(recorder.as_table())
+"""
+
+import sys
+import logging
+
+# root of the grid loggers
+logger = logging.getLogger('grid')
+
+# logger of the power flow solve records
+solve_logger = logging.getLogger('grid.solve')
+
+
+def get_logger(name):
+    """
+    Returns the logger of a grid module
+    @param name: module name (i.e. 'PowerFlow')
+    @return: logging.Logger 'grid.<name>'
+    """
+    return logging.getLogger('grid.' + name)
+
+
+def enable_logging(level=logging.INFO, stream=None):
+    """
+    Prints the grid log on the console
+    @param level: minimum level logged (logging.DEBUG, logging.INFO, ...)
+    @param stream: stream where the log is written (sys.stderr by default)
+    @return: the handler added (remove it from the 'grid' logger to stop)
+    """
+    handler = logging.StreamHandler(sys.stderr if stream is None else stream)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s: %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return handler
+
+
+class SolveRecord(object):
+    """
+    Telemetry of a power flow solve
+    """
+
+    __slots__ = ('solver', 'nb', 'converged', 'iterations', 'mismatch', 'elapsed')
+
+    def __init__(self, solver, nb, converged, iterations, mismatch, elapsed):
+        """
+        Constructor
+        @param solver: solver name
+        @param nb: number of buses of the circuit (or island) solved
+        @param converged: did the solve converge?
+        @param iterations: number of iterations, as counted by the solver
+        @param mismatch: final power mismatch (p.u.)
+        @param elapsed: wall time (s)
+        """
+        self.solver = solver
+        self.nb = nb
+        self.converged = converged
+        self.iterations = iterations
+        self.mismatch = mismatch
+        self.elapsed = elapsed
+
+    def as_dict(self):
+        """
+        Returns the record as a dictionary
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __str__(self):
+        return '%s nb=%d converged=%s iterations=%d mismatch=%.3e elapsed=%.6f s' % \
+               (self.solver, self.nb, bool(self.converged), self.iterations, self.mismatch, self.elapsed)
+
+
+def log_solve(solver, nb, converged, iterations, mismatch, elapsed):
+    """
+    Emits the record of a power flow solve (nothing is built if the 'grid.solve' logger does not log INFO)
+    @param solver: solver name
+    @param nb: number of buses
+    @param converged: did the solve converge?
+    @param iterations: number of iterations
+    @param mismatch: final power mismatch (p.u.)
+    @param elapsed: wall time (s)
+    """
+    if solve_logger.isEnabledFor(logging.INFO):
+        record = SolveRecord(solver, int(nb), bool(converged), int(iterations), float(mismatch), elapsed)
+        solve_logger.info('%s', record, extra={'solve': record})
+
+
+class SolveRecorder(logging.Handler):
+    """
+    Logging handler that collects the solve records of the simulations run while it is attached.
+    The records of the simulations run in other processes are not collected.
+    """
+
+    def __init__(self, attach=True):
+        """
+        Constructor
+        @param attach: attach the recorder to the 'grid.solve' logger now?
+        """
+        logging.Handler.__init__(self, logging.INFO)
+
+        self.records = list()
+
+        self.previous_level = None
+
+        if attach:
+            self.attach()
+
+    def emit(self, record):
+        """
+        Keeps the solve record of a log record (logging.Handler interface)
+        @param record: logging.LogRecord
+        """
+        solve = getattr(record, 'solve', None)
+        if solve is not None:
+            self.records.append(solve)
+
+    def attach(self):
+        """
+        Starts recording (enables the INFO level of the 'grid.solve' logger if needed)
+        """
+        if not solve_logger.isEnabledFor(logging.INFO):
+            self.previous_level = solve_logger.level
+            solve_logger.setLevel(logging.INFO)
+        solve_logger.addHandler(self)
+
+    def detach(self):
+        """
+        Stops recording (restores the level of the 'grid.solve' logger)
+        """
+        solve_logger.removeHandler(self)
+        if self.previous_level is not None:
+            solve_logger.setLevel(self.previous_level)
+            self.previous_level = None
+
+    def as_table(self):
+        """
+        Returns the records as a dictionary of columns
+        """
+        return {name: [getattr(r, name) for r in self.records] for name in SolveRecord.__slots__}
@@ -1,19 +1,27 @@
 import numpy as np
-import pandas as pd
 from enum import Enum
 from multiprocessing import Pool, cpu_count
 from warnings import warn
-from matplotlib import pyplot as plt
-from PyQt4.QtCore import QThread, SIGNAL
+from grid.Engine import Engine
 from numpy import zeros, r_
+from concurrent.futures import ProcessPoolExecutor, wait
 import time
+from copy import deepcopy
 
-from grid.PowerFlow import MultiCircuitPowerFlow
+from grid.PowerFlow import MultiCircuitPowerFlow, WarmStart
+from grid.ResultStore import ResultStore, ResultSchema
+from grid.OperatingPointCache import OperatingPointCache
+from grid.Checkpoint import Checkpoint
+from grid.NewtonRaphsonPowerFlow import newtonpf
 from grid.BusDefinitions import *
 from grid.GenDefinitions import *
+from grid.BranchDefinitions import *
+from grid.Telemetry import get_logger, log_solve
 
+logger = get_logger('TimeSeries')
 
-class TimeSeries(QThread):
+
+class TimeSeries(Engine):
     """
     This class includes the necessary routines to run a time series power flow simulation
     """
@@ -23,7 +31,7 @@ class TimeSeries(QThread):
         @param power_flow_object:
         @return:
         """
-        QThread.__init__(self)
+        Engine.__init__(self)
         # self.pf = PowerFlow()
         self.pf = power_flow_object
 
@@ -34,12 +42,17 @@ class TimeSeries(QThread):
         self.load_profiles = None
         self.gen_profiles = None
 
-        # profiles (output)
+        # profiles (output): views of the results store (in memory or memory mapped from results_path), with the
+        # stored parts and precision given by the results schema
+        self.results = None
+        self.results_path = None
+        self.result_schema = ResultSchema()
         self.voltages = None
         self.currents = None
         self.loadings = None
         self.losses = None
         self.mismatch = None
+        self.iterations = None  # Newton-Raphson iterations of every step (the maximum of the islands)
 
         # run options
         self.auto_repeat = True
@@ -47,13 +60,39 @@ class TimeSeries(QThread):
         self.max_iterations = 20
         self.enforce_reactive_power_limits = True
 
+        # where every step starts from, and linear solves per LU factorization (see
+        # MultiCircuitPowerFlow.set_run_options)
+        self.warm_start = WarmStart.NONE
+        self.refactor_every = 1
+
+        # batched mode: the steps are solved in blocks of snapshots (see run_batched)
+        self.batched = False
+        self.block_size = 96
+
+        # parallel mode: the time is split in chunks solved by a pool of processes (see run_parallel)
+        self.n_processes = 1
+        self.chunks_per_process = 4
+
+        # solutions of the states already solved: the repeated steps are not solved again (see get_state_key)
+        self.use_cache = True
+        self.cache = OperatingPointCache()
+
+        # fingerprint of the network the cached solutions belong to (see check_cache)
+        self.cache_fingerprint = None
+
+        # periodic save of the progress, so that an interrupted run can be resumed (see set_checkpoint and resume)
+        self.checkpoint = None
+        self.resume_from_checkpoint = False
+
+        self.elapsed = 0
+
         self.load_p_0 = self.pf.bus[:, PD]
         self.load_q_0 = self.pf.bus[:, QD]
         self.gen_p_0 = self.pf.gen[:, PG]
 
         self.cancel = False
 
-    def set_master_time(self, time_profile: pd.DatetimeIndex):
+    def set_master_time(self, time_profile: 'pd.DatetimeIndex'):
         """
         Sets the master time profile
         @param time_profile: Array of time stamps
@@ -96,7 +135,7 @@ class TimeSeries(QThread):
                         destination = profiles[0:time_len, :].copy()
 
                     elif profile_len < time_len:
-                        print('The profile will be repeated automatically')
+                        logger.info('The %s profile will be repeated automatically', device_type)
                         # repeat the profile to make it match
                         # that will be done automatically
                         destination = profiles.copy()
@@ -129,14 +168,214 @@ class TimeSeries(QThread):
         Formats the profile variables to have a consistent simulation
         @return:
         """
+        if self.results is not None:
+            self.results.close()
+
+        self.results = ResultStore(self.get_result_shapes(), path=self.results_path)
+
+        self.set_result_views()
+
+    def set_result_views(self):
+        """
+        Points the results variables to the arrays of the results store
+        @return:
+        """
+        views = get_result_views(self.result_schema, self.results.arrays)
+        self.voltages = views['voltages']
+        self.currents = views['currents']
+        self.loadings = views['loadings']
+        self.losses = views['losses']
+        self.mismatch = views['mismatch']
+        self.iterations = views['iterations']
+
+    def get_result_shapes(self):
+        """
+        Returns the shape and type of the stored results arrays (see ResultSchema)
+        @return: dictionary name -> (shape, dtype)
+        """
         tT = len(self.time)
         nbus = len(self.pf.bus)
         nbranch = len(self.pf.branch)
-        self.voltages = np.zeros((tT, nbus), dtype=np.complex128)
-        self.currents = np.zeros((tT, nbranch), dtype=np.complex128)
-        self.loadings = np.zeros((tT, nbranch), dtype=np.complex128)
-        self.losses = np.zeros((tT, nbranch), dtype=np.complex128)
-        self.mismatch = np.zeros(tT)
+        shapes = dict()
+        for name, quantity in result_quantities.items():
+            shape = (tT,) if quantity == 'error' else (tT, nbus) if quantity == 'voltage' else (tT, nbranch)
+            shapes.update(self.result_schema.get_fields(name, quantity, shape))
+        shapes['iterations'] = ((tT,), np.int32)
+        return shapes
+
+    def set_result_schema(self, schema: ResultSchema):
+        """
+        Sets which parts of the results are stored and with which precision (i.e. ResultSchema.compact() stores the
+        magnitudes and angles in single precision). Applies from the next run.
+        @param schema: ResultSchema instance
+        @return:
+        """
+        self.result_schema = schema
+        self.cache.clear()
+
+    def set_results_path(self, path):
+        """
+        Sets the folder where the results are stored. The results arrays are then memory mapped files (one .npy file
+        per variable) that the simulation writes step by step, so the studies whose results do not fit in memory can
+        be run. None keeps the results in memory.
+        @param path: folder path or None
+        @return:
+        """
+        self.results_path = path
+
+    def set_checkpoint(self, path, interval=300.0):
+        """
+        Sets the file where the progress of the runs is saved periodically: the steps solved, the last solution and
+        the results (only flushed when they are memory mapped, see set_results_path). The checkpoint is also saved
+        when the run is cancelled or fails, and deleted when the run finishes. An interrupted run is continued with
+        resume.
+        @param path: checkpoint file path or None to not save checkpoints
+        @param interval: Minimum time between two periodic saves (seconds)
+        @return:
+        """
+        self.checkpoint = None if path is None else Checkpoint(path, interval)
+
+    def get_network_fingerprint(self):
+        """
+        Returns the fingerprint of the network the power flows are solved on: the branches parameters and status,
+        the bus types and shunts, the generators set points and limits, and the solver
+        @return: fingerprint (see Checkpoint.get_fingerprint)
+        """
+        return Checkpoint.get_fingerprint([self.pf.baseMVA,
+                                           self.pf.branch[:, [F_BUS, T_BUS, BR_R, BR_X, BR_B, TAP, SHIFT, BR_STATUS]],
+                                           self.pf.bus[:, [BUS_TYPE, GS, BS]],
+                                           self.pf.gen[:, [GEN_BUS, GEN_STATUS, VG, QMAX, QMIN]],
+                                           self.pf.solver_type.name])
+
+    def check_cache(self):
+        """
+        Clears the solutions cache if the network changed since they were stored (i.e. the power flow object has
+        been replaced by the one of a modified circuit), since the state keys only describe the power injections.
+        Resets the cache statistics of the run.
+        """
+        fingerprint = self.get_network_fingerprint()
+        if fingerprint != self.cache_fingerprint:
+            self.cache.clear()
+            self.cache_fingerprint = fingerprint
+        self.cache.reset_stats()
+
+    def get_fingerprint(self):
+        """
+        Returns the fingerprint of the inputs that determine the results of a run (the network, see
+        get_network_fingerprint, the profiles and the options): a checkpoint can only be resumed by a run with the same
+        fingerprint
+        @return: fingerprint (see Checkpoint.get_fingerprint)
+        """
+        shapes = sorted((name, shape, np.dtype(dtype).str) for name, (shape, dtype) in self.get_result_shapes().items())
+
+        return Checkpoint.get_fingerprint([self.get_network_fingerprint(), self.load_profiles, self.gen_profiles,
+                                           self.load_p_0, self.load_q_0, self.gen_p_0,
+                                           self.pf.bus[:, FIX_POWER_BUS], self.pf.gen[:, FIX_POWER_GEN],
+                                           len(self.time), self.auto_repeat, self.tolerance, self.max_iterations,
+                                           self.enforce_reactive_power_limits, shapes])
+
+    def start_results(self):
+        """
+        Prepares the results of a run: empty results, or the results of the checkpoint when resuming
+        @return: boolean array with the time steps that are already solved
+        """
+        resume = self.resume_from_checkpoint
+        self.resume_from_checkpoint = False
+
+        if not resume:
+            self.format_profiles()
+            return np.zeros(len(self.time), dtype=bool)
+
+        done, V0, arrays = self.checkpoint.load(self.get_fingerprint())
+
+        if len(arrays) > 0:
+            self.format_profiles()
+            for name, arr in arrays.items():
+                self.results[name][:] = arr
+
+        elif self.results_path is not None:
+            # the results are the memory mapped files written by the interrupted run
+            if self.results is not None:
+                self.results.close()
+            self.results = ResultStore.open(self.results_path, mode='r+')
+            for name, (shape, dtype) in self.get_result_shapes().items():
+                if name not in self.results or self.results[name].shape != shape:
+                    raise Exception('The results at ' + self.results_path + ' do not belong to the checkpoint')
+            self.set_result_views()
+
+        else:
+            raise Exception('The checkpoint results are memory mapped: set the results path of the interrupted run')
+
+        if np.any(done) and self.warm_start != WarmStart.NONE:
+            self.set_last_solution(V0)
+
+        return done
+
+    def set_last_solution(self, V):
+        """
+        Sets the solution the next warm started power flow starts from (see WarmStart)
+        @param V: complex voltages array of the complete circuit
+        """
+        for cpf, b_idx, g_idx, br_idx in self.get_island_models():
+            cpf.V0 = V[b_idx].copy()
+
+    def save_checkpoint(self, done, V0=None, force=False):
+        """
+        Saves a checkpoint if the checkpoints are enabled and the save interval has elapsed
+        @param done: boolean array with the time steps solved
+        @param V0: last solution (complex voltages array of the complete circuit). None takes the solution of the last
+                   step solved
+        @param force: Save regardless of the interval (i.e. when the run is cancelled)
+        """
+        if self.checkpoint is None or not (force or self.checkpoint.is_due()):
+            return
+
+        if V0 is None:
+            V0 = self.get_last_voltage(done)
+
+        # the mapped results are already on disk
+        self.results.flush()
+        arrays = None if self.results.is_mapped() else self.results.arrays
+
+        self.checkpoint.save(self.get_fingerprint(), done, V0, arrays)
+
+    def finish_checkpoint(self, done, V0=None):
+        """
+        Closes the checkpoint of a run: it is saved if the run has been cancelled and deleted if it has finished
+        @param done: boolean array with the time steps solved
+        @param V0: last solution (see save_checkpoint)
+        """
+        if self.checkpoint is None:
+            return
+
+        if self.cancel:
+            self.save_checkpoint(done, V0, force=True)
+        else:
+            self.checkpoint.remove()
+
+    def get_last_voltage(self, done):
+        """
+        Returns the solution of the last step solved
+        @param done: boolean array with the time steps solved
+        @return: complex voltages array (the initial voltages if no step is solved)
+        """
+        solved = np.where(done)[0]
+        if len(solved) == 0:
+            return np.ones(len(self.pf.bus), dtype=complex)
+        return self.voltages[solved[-1]]
+
+    def resume(self):
+        """
+        Continues the run saved in the checkpoint (see set_checkpoint): the results of the solved steps are restored
+        and only the remaining steps are solved. The profiles, the options and the results schema must be those of the
+        interrupted run, and so must the results path when the results were memory mapped.
+        @return:
+        """
+        if self.checkpoint is None or not self.checkpoint.exists():
+            raise Exception('There is no checkpoint to resume')
+
+        self.resume_from_checkpoint = True
+        self.run()
 
     def set_loads_profile(self, profiles):
         """
@@ -144,7 +383,6 @@ class TimeSeries(QThread):
         @param profiles: input profiles as a table
         @return:
         """
-        print('set_loads_profile')
         self.load_profiles = self.set_profile(profiles, self.load_profiles, 'loads', self.pf.bus)
 
     def set_generators_profile(self, profiles):
@@ -153,7 +391,6 @@ class TimeSeries(QThread):
         @param profiles: input profiles as a table
         @return:
         """
-        print('set_generators_profile')
         self.gen_profiles = self.set_profile(profiles, self.gen_profiles, 'generators', self.pf.gen)
 
     def get_loads_dataframe(self, columns=None):
@@ -166,6 +403,7 @@ class TimeSeries(QThread):
 
         """
         if self.is_ready():
+            import pandas as pd
             return pd.DataFrame(data=self.load_profiles, index=self.time, columns=columns)
         else:
             return None
@@ -180,6 +418,7 @@ class TimeSeries(QThread):
 
         """
         if self.is_ready():
+            import pandas as pd
             return pd.DataFrame(data=self.gen_profiles, index=self.time, columns=columns)
         else:
             return None
@@ -187,27 +426,381 @@ class TimeSeries(QThread):
     def end_process(self):
         self.cancel = True
 
-    def set_run_options(self, auto_repeat=True, tol=1e-3, max_it=10, enforce_reactive_power_limits=True):
+    def set_run_options(self, auto_repeat=True, tol=1e-3, max_it=10, enforce_reactive_power_limits=True,
+                        batched=False, block_size=96, n_processes=1, warm_start=WarmStart.NONE, use_cache=True,
+                        refactor_every=1):
         """
         Set the execution parameters in the power flow object
         @param auto_repeat:
         @param tol:
         @param max_it:
-        @param enforce_reactive_power_limits:
+        @param enforce_reactive_power_limits: Enforce the generators reactive power limits? The batched mode cannot:
+                                              running it with the limits enforced raises a ValueError
+        @param batched: Solve the time steps in blocks of snapshots? (see run_batched)
+        @param block_size: Number of time steps solved together in the batched mode
+        @param n_processes: Number of processes, if greater than one the time is split in chunks solved in parallel
+                            (see run_parallel). None uses all the cpus.
+        @param warm_start: Where the steps of the sequential run start from: the initial voltages of the case
+                           (WarmStart.NONE), the solution of the previous step (WarmStart.PREVIOUS) or the previous
+                           solution corrected with the Jacobian sensitivities to the power change (WarmStart.PREDICTOR).
+                           The batched mode always starts every block from the last solution of the previous one.
+        @param use_cache: Reuse the solution of the steps whose state has already been solved? (see get_state_key).
+                          The cache is cleared since the stored solutions depend on the run options.
+        @param refactor_every: Newton-Raphson linear solves per LU factorization (k > 1 for a dishonest Newton-Raphson,
+                               see MultiCircuitPowerFlow.set_run_options)
         @return:
         """
         self.auto_repeat = auto_repeat
         self.tolerance = tol
         self.max_iterations = max_it
         self.enforce_reactive_power_limits = enforce_reactive_power_limits
+        self.batched = batched
+        self.block_size = block_size
+        self.n_processes = cpu_count() if n_processes is None else n_processes
+        self.warm_start = warm_start
+        self.use_cache = use_cache
+        self.refactor_every = refactor_every
+        self.cache.clear()
+
+    def get_state_key(self, S, Pgen):
+        """
+        Returns the key of the state of a time step in the solutions cache: the loads and generation define the power
+        injections, and the branches status and bus types complete the state
+        @param S: complex loads array in MVA (one value per bus)
+        @param Pgen: generators active power array in MW
+        @return: key
+        """
+        return self.cache.get_key(np.r_[S, Pgen], self.pf.branch[:, BR_STATUS], self.pf.bus[:, BUS_TYPE])
+
+    def load_cached_step(self, t, value):
+        """
+        Writes a cached solution in the results of a time step
+        @param t: time step
+        @param value: cached value (see cache_step)
+        """
+        for name, row in value.items():
+            self.results[name][t] = row
+
+    def cache_step(self, key, t):
+        """
+        Stores the results of a time step in the cache (as stored in the results store)
+        @param key: state key (see get_state_key)
+        @param t: time step
+        """
+        self.cache.put(key, {name: np.array(arr[t]) for name, arr in self.results.arrays.items()})
+
+    def get_steps_to_solve(self, S, Pgen):
+        """
+        Looks up the states of all the time steps in the cache: the cached steps are written in the results and the
+        steps that repeat a state are only solved once
+        @param S: complex loads matrix in MVA (time x bus)
+        @param Pgen: generators active power matrix in MW (time x generator)
+        @return:
+            list with the state key of every step (None if the cache is not used)
+            array with the steps to solve
+            array with the step whose solution is copied to every step (-1 for the steps that are not copies)
+        """
+        tT = len(S)
+        source = np.full(tT, -1, dtype=int)
+
+        if not self.use_cache:
+            return None, np.arange(tT), source
+
+        keys = [self.get_state_key(S[t], Pgen[t]) for t in range(tT)]
+        first = dict()
+        steps = list()
+        for t, key in enumerate(keys):
+            if key in first:
+                source[t] = first[key]
+            else:
+                first[key] = t
+                value = self.cache.get(key)
+                if value is None:
+                    steps.append(t)
+                else:
+                    self.load_cached_step(t, value)
+
+        # the repetitions within the time series are cache hits as well
+        self.cache.add_hits(int(np.count_nonzero(source >= 0)))
+
+        return keys, np.array(steps, dtype=int), source
+
+    def complete_steps(self, keys, steps, source):
+        """
+        Copies the solutions of the repeated steps and stores the solved steps in the cache (see get_steps_to_solve)
+        @param keys: list with the state key of every step (None if the cache is not used)
+        @param steps: array with the solved steps
+        @param source: array with the step whose solution is copied to every step (-1 for the steps that are not
+                       copies)
+        """
+        if keys is None:
+            return
+
+        repeated = np.where(source >= 0)[0]
+        if len(repeated) > 0:
+            for arr in self.results.arrays.values():
+                arr[repeated] = arr[source[repeated]]
+
+        for t in steps:
+            self.cache_step(keys[t], t)
+
+    def get_statistics(self):
+        """
+        Returns the statistics of the last run
+        @return: dictionary
+        """
+        return {'elapsed': self.elapsed,
+                'steps': 0 if self.time is None else len(self.time),
+                'mean iterations': 0 if self.iterations is None else float(np.mean(self.iterations)),
+                'cache hits': self.cache.hits,
+                'cache misses': self.cache.misses,
+                'cache hit rate': self.cache.hit_rate(),
+                'cache evictions': self.cache.evictions,
+                'cache entries': len(self.cache)}
+
+    def get_profile_rows(self, profile_len, time_len):
+        """
+        Returns the profile row used at every time step
+        @param profile_len: Number of rows of the profile
+        @param time_len: Number of time steps
+        @return: Array of row indices
+        """
+        t = np.arange(time_len)
+        if self.auto_repeat:
+            return t % profile_len
+        else:
+            # the last values are kept once the profile is over
+            return np.minimum(t, profile_len - 1)
+
+    def get_power_profiles(self):
+        """
+        Composes the loads and generation of every time step
+        @return: complex loads matrix in MVA (time x bus), generators active power matrix in MW (time x generator)
+        """
+        tT = len(self.time)
+
+        loads_enabled_for_change = np.where(self.pf.bus[:, FIX_POWER_BUS] == 0)[0]
+        gens_enabled_for_change = np.where(self.pf.gen[:, FIX_POWER_GEN] == 0)[0]
+
+        S = np.tile(self.load_p_0 + 1j * self.load_q_0, (tT, 1))
+        if self.load_profiles is not None:
+            rows = self.get_profile_rows(len(self.load_profiles), tT)
+            S[:, loads_enabled_for_change] = self.load_profiles[rows, :][:, loads_enabled_for_change]
+
+        Pgen = np.tile(self.gen_p_0, (tT, 1))
+        if self.gen_profiles is not None:
+            rows = self.get_profile_rows(len(self.gen_profiles), tT)
+            Pgen[:, gens_enabled_for_change] = np.real(self.gen_profiles[rows, :][:, gens_enabled_for_change])
+
+        return S, Pgen
+
+    def get_island_models(self):
+        """
+        Composes the data needed to solve the islands of the time series
+        @return: list of (island power flow object, bus indices, generator indices, in service branch indices)
+        """
+        return get_island_models(self.pf)
+
+    def run_batched(self):
+        """
+        Perform a time series run solving blocks of time steps at once.
+        The admittance matrices and the bus types of every island are kept fixed: the power injections of all the
+        time steps are composed as a (time x bus) matrix and every block of steps is solved with the batched
+        Newton-Raphson (see solve_time_series_chunk). The generators reactive power limits are not enforced.
+        @return:
+        """
+        start = time.time()
+
+        if self.time is None:
+            raise Warning('The time series time profile is empty')
+
+        self.cancel = False
+        self.check_cache()
+        done = self.start_results()
+
+        S, Pgen = self.get_power_profiles()
+
+        # only the steps whose state has not been solved yet are solved, except those solved before the checkpoint
+        keys, steps, source = self.get_steps_to_solve(S, Pgen)
+        rows = steps[~done[steps]]
+        S = S[rows]
+        Pgen = Pgen[rows]
+
+        models = self.get_island_models()
+        results = get_result_views(self.result_schema, self.results.arrays)
+
+        # with checkpoints the steps are solved in chunks of blocks, and the progress is saved between chunks
+        n_steps = len(rows)
+        chunk_size = max(n_steps, 1) if self.checkpoint is None else 10 * self.block_size
+
+        self.report_progress(0.0)
+
+        try:
+            for a in range(0, n_steps, chunk_size):
+                b = min(a + chunk_size, n_steps)
+
+                completed = solve_time_series_chunk(
+                    models, S, Pgen, a, b, self.block_size, self.tolerance, self.max_iterations, results, rows=rows,
+                    progress=lambda k, total: self.report_progress((a + (b - a) * k / total) / n_steps * 100),
+                    cancel=lambda: self.cancel)
+
+                if not completed:
+                    break
+
+                done[rows[a:b]] = True
+                self.save_checkpoint(done)
+
+        except BaseException:
+            self.save_checkpoint(done, force=True)
+            raise
+
+        if not self.cancel:
+            self.complete_steps(keys, steps, source)
+
+        self.finish_checkpoint(done)
+
+        self.results.flush()
+
+        # send the finnish signal
+        self.report_done()
+        self.elapsed = time.time() - start
+        logger.info('Time series finished in %.3f s', self.elapsed)
+
+    def run_parallel(self):
+        """
+        Perform a time series run in a pool of processes.
+        The master time is split in contiguous chunks. Every chunk is solved by a replica of the power flow object step
+        by step, like the sequential run (with its solver, reactive power limits and warm start policy, the warm start
+        running within the chunk), or in blocks of steps like the batched mode when it is enabled (see run_batched).
+        Every worker receives the power flow object once, and the power profiles and the results live in shared
+        memory, so the workers read and write them directly. When the results are stored on disk (see
+        set_results_path) the workers write into the memory mapped files instead.
+        @return:
+        """
+        start = time.time()
+
+        if self.time is None:
+            raise Warning('The time series time profile is empty')
+
+        self.cancel = False
+        self.check_cache()
+        done = self.start_results()
+
+        S, Pgen = self.get_power_profiles()
+
+        # only the steps whose state has not been solved yet are solved, except those solved before the checkpoint
+        keys, steps, source = self.get_steps_to_solve(S, Pgen)
+        rows = steps[~done[steps]]
+        S = S[rows]
+        Pgen = Pgen[rows]
+
+        # contiguous chunks of the steps to solve
+        n_steps = len(rows)
+        n_chunks = min(self.n_processes * self.chunks_per_process, n_steps)
+        bounds = np.linspace(0, n_steps, n_chunks + 1).astype(int)
+
+        shapes = {'S': (S.shape, np.complex128),
+                  'Pgen': (Pgen.shape, np.float64),
+                  'rows': (rows.shape, np.int64),
+                  'progress': ((n_chunks, 2), np.int64),
+                  'cancel': ((1,), np.int8)}
+
+        if self.results.is_mapped():
+            result_specs = self.results.get_specs()
+            self.results.flush()
+        else:
+            result_specs = None
+            shapes.update(self.get_result_shapes())
+
+        shared = SharedArrays(shapes)
+
+        try:
+            shared.arrays['S'][:] = S
+            shared.arrays['Pgen'][:] = Pgen
+            shared.arrays['rows'][:] = rows
+            del S, Pgen
+
+            self.report_progress(0.0)
+
+            options = (self.batched, self.block_size, self.tolerance, self.max_iterations,
+                       self.enforce_reactive_power_limits, self.warm_start, self.refactor_every)
+
+            with ProcessPoolExecutor(max_workers=self.n_processes, initializer=init_time_series_worker,
+                                     initargs=(self.pf, shared.get_specs(), result_specs, self.result_schema,
+                                               options)) as executor:
+
+                futures = {executor.submit(run_time_series_chunk, k, bounds[k], bounds[k + 1]): k
+                           for k in range(n_chunks)}
+
+                progress = shared.arrays['progress']
+                pending = set(futures)
+                while len(pending) > 0:
+                    finished, pending = wait(pending, timeout=0.2)
+
+                    for future in finished:
+                        # the errors of the workers are raised here; the chunks stopped by a cancellation are dropped
+                        if future.cancelled() or not future.result():
+                            continue
+
+                        # collect the results of the chunk (the workers have written the mapped results directly)
+                        k = futures[future]
+                        chunk_rows = rows[bounds[k]:bounds[k + 1]]
+                        if result_specs is None:
+                            for name in self.results.keys():
+                                self.results[name][chunk_rows] = shared.arrays[name][chunk_rows]
+
+                        done[chunk_rows] = True
+                        self.save_checkpoint(done)
+
+                    # the chunks that have not started count as zero progress
+                    blocks_done, blocks_total = progress[:, 0], progress[:, 1]
+                    fraction = np.where(blocks_total > 0, blocks_done / np.maximum(blocks_total, 1), 0.0).mean()
+                    self.report_progress(fraction * 100)
+
+                    if self.cancel:
+                        shared.arrays['cancel'][0] = 1
+                        for future in pending:
+                            future.cancel()
+
+        except BaseException:
+            self.save_checkpoint(done, force=True)
+            raise
+
+        finally:
+            shared.release()
+
+        if not self.cancel:
+            self.complete_steps(keys, steps, source)
+
+        self.finish_checkpoint(done)
+
+        self.results.flush()
+
+        # send the finnish signal
+        self.report_done()
+        self.elapsed = time.time() - start
+        logger.info('Time series finished in %.3f s', self.elapsed)
 
     def run(self):
         """
         Perform a time series run
         @return:
         """
-        start = time.clock()
-        print('Time series: run')
+        if self.batched and self.enforce_reactive_power_limits:
+            # the batched Newton-Raphson keeps the bus types fixed
+            raise ValueError('The batched time series cannot enforce the reactive power limits: disable them '
+                             '(enforce_reactive_power_limits=False) or the batched mode')
+
+        if self.n_processes > 1:
+            self.run_parallel()
+            return
+
+        if self.batched:
+            self.run_batched()
+            return
+
+        start = time.time()
+        logger.info('Time series run: %d steps', len(self.time) if self.time is not None else 0)
 
         if self.time is None:
             raise Warning('The time series time profile is empty')
@@ -217,11 +810,8 @@ class TimeSeries(QThread):
 
         tT = len(self.time)
 
-        nbus = len(self.pf.bus)
-        nbranch = len(self.pf.branch)
-
-        # format output profiles
-        self.format_profiles()
+        # format output profiles (or restore those of the checkpoint)
+        done = self.start_results()
 
         # get the enables for modification:
         # since the power flow object is sent already with user modifications it should be up to date on every run
@@ -231,79 +821,360 @@ class TimeSeries(QThread):
         # this is the base load values, only those enabled for change will be replaced in the loop
         S = self.load_p_0 + 1j * self.load_q_0
         # this is the base generation values, only those enabled for change will be replaced in the loop
-        Pgen = self.gen_p_0
+        Pgen = self.gen_p_0.copy()
 
-        # determine if to set every time a profile type on the condition that the profile exists
-        if self.gen_profiles is None:
-            setG = False
-        else:
-            tG, nG = np.shape(self.gen_profiles)
-            setG = True
+        # determine if to set every time a profile type on the condition that the profile exists, and the profile row
+        # of every time step (see get_profile_rows)
+        setG = self.gen_profiles is not None
+        if setG:
+            g_rows = self.get_profile_rows(len(self.gen_profiles), tT)
 
-        if self.load_profiles is None:
-            setL = False
-        else:
-            tL, nL = np.shape(self.load_profiles)
-            setL = True
+        setL = self.load_profiles is not None
+        if setL:
+            l_rows = self.get_profile_rows(len(self.load_profiles), tT)
 
         # set the run options
-        self.pf.set_run_options(self.pf.solver_type, self.tolerance, self.max_iterations, self.enforce_reactive_power_limits, False)
-
-        # se the profile time indices
-        t_g = 0  # generators profiles index
-        t_l = 0  # loads profiles index
-        self.emit(SIGNAL('progress(float)'), 0.0)
-        for t in range(tT):
-
-            # Setting the states
-            if setG:  # set the generators
-                # this is a simple double value
-                Pgen[gens_enabled_for_change] = self.gen_profiles[t_g, gens_enabled_for_change]
-                self.pf.set_generators(Pgen)
-
-            if setL:  # set the loads
-                #  this is a complex number
-                S[loads_enabled_for_change] = self.load_profiles[t_l, loads_enabled_for_change]
-                self.pf.set_loads(np.real(S), np.imag(S))
-
-            # run the power flow
-            # tol=1e-3, max_it=10, enforce_q_limits=True, remember_last_solution
-            self.pf.run()
-
-            # gather the results (the results are ensured to have the same length as the time master)
-            self.voltages[t, :] = self.pf.voltage
-            self.currents[t, :] = self.pf.current
-            self.loadings[t, :] = self.pf.loading
-            self.losses[t, :] = self.pf.losses
-            self.mismatch[t] = self.pf.mismatch
-
-            # Auto-repeating of the profiles
-            if setG:
-                if t_g == tG-1:
-                    if not self.auto_repeat:
-                        setG = False
-                    t_g = 0  # reset the generators time index
-                t_g += 1  # increase the profile index
-
-            if setL:
-                if t_l == tL-1:
-                    if not self.auto_repeat:
-                        setL = False
-                    t_l = 0  # reset the loads time index
-                t_l += 1  # increase the profile index
-
-            print(t+1, ' / ', tT)
-
-            # emmit the progress signal
-            prog = ((t+1)/tT)*100
-            self.emit(SIGNAL('progress(float)'), prog)
-
-            if self.cancel:
-                break
+        self.pf.set_run_options(self.pf.solver_type, self.tolerance, self.max_iterations,
+                                self.enforce_reactive_power_limits, False,
+                                solver_to_retry_with=self.pf.solver_to_retry_with, warm_start=self.warm_start,
+                                refactor_every=self.refactor_every)
+
+        self.check_cache()
+
+        n_done = np.count_nonzero(done)
+        V0 = self.get_last_voltage(done)
+        self.report_progress(n_done / tT * 100)
+
+        try:
+            for t in np.where(~done)[0]:
+
+                # Setting the states
+                if setG:  # set the generators
+                    # this is a simple double value
+                    Pgen[gens_enabled_for_change] = self.gen_profiles[g_rows[t], gens_enabled_for_change]
+                    self.pf.set_generators(Pgen)
+
+                if setL:  # set the loads
+                    #  this is a complex number
+                    S[loads_enabled_for_change] = self.load_profiles[l_rows[t], loads_enabled_for_change]
+                    self.pf.set_loads(np.real(S), np.imag(S))
+
+                # look for the state in the solutions cache
+                key = self.get_state_key(S, Pgen) if self.use_cache else None
+                cached = None if key is None else self.cache.get(key)
+
+                if cached is not None:
+                    self.load_cached_step(t, cached)
+
+                else:
+                    # run the power flow
+                    # tol=1e-3, max_it=10, enforce_q_limits=True, remember_last_solution
+                    self.pf.run()
+
+                    # gather the results (the results are ensured to have the same length as the time master)
+                    self.voltages[t, :] = self.pf.voltage
+                    self.currents[t, :] = self.pf.current
+                    self.loadings[t, :] = self.pf.loading
+                    self.losses[t, :] = self.pf.losses
+                    self.mismatch[t] = self.pf.mismatch
+                    self.iterations[t] = self.pf.iterations
+                    V0 = self.pf.voltage
+
+                    if key is not None:
+                        self.cache_step(key, t)
+
+                done[t] = True
+                n_done += 1
+                self.save_checkpoint(done, V0)
+
+                logger.debug('Time step %d: %d / %d', t, n_done, tT)
+
+                # emmit the progress signal
+                prog = (n_done / tT) * 100
+                self.report_progress(prog)
+
+                if self.cancel:
+                    break
+
+        except BaseException:
+            self.save_checkpoint(done, V0, force=True)
+            raise
+
+        self.finish_checkpoint(done, V0)
+
+        self.results.flush()
 
         # send the finnish signal
-        self.emit(SIGNAL('done()'))
-        elapsed = (time.clock() - start)
-        print('Elapsed time: ', elapsed)
+        self.report_done()
+        self.elapsed = time.time() - start
+        logger.info('Time series finished in %.3f s', self.elapsed)
+
+def get_island_models(pf):
+    """
+    Composes the data needed to solve the islands of a time series in blocks of steps
+    @param pf: MultiCircuitPowerFlow instance
+    @return: list of (island power flow object, bus indices, generator indices, in service branch indices)
+    """
+    models = list()
+    for i, island in enumerate(pf.island_circuits):
+        cpf = island.circuit_power_flow
+        b_idx, g_idx, br_idx = pf.original_indices[i]
+        br_idx = np.array(br_idx, dtype=int)[cpf.in_service_branches]
+        models.append((cpf, b_idx, g_idx, br_idx))
+    return models
+
+
+def solve_time_series_steps(pf, S, Pgen, a, b, results, rows=None, progress=None, cancel=None):
+    """
+    Solves the time steps a to b-1 one by one with the power flow object, like the sequential time series: with its
+    solver, reactive power limits and warm start policy (see MultiCircuitPowerFlow.set_run_options)
+    @param pf: MultiCircuitPowerFlow instance, with its run options set
+    @param S: complex loads matrix in MVA (time x bus) of the complete circuit
+    @param Pgen: generators active power matrix in MW (time x generator) of the complete circuit
+    @param a: first time step
+    @param b: last time step + 1
+    @param results: dictionary with the results of the complete time series (arrays or ResultView): voltages,
+                    currents, loadings, losses, mismatch and iterations. The rows a to b-1 are written
+    @param rows: array with the results row of every row of S and Pgen (None if they are the same)
+    @param progress: function called with the number of steps done and the total number of steps
+    @param cancel: function that returns True when the simulation has to stop
+    @return: True if all the steps have been solved, False if the simulation has been cancelled before
+    """
+    for k in range(a, b):
+        # the profiles already hold the base values of the loads and generators that are not enabled for change
+        pf.set_generators(Pgen[k])
+        pf.set_loads(np.real(S[k]), np.imag(S[k]))
+
+        pf.run()
+
+        r = k if rows is None else rows[k]
+        results['voltages'][r] = pf.voltage
+        results['currents'][r] = pf.current
+        results['loadings'][r] = pf.loading
+        results['losses'][r] = pf.losses
+        results['mismatch'][r] = pf.mismatch
+        results['iterations'][r] = pf.iterations
+
+        if progress is not None:
+            progress(k + 1 - a, b - a)
+
+        if cancel is not None and cancel():
+            return False
+
+    return True
+
+
+def solve_time_series_chunk(models, S, Pgen, a, b, block_size, tol, max_it, results, rows=None, progress=None,
+                            cancel=None):
+    """
+    Solves the time steps a to b-1 of all the islands, in blocks of steps solved at once with the batched
+    Newton-Raphson. Every block is warm started from the last step of the previous one, and the steps that do not
+    converge are retried one by one with the regular Newton-Raphson from the initial voltages.
+    @param models: list of (island power flow object, bus indices, generator indices, in service branch indices)
+    @param S: complex loads matrix in MVA (time x bus) of the complete circuit
+    @param Pgen: generators active power matrix in MW (time x generator) of the complete circuit
+    @param a: first time step
+    @param b: last time step + 1
+    @param block_size: Number of time steps solved together
+    @param tol: Solution tolerance
+    @param max_it: Maximum number of iterations
+    @param results: dictionary with the results of the complete time series (arrays or ResultView): voltages,
+                    currents, loadings, losses, mismatch and iterations. The rows a to b-1 are written
+    @param rows: array with the results row of every row of S and Pgen (None if they are the same)
+    @param progress: function called with the number of blocks done and the total number of blocks
+    @param cancel: function that returns True when the simulation has to stop
+    @return: True if all the steps have been solved, False if the simulation has been cancelled before (the results
+             are written in the arrays)
+    """
+    blocks = list(range(a, b, block_size))
+    total = len(models) * len(blocks)
+    done = 0
+
+    for cpf, b_idx, g_idx, br_idx in models:
+
+        if cpf.the_grid_is_disabled:
+            done += len(blocks)
+            continue
+
+        Sbus = cpf.makeSbus_profile(S[a:b, b_idx], Pgen[a:b, g_idx])
+
+        V_start = cpf.get_initial_voltage()
+        V0 = V_start
+        for k0 in blocks:
+            k1 = min(k0 + block_size, b)
+            block_start = time.time()
+
+            V, converged, normF, iterations = cpf.run_batch(Sbus[k0 - a:k1 - a, :], V0=V0, tol=tol, max_it=max_it)
+
+            # retry the steps that did not converge one by one, from the initial voltages
+            for k in np.where(~converged)[0]:
+                V[k, :], converged[k], normF[k], it = newtonpf(cpf.Ybus, Sbus[k0 - a + k, :], V_start.copy(),
+                                                               cpf.pv_list, cpf.pq_list, tol, max_it,
+                                                               jac_builder=cpf.get_jacobian_builder(cpf.pv_list,
+                                                                                                    cpf.pq_list),
+                                                               lin_solver=cpf.linear_solver)
+                iterations[k] += it
+
+            log_solve('NR batch', cpf.nb, np.all(converged), np.max(iterations), np.max(normF),
+                      time.time() - block_start)
+
+            current, loading, losses = cpf.get_branch_results_batch(V)
+
+            # gather the results
+            r = np.arange(k0, k1) if rows is None else rows[k0:k1]
+            results['voltages'][np.ix_(r, b_idx)] = V
+            results['currents'][np.ix_(r, br_idx)] = current
+            results['loadings'][np.ix_(r, br_idx)] = loading
+            results['losses'][np.ix_(r, br_idx)] = losses
+            results['mismatch'][r] = np.maximum(results['mismatch'][r], normF)
+            results['iterations'][r] = np.maximum(results['iterations'][r], iterations)
+
+            # the next block starts from the last solution
+            if converged[-1]:
+                V0 = V[-1, :]
+
+            done += 1
+            if progress is not None:
+                progress(done, total)
+
+            if cancel is not None and cancel():
+                return False
+
+    return True
+
+
+# quantity of every time series result (see ResultSchema)
+result_quantities = {'voltages': 'voltage',
+                     'currents': 'current',
+                     'loadings': 'loading',
+                     'losses': 'losses',
+                     'mismatch': 'error'}
+
+
+def get_result_views(schema, arrays):
+    """
+    Returns the time series results stored in a set of arrays
+    @param schema: ResultSchema of the results
+    @param arrays: dictionary with the stored arrays (see TimeSeries.get_result_shapes)
+    @return: dictionary name -> ResultView (the iterations array is returned as is)
+    """
+    views = {name: schema.view(arrays, name, quantity) for name, quantity in result_quantities.items()}
+    views['iterations'] = arrays['iterations']
+    return views
+
+
+class SharedArrays(object):
+    """
+    Set of numpy arrays allocated in shared memory, so that several processes can read and write them
+    """
+
+    def __init__(self, shapes=None, specs=None):
+        """
+        Constructor: creates the arrays (shapes) or attaches to existing ones (specs)
+        @param shapes: dictionary name -> (shape, dtype) of the arrays to create (initialized to zero)
+        @param specs: dictionary name -> (shared memory name, shape, dtype) of existing arrays (see get_specs)
+        """
+        # shared_memory is new in Python 3.8: imported here so that the serial simulations run on older versions
+        from multiprocessing.shared_memory import SharedMemory
+
+        self.blocks = dict()
+        self.arrays = dict()
+        self.owner = specs is None
+
+        if self.owner:
+            for key, (shape, dtype) in shapes.items():
+                nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+                block = SharedMemory(create=True, size=max(nbytes, 1))
+                self.blocks[key] = block
+                self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                self.arrays[key][...] = 0
+        else:
+            for key, (name, shape, dtype) in specs.items():
+                block = SharedMemory(name=name)
+                self.blocks[key] = block
+                self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def get_specs(self):
+        """
+        Returns the description needed to attach to the arrays from another process
+        """
+        return {key: (self.blocks[key].name, arr.shape, arr.dtype.str) for key, arr in self.arrays.items()}
+
+    def release(self):
+        """
+        Detaches from the shared memory (and frees it if this object created it)
+        """
+        self.arrays = dict()
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = dict()
+
+
+# state of the time series worker processes (see init_time_series_worker)
+worker_state = dict()
+
+
+def init_time_series_worker(pf, specs, result_specs, schema, options):
+    """
+    Initializes a time series worker process: it receives the power flow object once and attaches to the shared
+    arrays
+    @param pf: MultiCircuitPowerFlow instance, replicated in the worker
+    @param specs: shared arrays description (see SharedArrays.get_specs)
+    @param result_specs: memory mapped results description (see ResultStore.get_specs), None if the results are
+                         shared arrays
+    @param schema: ResultSchema of the results
+    @param options: batched mode?, number of time steps solved together in the batched mode, solution tolerance,
+                    maximum number of iterations, enforce the reactive power limits?, WarmStart policy and linear
+                    solves per LU factorization
+    """
+    batched, block_size, tol, max_it, enforce_q_limits, warm_start, refactor_every = options
+    pf.set_run_options(pf.solver_type, tol, max_it, enforce_q_limits, False,
+                       solver_to_retry_with=pf.solver_to_retry_with, warm_start=warm_start,
+                       refactor_every=refactor_every)
+
+    worker_state['pf'] = pf
+    worker_state['shared'] = SharedArrays(specs=specs)
+    worker_state['arrays'] = dict(worker_state['shared'].arrays)
+    if result_specs is not None:
+        worker_state['arrays'].update(ResultStore.attach(result_specs))
+    worker_state['results'] = get_result_views(schema, worker_state['arrays'])
+    worker_state['options'] = (batched, block_size, tol, max_it)
+
+
+def run_time_series_chunk(k, a, b):
+    """
+    Solves a chunk of time steps in a worker process, writing the results in the shared arrays
+    @param k: chunk index (row of the shared progress array)
+    @param a: first time step
+    @param b: last time step + 1
+    @return: True if the chunk has been solved, False if it has been cancelled
+    """
+    arrays = worker_state['arrays']
+    batched, block_size, tol, max_it = worker_state['options']
+
+    # every chunk starts from a copy of the initial replica, so that its results do not depend on the chunks solved
+    # before by the process (i.e. the last solution of the warm start)
+    pf = deepcopy(worker_state['pf'])
+
+    def progress(done, total):
+        arrays['progress'][k, :] = done, total
+
+    def cancel():
+        return arrays['cancel'][0] != 0
+
+    if batched:
+        completed = solve_time_series_chunk(get_island_models(pf), arrays['S'], arrays['Pgen'], a, b, block_size,
+                                            tol, max_it, worker_state['results'], rows=arrays['rows'],
+                                            progress=progress, cancel=cancel)
+    else:
+        completed = solve_time_series_steps(pf, arrays['S'], arrays['Pgen'], a, b, worker_state['results'],
+                                            rows=arrays['rows'], progress=progress, cancel=cancel)
 
+    # make the mapped results visible to the master
+    for arr in arrays.values():
+        if isinstance(arr, np.memmap):
+            arr.flush()
 
+    return completed
@@ -0,0 +1,152 @@
+"""
+Topology processing: detection of the electrical islands and index maps of the buses, generators and branches of each
+island.
+
+The islands are the connected components of the graph formed by the buses and the in service branches. They are
+computed with scipy.sparse.csgraph over the bus-bus connectivity matrix, and every element is assigned to an island
+through label arrays, so the whole process is O(nb + nl + ng).
+"""
+
+import numpy as np
+from numpy import arange, ones, full
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from grid.BusDefinitions import *
+from grid.GenDefinitions import *
+from grid.BranchDefinitions import *
+
+
+def get_bus_map(bus):
+    """
+    Map from the bus numbers to the bus positions
+    Args:
+        bus: Buses structure
+
+    Returns: Array such that bus_map[bus number] = position of the bus in the buses structure (-1 for the numbers
+             that no bus has, see map_buses)
+    """
+    numbers = bus[:, BUS_I].astype(int)
+    bus_map = full(numbers.max() + 1 if len(numbers) else 0, -1, dtype=int)
+    bus_map[numbers] = arange(len(numbers))
+    return bus_map
+
+
+def map_buses(bus_map, numbers, elements='elements'):
+    """
+    Positions of the buses referenced by some elements
+    Args:
+        bus_map: Map from the bus numbers to positions (see get_bus_map)
+        numbers: Array of bus numbers referenced (i.e. gen[:, GEN_BUS])
+        elements: Name of the elements that reference the buses, for the error message
+
+    Returns: Array with the position of every bus referenced.
+             Raises ValueError if some number does not belong to any bus.
+    """
+    numbers = numbers.astype(int)
+    valid = (numbers >= 0) & (numbers < len(bus_map))
+    positions = full(len(numbers), -1, dtype=int)
+    positions[valid] = bus_map[numbers[valid]]
+
+    missing = positions < 0
+    if missing.any():
+        raise ValueError('The ' + elements + ' ' + str(np.where(missing)[0].tolist()) + ' reference the bus numbers ' +
+                         str(np.unique(numbers[missing]).tolist()) + ', that no bus has')
+
+    return positions
+
+
+def find_islands(bus, branch, bus_map=None):
+    """
+    Computes the island of every bus
+    Args:
+        bus: Buses structure
+        branch: Branches structure (the branches with BR_STATUS = 0 do not connect their buses)
+        bus_map: Map from the bus numbers to positions (computed if not provided)
+
+    Returns:
+        Number of islands
+        Island label of every bus (the islands are numbered in the order of their first bus)
+    """
+    nb = len(bus)
+    if bus_map is None:
+        bus_map = get_bus_map(bus)
+
+    active = branch[:, BR_STATUS] != 0
+    f = map_buses(bus_map, branch[active, F_BUS], 'branches')
+    t = map_buses(bus_map, branch[active, T_BUS], 'branches')
+
+    C = csr_matrix((ones(len(f), dtype=int), (f, t)), shape=(nb, nb))
+
+    return connected_components(C, directed=False)
+
+
+def get_island_indices(bus, gen, branch):
+    """
+    Computes the islands and the indices of the buses, generators and branches that belong to each of them
+    Args:
+        bus: Buses structure
+        gen: Generators structure
+        branch: Branches structure
+
+    Returns:
+        List with one entry per island: [bus indices, generator indices, branch indices] (sorted arrays).
+        A branch belongs to an island when both of its buses do, whatever its status.
+        Island label of every bus
+        Island label of every generator
+    """
+    bus_map = get_bus_map(bus)
+    n_islands, bus_labels = find_islands(bus, branch, bus_map)
+
+    gen_labels = bus_labels[map_buses(bus_map, gen[:, GEN_BUS], 'generators')]
+
+    f_labels = bus_labels[map_buses(bus_map, branch[:, F_BUS], 'branches')]
+    t_labels = bus_labels[map_buses(bus_map, branch[:, T_BUS], 'branches')]
+    branch_labels = np.where(f_labels == t_labels, f_labels, -1)
+
+    bus_groups = group_by_label(bus_labels, n_islands)
+    gen_groups = group_by_label(gen_labels, n_islands)
+    branch_groups = group_by_label(branch_labels, n_islands)
+
+    indices = [[bus_groups[i], gen_groups[i], branch_groups[i]] for i in range(n_islands)]
+
+    return indices, bus_labels, gen_labels
+
+
+def group_by_label(labels, n):
+    """
+    Splits the positions of an array of labels by label value
+    Args:
+        labels: Array of integer labels (negative labels are ignored)
+        n: Number of labels
+
+    Returns: List of n sorted arrays of positions
+    """
+    order = np.argsort(labels, kind='mergesort')  # stable: the positions remain sorted within each group
+    counts = np.bincount(labels[labels >= 0], minlength=n)
+    start = len(labels) - counts.sum()  # the ignored labels go first
+    return np.split(order[start:], np.cumsum(counts)[:-1])
+
+
+def renumber_buses(bus, gen, branch):
+    """
+    Renumbers the buses of a (island) circuit as 0..nb-1 in their order in the buses structure
+    Args:
+        bus: Buses structure
+        gen: Generators structure
+        branch: Branches structure
+
+    Returns: Copies of the buses, generators and branches structures with the new numbering
+    """
+    bus_map = get_bus_map(bus)
+
+    bus = bus.copy()
+    gen = gen.copy()
+    branch = branch.copy()
+
+    gen[:, GEN_BUS] = map_buses(bus_map, gen[:, GEN_BUS], 'generators')
+    branch[:, F_BUS] = map_buses(bus_map, branch[:, F_BUS], 'branches')
+    branch[:, T_BUS] = map_buses(bus_map, branch[:, T_BUS], 'branches')
+    bus[:, BUS_I] = arange(len(bus))
+
+    return bus, gen, branch
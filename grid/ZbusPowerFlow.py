@@ -5,7 +5,7 @@ from numpy import where, zeros, ones, mod, conj, array, dot, complex128
 
 from scipy.linalg import solve
 
-from scipy.sparse.linalg import factorized, spsolve, inv
+from scipy.sparse.linalg import factorized, spsolve, splu
 from scipy.sparse import issparse
 # from numba import jit
 
@@ -13,7 +13,7 @@ from scipy.sparse import issparse
 complex_type = complex128
 
 
-def reduce_arrays(n_bus, Ymat, slack_indices, Vset, S, types):
+def reduce_arrays(n_bus, Ymat, slack_indices, Vset, S, types, Zred=None):
     """
     Reduction of the circuit magnitudes.
 
@@ -30,9 +30,11 @@ def reduce_arrays(n_bus, Ymat, slack_indices, Vset, S, types):
 
         types: Vector of nde types
 
+        Zred: Sparse LU factorization of the reduced admittance matrix (optional, computed if None)
+
     Output:
 
-        Zred: Reduced impedance matrix
+        Zred: Reduced impedance matrix in factorized form (Zred.solve(I) = Zred x I)
 
         C: Reduced voltage constant
 
@@ -76,11 +78,12 @@ def reduce_arrays(n_bus, Ymat, slack_indices, Vset, S, types):
     # Vector of reduced power values (Non slack power injections)
     Sred = S[non_slack_indices]
 
-    # reduced impedance matrix
-    Zred = inv(Yred)
+    # reduced impedance matrix: the explicit inverse is almost dense, so only the factorization is kept
+    if Zred is None:
+        Zred = splu(Yred.tocsc())
 
     # Reduced voltage constant
-    C = Zred.dot(Islack)
+    C = Zred.solve(Islack)
 
     # list of PV indices in the reduced scheme
     pv_idx_red = where(types_red == 2)[0]
@@ -127,7 +130,8 @@ def calc_error(admittances, V, powerInjections):
 
 
 # @jit
-def zbus(admittances, slackIndices, maxIter, powerInjections, voltageSetPoints, types, Qlim, eps=1e-3, Vsol=None):
+def zbus(admittances, slackIndices, maxIter, powerInjections, voltageSetPoints, types, Qlim, eps=1e-3, Vsol=None,
+         Zred=None):
     """
 
     Args:
@@ -147,8 +151,10 @@ def zbus(admittances, slackIndices, maxIter, powerInjections, voltageSetPoints,
 
         Vsol: Starting point voltage solution
 
+        Zred: Precomputed sparse LU factorization of the reduced admittance matrix (optional)
+
     Output:
-        Voltages vector
+        Voltages vector, convergence flag, error and number of iterations
     """
 
     # The routines in this script are meant to handle sparse matrices, hence non-sparse ones are not allowed
@@ -165,7 +171,8 @@ def zbus(admittances, slackIndices, maxIter, powerInjections, voltageSetPoints,
                                                                              dtype=int),
                                                          Vset=voltageSetPoints,
                                                          S=powerInjections,
-                                                         types=types)
+                                                         types=types,
+                                                         Zred=Zred)
 
     # Solve variables
     n = 0
@@ -199,7 +206,7 @@ def zbus(admittances, slackIndices, maxIter, powerInjections, voltageSetPoints,
         I = conj(Sred) / conj(Vred)
 
         # compute the voltage
-        Vred = Zred.dot(I) + C
+        Vred = Zred.solve(I) + C
 
         # correct the voltage for the PV buses
         if npv > 0:
@@ -233,5 +240,5 @@ def zbus(admittances, slackIndices, maxIter, powerInjections, voltageSetPoints,
     # Assign the non-slack voltages
     voltages_vector[non_slack_indices] = Vred
 
-    return voltages_vector, converged, error
+    return voltages_vector, converged, error, n
 
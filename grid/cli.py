@@ -0,0 +1,340 @@
+"""
+Command line interface of GridCal: loads a case and runs a study without the GUI.
+
+usage:
+    gridcal power-flow case.xls [-o results_folder]
+    gridcal time-series case_with_profiles.xls --processes 8 [-o results_folder]
+    gridcal monte-carlo case_with_profiles.xls --group-by ByDay [-o results_folder]
+    gridcal voltage-stability case.xls
+    gridcal contingency case.xls --top-k 20
+
+The results are summarized on the console and, when an output folder is given, saved as .csv files.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from grid.PowerFlow import SolverType, WarmStart
+from grid.ResultStore import ResultSchema
+from grid.CircuitModule import Circuit
+from grid.MonteCarlo import TimeGroups, SamplingMethod
+from grid.Telemetry import enable_logging, SolveRecorder
+
+
+def print_progress(value):
+    """
+    Progress callback of the engines: writes the completion percentage on the same console line
+    @param value: percentage
+    """
+    sys.stderr.write('\r%6.2f %%' % value)
+    sys.stderr.flush()
+
+
+def print_done():
+    """
+    Done callback of the engines
+    """
+    sys.stderr.write('\n')
+    sys.stderr.flush()
+
+
+def load_circuit(args):
+    """
+    Loads the case of the command line arguments
+    @param args: parsed arguments
+    @return: Circuit instance
+    """
+    if not os.path.exists(args.case):
+        raise SystemExit('The case ' + args.case + ' does not exist')
+
+    circuit = Circuit(args.case, is_file=True)
+    circuit.initialize_power_flow_solver(solver_type=SolverType[args.solver])
+    return circuit
+
+
+def attach(engine, args):
+    """
+    Connects the progress report of an engine to the console
+    @param engine: simulation engine
+    @param args: parsed arguments
+    @return: the engine
+    """
+    if not args.quiet:
+        engine.set_callbacks(progress=print_progress, done=print_done)
+    return engine
+
+
+def save(args, name, data, index=None, columns=None):
+    """
+    Saves a results table in the output folder (if any)
+    @param args: parsed arguments
+    @param name: table name (the file is <output>/<name>.csv)
+    @param data: table data (dictionary of columns or 2D array)
+    @param index: row labels
+    @param columns: column labels (if the data is an array)
+    """
+    if args.output is None:
+        return
+
+    # pandas is only needed to write the results
+    import pandas as pd
+
+    os.makedirs(args.output, exist_ok=True)
+    file_name = os.path.join(args.output, name + '.csv')
+    pd.DataFrame(data=data, index=index, columns=columns).to_csv(file_name)
+    print('Saved', file_name)
+
+
+def run_power_flow(args):
+    """
+    Runs a power flow
+    @param args: parsed arguments
+    """
+    circuit = load_circuit(args)
+    pf = attach(circuit.power_flow, args)
+
+    pf.set_run_options(solver_type=SolverType[args.solver], tol=args.tol, max_it=args.max_it,
+                       enforce_reactive_power_limits=not args.no_q_limits, isMaster=True,
+                       solver_to_retry_with=None if args.retry_solver is None else SolverType[args.retry_solver],
+                       refactor_every=args.refactor_every)
+    start = time.time()
+    pf.run()
+    elapsed = time.time() - start
+
+    print('Converged:', all(pf.last_power_flow_succeeded), ' mismatch:', pf.mismatch,
+          ' iterations:', pf.iterations, ' elapsed (s):', elapsed)
+
+    V = pf.voltage
+    save(args, 'bus_results', {'Vm': np.abs(V), 'Va': np.angle(V, deg=True), 'P': pf.power.real, 'Q': pf.power.imag},
+         index=circuit.bus_names)
+    save(args, 'branch_results', {'Sf': np.abs(pf.power_from), 'St': np.abs(pf.power_to), 'current': np.abs(pf.current),
+                                  'loading': np.abs(pf.loading), 'losses': np.abs(pf.losses)},
+         index=circuit.branch_names)
+
+
+def get_time_series(circuit):
+    """
+    Returns the time series of a circuit, that needs the case to have profiles
+    @param circuit: Circuit instance
+    @return: TimeSeries instance
+    """
+    if circuit.time_series is None or not circuit.time_series.is_ready():
+        raise SystemExit('The case has no profiles')
+
+    circuit.initialize_TimeSeries()
+    circuit.time_series.pf.solver_type = circuit.power_flow.solver_type
+    return circuit.time_series
+
+
+def run_time_series(args):
+    """
+    Runs a time series
+    @param args: parsed arguments
+    """
+    circuit = load_circuit(args)
+    ts = attach(get_time_series(circuit), args)
+
+    ts.set_run_options(auto_repeat=True, tol=args.tol, max_it=args.max_it,
+                       enforce_reactive_power_limits=not args.no_q_limits, batched=args.batched,
+                       block_size=args.block_size, n_processes=args.processes,
+                       warm_start=WarmStart[args.warm_start], use_cache=not args.no_cache,
+                       refactor_every=args.refactor_every)
+    if args.compact:
+        ts.set_result_schema(ResultSchema.compact())
+    ts.set_results_path(args.results_path)
+    ts.set_checkpoint(args.checkpoint, interval=args.checkpoint_interval)
+
+    if args.resume:
+        ts.resume()
+    else:
+        ts.run()
+
+    print('Statistics:', ts.get_statistics())
+
+    save(args, 'voltage_module', abs(ts.voltages), index=ts.time, columns=circuit.bus_names)
+    save(args, 'branch_loading', abs(ts.loadings), index=ts.time, columns=circuit.branch_names)
+
+
+def run_monte_carlo(args):
+    """
+    Runs a Monte Carlo simulation
+    @param args: parsed arguments
+    """
+    circuit = load_circuit(args)
+    get_time_series(circuit)
+
+    circuit.initialize_MonteCarlo(TimeGroups[args.group_by], n_processes=args.processes)
+    mc = attach(circuit.monte_carlo, args)
+    mc.set_run_options(tol=args.mc_tol, max_it=args.mc_max_it, tol_pf=args.tol, max_it_pf=args.max_it,
+                       enforce_reactive_power_limits=not args.no_q_limits)
+    mc.set_seed(args.seed)
+    mc.set_sampling_options(correlated=args.correlated, max_rank=args.copula_rank,
+                            method=SamplingMethod[args.sampling], replicate_size=args.replicate_size,
+                            min_replicates=args.min_replicates)
+    if args.processes != 1:
+        mc.set_parallel_options(n_processes=args.processes, batch_size=args.batch_size, seed=args.seed)
+    mc.set_statistics_options(quantiles=args.quantiles, history_every=args.history_every)
+
+    start = time.time()
+    mc.run()
+    elapsed = time.time() - start
+
+    error = mc.error_series[-1] if len(mc.error_series) else None
+    print('Power flows:', mc.num_eval, ' discarded:', mc.num_failed, ' error:', error, ' elapsed (s):', elapsed)
+
+    moments = mc.moments['V']
+    statistics = {'mean': np.abs(mc.V_avg), 'std': mc.V_std, 'min': moments.minimum, 'max': moments.maximum}
+    for p, values in moments.quantiles().items():
+        statistics['q%g' % p] = values
+    save(args, 'voltage_statistics', statistics, index=circuit.bus_names)
+
+
+def run_voltage_stability(args):
+    """
+    Runs the continuation power flow
+    @param args: parsed arguments
+    """
+    circuit = load_circuit(args)
+    circuit.initialize_solvers()
+    vs = attach(circuit.voltage_stability, args)
+
+    vs.set_run_options(solver_type=SolverType[args.solver], tol=args.tol, max_it=args.max_it,
+                       enforce_reactive_power_limits=not args.no_q_limits, isMaster=True)
+    vs.run()
+
+    # maximum loading parameter reached at every bus
+    lam = [np.max(np.real(l)) if np.size(l) > 0 else np.nan for l in vs.continuation_lambda]
+    print('Maximum loading parameter:', np.nanmin(lam) if len(lam) else None)
+
+    save(args, 'voltage_stability', {'lambda max': lam}, index=circuit.bus_names)
+
+
+def run_contingency(args):
+    """
+    Runs the N-1 contingency analysis
+    @param args: parsed arguments
+    """
+    circuit = load_circuit(args)
+    circuit.initialize_contingency_analysis(top_k=args.top_k, threshold=args.threshold)
+    ca = attach(circuit.contingency_analysis, args)
+
+    ca.set_run_options(top_k=args.top_k, threshold=args.threshold, tol=args.tol, max_it=args.max_it,
+                       enforce_reactive_power_limits=not args.no_q_limits)
+    ca.run()
+
+    print('Outages with overloads:', int(np.count_nonzero(ca.overloads)), ' elapsed (s):', ca.elapsed)
+
+    save(args, 'contingency_screening', {'max loading': ca.max_loading, 'overloads': ca.overloads,
+                                         'islanding': ca.islanding},
+         index=circuit.branch_names)
+
+
+def get_parser():
+    """
+    Returns the command line arguments parser
+    """
+    parser = argparse.ArgumentParser(prog='gridcal', description='Runs a GridCal study without the GUI')
+    subparsers = parser.add_subparsers(dest='study')
+    subparsers.required = True
+
+    solvers = [s.name for s in SolverType]
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('case', help='case file (.xls, .xlsx, .m, .dgs, .mat)')
+    common.add_argument('-o', '--output', default=None, help='folder where the results are saved as .csv files')
+    common.add_argument('--solver', default='NR', choices=solvers, help='power flow solver')
+    common.add_argument('--tol', type=float, default=1e-3, help='power flow tolerance')
+    common.add_argument('--max-it', type=int, default=20, help='power flow maximum iterations')
+    common.add_argument('--no-q-limits', action='store_true', help='do not enforce the reactive power limits')
+    common.add_argument('-q', '--quiet', action='store_true', help='do not report the progress')
+    common.add_argument('-v', '--verbose', action='count', default=0,
+                        help='print the log (-v: every power flow solve, -vv: the solver details)')
+    common.add_argument('--solve-log', action='store_true',
+                        help='save the record of every power flow solve in the output folder (solve_log.csv)')
+
+    p = subparsers.add_parser('power-flow', parents=[common], help='power flow')
+    p.add_argument('--retry-solver', default=None, choices=solvers, help='solver used if the first does not converge')
+    p.add_argument('--refactor-every', type=int, default=1,
+                   help='Newton-Raphson solves per LU factorization (more than 1 for a dishonest Newton-Raphson)')
+    p.set_defaults(function=run_power_flow)
+
+    p = subparsers.add_parser('time-series', parents=[common], help='time series of the case profiles')
+    p.add_argument('--batched', action='store_true',
+                   help='solve blocks of time steps at once (requires --no-q-limits)')
+    p.add_argument('--block-size', type=int, default=96, help='time steps per block of the batched mode')
+    p.add_argument('--processes', type=int, default=1, help='number of processes (0 for all the cpus)')
+    p.add_argument('--warm-start', default='NONE', choices=[w.name for w in WarmStart],
+                   help='where every step starts from')
+    p.add_argument('--no-cache', action='store_true', help='solve the repeated states again')
+    p.add_argument('--refactor-every', type=int, default=1,
+                   help='Newton-Raphson solves per LU factorization (more than 1 for a dishonest Newton-Raphson)')
+    p.add_argument('--compact', action='store_true', help='store the results in the compact schema')
+    p.add_argument('--results-path', default=None, help='folder where the results are memory mapped')
+    p.add_argument('--checkpoint', default=None, help='checkpoint file')
+    p.add_argument('--checkpoint-interval', type=float, default=300.0, help='seconds between checkpoints')
+    p.add_argument('--resume', action='store_true', help='resume the run saved in the checkpoint')
+    p.set_defaults(function=run_time_series)
+
+    p = subparsers.add_parser('monte-carlo', parents=[common], help='Monte Carlo of the case profiles')
+    p.add_argument('--group-by', default='NoGroup', choices=[g.name for g in TimeGroups], help='time grouping')
+    p.add_argument('--mc-tol', type=float, default=1e-3, help='Monte Carlo tolerance')
+    p.add_argument('--mc-max-it', type=int, default=1000, help='Monte Carlo maximum iterations')
+    p.add_argument('--processes', type=int, default=1, help='number of processes (0 for all the cpus)')
+    p.add_argument('--batch-size', type=int, default=10, help='Monte Carlo iterations per batch of a process')
+    p.add_argument('--seed', type=int, default=None,
+                   help='seed of the random samples (the same seed gives the same results)')
+    p.add_argument('--correlated', action='store_true',
+                   help='sample the loads and generators jointly with a Gaussian copula of their profiles')
+    p.add_argument('--copula-rank', type=int, default=None, help='maximum rank of the copula correlation')
+    p.add_argument('--sampling', default='MonteCarlo', choices=[m.name for m in SamplingMethod],
+                   help='sampling method (the designs are drawn in randomized replicates)')
+    p.add_argument('--replicate-size', type=int, default=64,
+                   help='Monte Carlo iterations per replicate of the designs (a power of 2 for Sobol)')
+    p.add_argument('--min-replicates', type=int, default=10,
+                   help='replicates of the designs before the Monte Carlo tolerance is checked')
+    p.add_argument('--quantiles', type=float, nargs='*', default=(), help='quantiles of the results to estimate')
+    p.add_argument('--history-every', type=int, default=1, help='Monte Carlo iterations between convergence points')
+    p.set_defaults(function=run_monte_carlo)
+
+    p = subparsers.add_parser('voltage-stability', parents=[common], help='continuation power flow')
+    p.set_defaults(function=run_voltage_stability)
+
+    p = subparsers.add_parser('contingency', parents=[common], help='N-1 contingency analysis')
+    p.add_argument('--top-k', type=int, default=10, help='number of outages verified with the AC power flow')
+    p.add_argument('--threshold', type=float, default=1.0, help='overload threshold (p.u. of the rating)')
+    p.set_defaults(function=run_contingency)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of the command line interface
+    @param argv: arguments (None takes those of the command line)
+    """
+    args = get_parser().parse_args(argv)
+
+    if getattr(args, 'processes', 1) == 0:
+        args.processes = None  # all the cpus
+
+    if args.verbose:
+        enable_logging(logging.DEBUG if args.verbose > 1 else logging.INFO)
+
+    # the solves run in other processes are not recorded
+    recorder = SolveRecorder() if args.solve_log else None
+
+    try:
+        args.function(args)
+    finally:
+        if recorder is not None:
+            recorder.detach()
+            save(args, 'solve_log', recorder.as_table())
+
+
+if __name__ == '__main__':
+    main()
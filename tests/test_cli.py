@@ -0,0 +1,95 @@
+"""
+Smoke test of the command line interface (see grid/cli.py): every study runs on the bundled cases and saves its
+results.
+
+usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+from io import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from grid.cli import main
+
+
+def case(name):
+    """
+    Path of a bundled case
+    @param name: file name
+    """
+    return os.path.join(ROOT, name)
+
+
+class CommandLineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output, ignore_errors=True)
+
+    def run_study(self, *argv):
+        """
+        Runs a study quietly, saving the results in the output folder
+        @param argv: command line arguments
+        @return: names of the files saved
+        """
+        with contextlib.redirect_stdout(StringIO()):
+            main(list(argv) + ['-q', '-o', self.output])
+        return sorted(os.listdir(self.output))
+
+    def test_power_flow(self):
+        for name in ['IEEE_30BUS.xls', 'IEEE_5Bus.xls', 'IEEE_57BUS.xls', 'IEEE_39Bus(Islands).xls']:
+            with self.subTest(case=name):
+                self.assertIn('bus_results.csv', self.run_study('power-flow', case(name)))
+
+    def test_power_flow_dishonest(self):
+        self.assertIn('bus_results.csv', self.run_study('power-flow', case('IEEE_30BUS.xls'),
+                                                        '--refactor-every', '3'))
+
+    def test_time_series(self):
+        self.assertIn('voltage_module.csv', self.run_study('time-series', case('IEEE_30BUS_profiles.xls')))
+
+    def test_time_series_warm_start(self):
+        for warm_start in ['PREVIOUS', 'PREDICTOR']:
+            with self.subTest(warm_start=warm_start):
+                self.assertIn('voltage_module.csv', self.run_study('time-series', case('IEEE_30BUS_profiles.xls'),
+                                                                   '--warm-start', warm_start))
+
+    def test_time_series_batched(self):
+        self.assertIn('voltage_module.csv', self.run_study('time-series', case('IEEE_30BUS_profiles.xls'),
+                                                           '--batched', '--no-q-limits'))
+
+    def test_time_series_parallel(self):
+        self.assertIn('voltage_module.csv', self.run_study('time-series', case('IEEE_30BUS_profiles.xls'),
+                                                           '--processes', '2', '--no-q-limits'))
+
+    def test_monte_carlo(self):
+        self.assertIn('voltage_statistics.csv', self.run_study('monte-carlo', case('IEEE_30BUS_profiles.xls'),
+                                                               '--mc-max-it', '20', '--seed', '1'))
+
+    def test_monte_carlo_designs(self):
+        for sampling in ['LatinHypercube', 'Sobol']:
+            with self.subTest(sampling=sampling):
+                files = self.run_study('monte-carlo', case('IEEE_30BUS_profiles.xls'), '--mc-max-it', '64',
+                                       '--sampling', sampling, '--replicate-size', '8', '--seed', '1')
+                self.assertIn('voltage_statistics.csv', files)
+
+    def test_voltage_stability(self):
+        self.assertIn('voltage_stability.csv', self.run_study('voltage-stability', case('IEEE_30BUS.xls')))
+
+    def test_contingency(self):
+        self.assertIn('contingency_screening.csv', self.run_study('contingency', case('IEEE_57BUS_contingency.xls'),
+                                                                 '--top-k', '3'))
+
+
+if __name__ == '__main__':
+    unittest.main()
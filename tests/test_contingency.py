@@ -0,0 +1,49 @@
+"""
+Tests of the N-1 contingency analysis (see grid/ContingencyAnalysis.py)
+
+usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from grid.CircuitModule import Circuit
+from grid.PowerFlow import SolverType
+from grid.BranchDefinitions import BR_STATUS
+
+
+class ContingencyAnalysisTest(unittest.TestCase):
+
+    def test_circuit_unchanged(self):
+        circuit = Circuit(os.path.join(ROOT, 'IEEE_30BUS.xls'), is_file=True)
+        circuit.branch[5, BR_STATUS] = 0
+        circuit.initialize_power_flow_solver(SolverType.NR)
+        circuit.initialize_contingency_analysis(top_k=len(circuit.branch))
+        ca = circuit.contingency_analysis
+
+        islands = [island.circuit_power_flow for island in circuit.power_flow.island_circuits]
+        status = [cpf.branch[:, BR_STATUS].copy() for cpf in islands]
+        Ybus = [cpf.Ybus.toarray() for cpf in islands]
+        nnz = [cpf.Ybus.nnz for cpf in islands]
+
+        ca.run()
+
+        # the outages of the branches out of service are not verified
+        self.assertNotIn(5, ca.verified_outages)
+        self.assertTrue(len(ca.verified_outages) > 0)
+
+        for cpf, status0, Ybus0, nnz0 in zip(islands, status, Ybus, nnz):
+            np.testing.assert_array_equal(cpf.branch[:, BR_STATUS], status0)
+            np.testing.assert_allclose(cpf.Ybus.toarray(), Ybus0, atol=1e-12)
+            self.assertEqual(cpf.Ybus.nnz, nnz0)
+
+
+if __name__ == '__main__':
+    unittest.main()
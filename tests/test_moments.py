@@ -0,0 +1,72 @@
+"""
+Tests of the streaming moments (see grid/Moments.py)
+
+usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from grid.Moments import Moments
+
+
+def get_moments(samples, dtype=complex):
+    """
+    Computes the moments of some samples in a single pass
+    @param samples: matrix of samples (one row per sample)
+    @param dtype: type of the values
+    @return: Moments instance
+    """
+    moments = Moments(samples.shape[1], dtype=dtype)
+    for x in samples:
+        moments.update(x)
+    return moments
+
+
+class MomentsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.samples = 1.0 + 0.2 * rng.standard_normal((200, 6)) + 0.1j * rng.standard_normal((200, 6))
+
+    def test_single_pass_matches_numpy(self):
+        moments = get_moments(self.samples)
+        np.testing.assert_allclose(moments.mean, self.samples.mean(axis=0), atol=1e-12)
+        np.testing.assert_allclose(moments.variance(), self.samples.var(axis=0, ddof=1), atol=1e-12)
+        np.testing.assert_allclose(moments.minimum, np.abs(self.samples).min(axis=0), atol=1e-12)
+        np.testing.assert_allclose(moments.maximum, np.abs(self.samples).max(axis=0), atol=1e-12)
+
+    def test_merge_matches_single_pass(self):
+        expected = get_moments(self.samples)
+
+        # uneven splits, including an empty one
+        for splits in [[100], [1, 37, 150], [0, 199]]:
+            with self.subTest(splits=splits):
+                parts = [get_moments(part) for part in np.split(self.samples, splits)]
+                moments = parts[0]
+                for part in parts[1:]:
+                    moments.merge(part)
+
+                self.assertEqual(moments.count, expected.count)
+                np.testing.assert_allclose(moments.mean, expected.mean, atol=1e-12)
+                np.testing.assert_allclose(moments.m2, expected.m2, atol=1e-10)
+                np.testing.assert_allclose(moments.standard_error(), expected.standard_error(), atol=1e-12)
+                np.testing.assert_array_equal(moments.minimum, expected.minimum)
+                np.testing.assert_array_equal(moments.maximum, expected.maximum)
+
+    def test_merge_of_real_values(self):
+        samples = self.samples.real
+        moments = get_moments(samples[:50], dtype=float)
+        moments.merge(get_moments(samples[50:], dtype=float))
+        np.testing.assert_allclose(moments.variance(), samples.var(axis=0, ddof=1), atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
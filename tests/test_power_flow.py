@@ -0,0 +1,156 @@
+"""
+Tests of the power flow (see grid/PowerFlow.py)
+
+usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from grid.CircuitModule import Circuit
+from grid.PowerFlow import SolverType, CircuitPowerFlow
+from grid.BranchDefinitions import F_BUS, T_BUS
+from grid.FastDecoupledPowerFlow import fdpf
+from grid.NewtonRaphsonPowerFlow import dSbus_dV
+from grid.JacobianBuilder import JacobianBuilder
+from grid.ContingencyAnalysis import make_ptdf, make_lodf
+
+
+def run_power_flow(solver_type, tol=1e-6, max_it=50, name='IEEE_30BUS.xls'):
+    """
+    Runs the power flow of a bundled case without the reactive power limits
+    @param solver_type: SolverType
+    @param tol: solution tolerance
+    @param max_it: maximum number of iterations
+    @param name: file name of the case
+    @return: MultiCircuitPowerFlow instance
+    """
+    circuit = Circuit(os.path.join(ROOT, name), is_file=True)
+    circuit.initialize_power_flow_solver(solver_type)
+    circuit.power_flow.set_run_options(solver_type, tol, max_it, False, True)
+    circuit.power_flow.run()
+    return circuit.power_flow
+
+
+def get_island(name='IEEE_57BUS.xls'):
+    """
+    Returns the power flow object of the (only) island of a bundled case
+    @param name: file name of the case
+    @return: CircuitPowerFlow instance
+    """
+    circuit = Circuit(os.path.join(ROOT, name), is_file=True)
+    circuit.initialize_power_flow_solver(SolverType.NR)
+    return circuit.power_flow.island_circuits[0].circuit_power_flow
+
+
+def dc_flows(cpf, P):
+    """
+    Solves the DC power flow with a dense solver
+    @param cpf: CircuitPowerFlow instance
+    @param P: active power injections (p.u.)
+    @return: branch flows (p.u.)
+    """
+    noref = np.setdiff1d(np.arange(cpf.nb), cpf.ref_list)
+    theta = np.zeros(cpf.nb)
+    theta[noref] = np.linalg.solve(cpf.B[noref, :][:, noref].toarray(), P[noref])
+    return cpf.Bf * theta
+
+
+class PowerFlowTest(unittest.TestCase):
+
+    def assert_matches_a_fresh_build(self, cpf):
+        """
+        Checks that the matrices patched in place are those of a power flow object built from the same data
+        @param cpf: CircuitPowerFlow instance
+        """
+        fresh = CircuitPowerFlow(cpf.baseMVA, cpf.bus, cpf.branch, cpf.gen, cpf.solver_type)
+        for name in ['Ybus', 'Yf', 'Yt', 'Yred', 'Bp', 'Bpp', 'B', 'Bf']:
+            with self.subTest(matrix=name):
+                np.testing.assert_allclose(getattr(cpf, name).toarray(), getattr(fresh, name).toarray(), atol=1e-12)
+        for name in ['Pbusinj', 'Pfinj', 'tap']:
+            with self.subTest(array=name):
+                np.testing.assert_allclose(getattr(cpf, name), getattr(fresh, name), atol=1e-12)
+
+        cpf.run(tol=1e-9, max_it=20, enforce_q_limits=False)
+        fresh.run(tol=1e-9, max_it=20, enforce_q_limits=False)
+        np.testing.assert_allclose(cpf.V0, fresh.V0, atol=1e-9)
+
+    def test_set_branch_status_matches_a_fresh_build(self):
+        cpf = get_island()
+        cpf.set_branch_status([3, 18], 0)
+        self.assert_matches_a_fresh_build(cpf)
+
+    def test_set_tap_matches_a_fresh_build(self):
+        cpf = get_island()
+        cpf.set_tap([18, 30], [1.02, 0.95])
+        self.assert_matches_a_fresh_build(cpf)
+
+    def test_jacobian_refill(self):
+        cpf = get_island()
+        builder = JacobianBuilder(cpf.Ybus, cpf.pv_list, cpf.pq_list)
+        pvpq = np.r_[cpf.pv_list, cpf.pq_list]
+        pq = cpf.pq_list
+
+        # the same structure is refilled at every voltage
+        rng = np.random.default_rng(1)
+        for V in [cpf.V0, cpf.V0 * np.exp(0.1j * rng.random(cpf.nb))]:
+            dS_dVm, dS_dVa = (np.asarray(M.todense()) for M in dSbus_dV(cpf.Ybus, V))
+            J = np.block([[dS_dVa[np.ix_(pvpq, pvpq)].real, dS_dVm[np.ix_(pvpq, pq)].real],
+                          [dS_dVa[np.ix_(pq, pvpq)].imag, dS_dVm[np.ix_(pq, pq)].imag]])
+            np.testing.assert_allclose(builder.update(V).toarray(), J, atol=1e-10)
+
+    def test_lu_reuse_matches_honest_newton(self):
+        V = run_power_flow(SolverType.NR, tol=1e-9).voltage
+
+        circuit = Circuit(os.path.join(ROOT, 'IEEE_30BUS.xls'), is_file=True)
+        circuit.initialize_power_flow_solver(SolverType.NR)
+        circuit.power_flow.set_run_options(SolverType.NR, 1e-9, 50, False, True, refactor_every=3)
+        circuit.power_flow.run()
+        np.testing.assert_allclose(circuit.power_flow.voltage, V, atol=1e-8)
+
+    def test_ptdf_and_lodf_match_the_dc_power_flow(self):
+        cpf = get_island()
+        P = cpf.Sbus.real
+        flows = dc_flows(cpf, P)
+
+        PTDF = make_ptdf(cpf.B, cpf.Bf, cpf.ref_list)
+        np.testing.assert_allclose(PTDF.dot(P), flows, atol=1e-10)
+
+        LODF, islanding = make_lodf(PTDF, cpf.branch[:, F_BUS].astype(int), cpf.branch[:, T_BUS].astype(int))
+        for k in [3, 18, 40]:
+            with self.subTest(outage=k):
+                self.assertFalse(islanding[k])
+                cpf.set_branch_status(k, 0)
+                np.testing.assert_allclose(flows + LODF[:, k] * flows[k], dc_flows(cpf, P), atol=1e-10)
+                cpf.set_branch_status(k, 1)
+
+    def test_iterations_counted_by_every_solver(self):
+        for solver_type in [SolverType.NR, SolverType.IWAMOTO, SolverType.NRFD_XB, SolverType.NRFD_BX,
+                            SolverType.GAUSS, SolverType.ZBUS]:
+            with self.subTest(solver=solver_type.name):
+                pf = run_power_flow(solver_type, max_it=5)
+                self.assertGreater(pf.iterations, 0)
+                self.assertLessEqual(pf.iterations, 6)
+
+        # the fast decoupled iterations are the ones of the solver
+        pf = run_power_flow(SolverType.NRFD_XB)
+        cpf = pf.island_circuits[0].circuit_power_flow
+        cpf.set_original_values()
+        _, converged, _, iterations = fdpf(cpf.Ybus, cpf.Sbus, cpf.V0, cpf.Bp_solver, cpf.Bpp_solver,
+                                           cpf.pv_list, cpf.pq_list, 1e-6, 50)
+        self.assertTrue(converged)
+        self.assertEqual(pf.iterations, iterations)
+
+        # HELM counts its series coefficients on top of the Iwamoto refinement
+        self.assertGreater(run_power_flow(SolverType.HELM).iterations, run_power_flow(SolverType.IWAMOTO).iterations)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Tests of the time series (see grid/TimeSeries.py)
+
+usage:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import contextlib
+import unittest
+from io import StringIO
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from grid.CircuitModule import Circuit
+from grid.BranchDefinitions import BR_X
+
+
+def load_circuit():
+    """
+    Loads the case with profiles, with its time series ready to run
+    """
+    circuit = Circuit(os.path.join(ROOT, 'IEEE_30BUS_profiles.xls'), is_file=True)
+    circuit.initialize_TimeSeries()
+    circuit.time_series.set_run_options(max_it=20)
+    return circuit
+
+
+def run(ts):
+    """
+    Runs a time series quietly
+    @param ts: TimeSeries instance
+    @return: voltages
+    """
+    with contextlib.redirect_stdout(StringIO()):
+        ts.run()
+    return np.array(ts.voltages[...])
+
+
+def run_interrupted(ts, percentage=50.0):
+    """
+    Runs a time series that is cancelled once the given percentage of the steps is solved
+    @param ts: TimeSeries instance
+    @param percentage: percentage of the steps solved before cancelling
+    """
+    ts.set_callbacks(progress=lambda value: value >= percentage and ts.end_process())
+    run(ts)
+    ts.set_callbacks()
+
+
+class TimeSeriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_cache_cleared_when_the_network_changes(self):
+        circuit = load_circuit()
+        V_base = run(circuit.time_series)
+
+        circuit.branch[:, BR_X] *= 1.5
+        circuit.initialize_TimeSeries()
+        V = run(circuit.time_series)
+
+        self.assertEqual(circuit.time_series.cache.hits, 0)
+
+        circuit.time_series.set_run_options(max_it=20, use_cache=False)
+        V_expected = run(circuit.time_series)
+
+        np.testing.assert_allclose(V, V_expected, atol=1e-9)
+        self.assertTrue(np.abs(V - V_base).max() > 1e-3)
+
+    def test_batched_matches_sequential(self):
+        circuit = load_circuit()
+        ts = circuit.time_series
+        ts.set_run_options(tol=1e-6, max_it=20, enforce_reactive_power_limits=False, use_cache=False)
+        V = run(ts)
+        self.assertTrue(np.all(np.array(ts.mismatch[...]) < 1e-6))
+
+        ts.set_run_options(tol=1e-6, max_it=20, enforce_reactive_power_limits=False, use_cache=False,
+                           batched=True, block_size=16)
+        np.testing.assert_allclose(run(ts), V, atol=1e-5)
+        self.assertTrue(np.all(np.array(ts.mismatch[...]) < 1e-6))
+
+    def test_cached_matches_solved(self):
+        circuit = load_circuit()
+        ts = circuit.time_series
+        ts.set_run_options(tol=1e-6, max_it=20, use_cache=False)
+        V = run(ts)
+
+        ts.set_run_options(tol=1e-6, max_it=20, use_cache=True)
+        run(ts)
+        self.assertEqual(ts.cache.hits, 0)
+
+        # the second run is served from the cache
+        np.testing.assert_allclose(run(ts), V, atol=1e-12)
+        self.assertEqual(ts.cache.hits, len(V))
+
+    def test_resumed_matches_uninterrupted(self):
+        circuit = load_circuit()
+        ts = circuit.time_series
+        ts.set_run_options(tol=1e-6, max_it=20, use_cache=False)
+        V = run(ts)
+
+        ts.set_checkpoint(os.path.join(self.folder, 'checkpoint.npz'), interval=0.0)
+        run_interrupted(ts)
+        self.assertTrue(np.abs(np.array(ts.voltages[...]) - V).max() > 1e-3)
+
+        with contextlib.redirect_stdout(StringIO()):
+            ts.resume()
+        np.testing.assert_allclose(np.array(ts.voltages[...]), V, atol=1e-12)
+
+    def test_parallel_matches_sequential(self):
+        circuit = load_circuit()
+        circuit.time_series.set_run_options(max_it=20, use_cache=False)
+        V = run(circuit.time_series)
+        iterations = np.array(circuit.time_series.iterations[...])
+
+        # the reactive power limits and the solver of the sequential run are kept
+        circuit.time_series.set_run_options(max_it=20, use_cache=False, n_processes=2)
+        np.testing.assert_allclose(run(circuit.time_series), V, atol=1e-9)
+        np.testing.assert_array_equal(circuit.time_series.iterations[...], iterations)
+
+    def test_batched_with_reactive_power_limits_rejected(self):
+        circuit = load_circuit()
+        for n_processes in [1, 2]:
+            with self.subTest(n_processes=n_processes):
+                circuit.time_series.set_run_options(max_it=20, batched=True, n_processes=n_processes)
+                with self.assertRaises(ValueError):
+                    circuit.time_series.run()
+
+    def test_checkpoint_of_another_network_not_resumed(self):
+        circuit = load_circuit()
+        circuit.time_series.set_checkpoint(os.path.join(self.folder, 'checkpoint.npz'), interval=0.0)
+        run_interrupted(circuit.time_series)
+        self.assertTrue(circuit.time_series.checkpoint.exists())
+
+        circuit.branch[:, BR_X] *= 1.5
+        circuit.initialize_TimeSeries()
+        with self.assertRaises(Exception):
+            circuit.time_series.resume()
+
+
+if __name__ == '__main__':
+    unittest.main()